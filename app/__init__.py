@@ -6,6 +6,7 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 import atexit
+import click
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # Load environment variables
@@ -54,6 +55,10 @@ def create_app(config_name="development"):
         app.config.from_object("config.TestingConfig")
     db_path = os.path.join(os.getcwd(), "app.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    from app.models.outline_cache import outline_cache
+
+    outline_cache.max_entries = app.config.get("OUTLINE_CACHE_SIZE", 256)
+
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -109,6 +114,16 @@ def create_app(config_name="development"):
         init_db(app)
         print("Database initialized with admin user")
 
+    @app.cli.command("worker")
+    @click.option("--once", is_flag=True, help="Exit when the queue is empty")
+    @click.option("--poll-interval", type=float, default=None, help="Seconds between polls")
+    @click.option("--threads", type=int, default=None, help="Jobs to run at once")
+    def run_worker(once, poll_interval, threads):
+        """Process queued section generation jobs"""
+        from app.services.job_service import JobWorker
+
+        JobWorker(app, poll_interval=poll_interval, threads=threads).run(once=once)
+
     # Set up scheduled tasks
     with app.app_context():
         from app.services.export_service import ExportService
@@ -130,4 +145,10 @@ def create_app(config_name="development"):
         atexit.register(lambda: scheduler.shutdown())
 
     setup_database()
+
+    # Without a separate `flask worker` process, queued jobs are run here
+    if app.config.get("JOB_WORKER_IN_PROCESS") and not app.config.get("TESTING"):
+        from app.services.job_service import JobWorker
+
+        JobWorker(app).start()
     return app
@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.research import ResearchProject, ResearchOutline
 from app.models.content import ResearchContent
-from app.services.content_service import ContentService
+from app.models.job import GenerationRun
+from app.services.cancellation import CancellationToken
+from app.services.citation_formatter import render_citations
+from app.views.research import generate_section_once
 from app import db
 from datetime import datetime
 
@@ -33,62 +36,88 @@ def generate_content(outline_id, section_title):
     # Get request data
     data = request.get_json() or {}
     subsection_titles = data.get('subsection_titles', [])
+    generation_mode = data.get('generation_mode')
+    bypass_cache = data.get('bypass_cache', False)
     
-    # Generate content
-    content_service = ContentService()
-    content_data = content_service.generate_section_content(
-        project=project,
-        outline=outline,
-        section_title=section_title,
-        subsection_titles=subsection_titles,
-        citation_style=project.citation_style,
-        language=project.language
+    # Whether this request replaces an earlier version of the section
+    existing_content = ResearchContent.query.filter_by(
+        project_id=project.id,
+        outline_id=outline.id,
+        section_title=section_title
+    ).first()
+    
+    # Generate and store the section, sharing the run with any concurrent
+    # request for it; the client can cancel it through its generation_id
+    content_data = generate_section_once(
+        project,
+        outline,
+        section_title,
+        subsection_titles,
+        generation_id=data.get('generation_id'),
+        generation_mode=generation_mode,
+        use_cache=not bypass_cache
     )
     
+    if content_data.get("cancelled") or content_data.get("in_progress"):
+        return jsonify(content_data), 409
+    
     if "error" in content_data:
         return jsonify(content_data), 500
     
-    # Check if content for this section already exists
-    existing_content = ResearchContent.query.filter_by(
+    if content_data.get("partial"):
+        # Out of time; the written pages are stored and the section is not,
+        # so regenerating the remaining pages finishes it
+        return jsonify(content_data), 202
+    
+    content = ResearchContent.query.filter_by(
         project_id=project.id,
         outline_id=outline.id,
         section_title=section_title
     ).first()
     
     if existing_content:
-        # Increment version and update content
-        existing_content.content = content_data.get('content', '')
-        existing_content.set_citations(content_data.get('citations', []))
-        existing_content.version += 1
-        existing_content.updated_at = datetime.utcnow()
-        
+        # generate_section_once stored the new text; count it as a new version
+        content.version += 1
+        content.updated_at = datetime.utcnow()
         db.session.commit()
         
         return jsonify({
             "message": "Content updated successfully",
-            "content_id": existing_content.id,
+            "content_id": content.id,
             "section_title": section_title,
-            "version": existing_content.version
+            "version": content.version
         }), 200
-    else:
-        # Create new content
-        new_content = ResearchContent(
-            project_id=project.id,
-            outline_id=outline.id,
-            section_title=section_title,
-            content=content_data.get('content', '')
-        )
-        new_content.set_citations(content_data.get('citations', []))
-        
-        db.session.add(new_content)
-        db.session.commit()
-        
-        return jsonify({
-            "message": "Content generated successfully",
-            "content_id": new_content.id,
-            "section_title": section_title,
-            "version": new_content.version
-        }), 201
+    
+    return jsonify({
+        "message": "Content generated successfully",
+        "content_id": content.id,
+        "section_title": section_title,
+        "version": content.version
+    }), 201
+
+@content_bp.route('/generations/<generation_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_generation(generation_id):
+    """Cancel a running section generation by the generation_id it was started with"""
+    user_id = get_jwt_identity()
+    
+    run = GenerationRun.query.join(
+        ResearchProject, ResearchProject.id == GenerationRun.project_id
+    ).filter(
+        GenerationRun.id == generation_id,
+        ResearchProject.user_id == user_id
+    ).first()
+    
+    if not run:
+        return jsonify({"error": "Generation not found"}), 404
+    
+    if not CancellationToken.cancel_runs(run.project_id, run_id=run.id):
+        return jsonify({"error": "Generation is not running", "status": run.status}), 409
+    
+    return jsonify({
+        "message": "Generation cancelled",
+        "generation_id": run.id
+    }), 200
 
 @content_bp.route('/<int:project_id>', methods=['GET'])
 @jwt_required()
@@ -123,7 +152,9 @@ def get_project_content(project_id):
             "id": section.id,
             "section_title": section.section_title,
             "content": section.content,
-            "citations": section.get_citations(),
+            "citations": render_citations(
+                section.get_citations(), project.citation_style, project.language
+            ),
             "version": section.version,
             "created_at": section.created_at.isoformat(),
             "updated_at": section.updated_at.isoformat()
@@ -150,7 +181,11 @@ def get_content(content_id):
         "id": content.id,
         "section_title": content.section_title,
         "content": content.content,
-        "citations": content.get_citations(),
+        "citations": render_citations(
+            content.get_citations(),
+            content.project.citation_style,
+            content.project.language,
+        ),
         "version": content.version,
         "created_at": content.created_at.isoformat(),
         "updated_at": content.updated_at.isoformat()
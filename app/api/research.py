@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.research import ResearchProject, ResearchOutline
 from app.models.user import User
+from app.services.deadline import Deadline
 from app.services.gemini_service import GeminiService
+from app.services.job_service import JobQueue, cancel_project_generations
 from app import db
 from datetime import datetime
 
@@ -103,13 +105,16 @@ def generate_outline(project_id):
     
     data = request.get_json()
     complexity = data.get('complexity', 'medium')
+    bypass_cache = data.get('bypass_cache', False)
     
     # Generate outline using Gemini service
     gemini_service = GeminiService()
     outline_structure = gemini_service.generate_research_outline(
         topic=project.title,
         complexity=complexity,
-        language=project.language
+        language=project.language,
+        use_cache=not bypass_cache,
+        deadline=Deadline.for_request(current_app.config)
     )
     
     if "error" in outline_structure:
@@ -122,6 +127,9 @@ def generate_outline(project_id):
     db.session.add(outline)
     db.session.commit()
     
+    # Content still being generated for the old outlines is no longer wanted
+    cancel_project_generations(project.id, keep_outline_id=outline.id)
+    
     return jsonify({
         "message": "Outline generated successfully",
         "outline_id": outline.id,
@@ -144,7 +152,10 @@ def approve_outline(outline_id):
     outline.is_approved = True
     db.session.commit()
     
+    job_id = JobQueue().enqueue_speculative(outline.project, outline)
+    
     return jsonify({
         "message": "Outline approved successfully",
-        "outline_id": outline.id
+        "outline_id": outline.id,
+        "job_id": job_id
     }), 200
\ No newline at end of file
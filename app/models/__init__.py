@@ -1,10 +1,34 @@
 from app.models.user import User
 from app.models.research import ResearchProject, ResearchOutline
-from app.models.content import ResearchContent
+from app.models.citation import (
+    Citation,
+    CitationSource,
+    ContentCitation,
+    PageCitation,
+)
+from app.models.content import (
+    ResearchContent,
+    ResearchContentPage,
+    SectionCheckpoint,
+    SectionSummary,
+)
+from app.models.job import GenerationJob, GenerationLease, GenerationRun
+from app.models.rate_limit import RateLimitBucket
 
 __all__ = [
     "User",
     "ResearchProject",
     "ResearchOutline",
     "ResearchContent",
+    "ResearchContentPage",
+    "SectionCheckpoint",
+    "SectionSummary",
+    "Citation",
+    "CitationSource",
+    "ContentCitation",
+    "PageCitation",
+    "GenerationJob",
+    "GenerationLease",
+    "GenerationRun",
+    "RateLimitBucket",
 ]
@@ -0,0 +1,306 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import json
+import re
+import unicodedata
+
+# Arabic diacritics and tatweel, which vary between copies of the same reference
+ARABIC_MARKS = re.compile(r"[\u0640\u064B-\u0652]")
+WHITESPACE = re.compile(r"\s+")
+
+
+class Citation(db.Model):
+    """
+    A reference used anywhere in a project, stored once
+
+    Citations are identified by a hash of their normalized text, so the same
+    reference produced for different pages or sections maps to one row and
+    one stable id. Citations generated with structured fields are identified
+    by their authors, year and title instead, and keep the fields in
+    CitationSource so they can be rendered in any style.
+    """
+
+    __tablename__ = "citations"
+    __table_args__ = (
+        db.UniqueConstraint("project_id", "text_hash", name="uq_citations_project_hash"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_citations_project",
+        ),
+        nullable=False,
+    )
+    # sha256 of normalize_text(text)
+    text_hash = db.Column(db.String(64), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    source_type = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Loaded with the citation, so reference lists render without extra queries
+    source = db.relationship(
+        "CitationSource", uselist=False, lazy="joined", cascade="all, delete-orphan"
+    )
+
+    @staticmethod
+    def normalize_text(text):
+        """Text with case, spacing, Unicode forms and Arabic marks folded away"""
+        text = unicodedata.normalize("NFKC", text or "")
+        text = ARABIC_MARKS.sub("", text).casefold()
+        return WHITESPACE.sub(" ", text).strip().rstrip(".").strip()
+
+    @classmethod
+    def hash_text(cls, text):
+        return hashlib.sha256(cls.normalize_text(text).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fields_of(citation):
+        """The structured fields of a citation dict, or None when it only has text"""
+        if not isinstance(citation, dict):
+            return None
+        title = WHITESPACE.sub(" ", str(citation.get("title") or "")).strip()
+        if not title:
+            return None
+
+        authors = citation.get("authors") or []
+        if isinstance(authors, str):
+            authors = authors.split(";")
+        return {
+            "authors": [
+                WHITESPACE.sub(" ", str(name)).strip()
+                for name in authors
+                if str(name).strip()
+            ],
+            "year": str(citation.get("year") or "").strip(),
+            "title": title,
+            "venue": WHITESPACE.sub(" ", str(citation.get("venue") or "")).strip(),
+            "source_type": citation.get("source_type") or citation.get("type"),
+        }
+
+    @classmethod
+    def identity(cls, citation):
+        """
+        What tells a citation dict apart from other references
+
+        Author names are compared by their words in sorted order, so "Smith,
+        John" and "John Smith" are the same author.
+        """
+        fields = cls.fields_of(citation)
+        if not fields:
+            return str(citation.get("text") or "")
+        authors = "; ".join(
+            " ".join(sorted(name.replace(",", " ").split()))
+            for name in fields["authors"]
+        )
+        return f"{authors} ({fields['year']}) {fields['title']}"
+
+    @classmethod
+    def hash_citation(cls, citation):
+        return cls.hash_text(cls.identity(citation))
+
+    @classmethod
+    def register(cls, project_id, citations):
+        """
+        Get or create the rows for a list of citation dicts
+
+        Existing rows are found with one query on the (project_id, text_hash)
+        index. A row inserted concurrently by another worker is picked up
+        instead of failing. New rows are flushed, not committed.
+
+        Returns:
+            list: One Citation per distinct citation with text, in input order
+        """
+        by_hash = {}
+        for citation in citations or []:
+            if not isinstance(citation, dict) or not cls.identity(citation).strip():
+                continue
+            by_hash.setdefault(cls.hash_citation(citation), citation)
+        if not by_hash:
+            return []
+
+        existing = {
+            row.text_hash: row
+            for row in cls.query.filter(
+                cls.project_id == project_id, cls.text_hash.in_(list(by_hash))
+            )
+        }
+        for text_hash, citation in by_hash.items():
+            if text_hash in existing:
+                continue
+            fields = cls.fields_of(citation)
+            row = cls(
+                project_id=project_id,
+                text_hash=text_hash,
+                text=str(citation.get("text") or cls.identity(citation)).strip(),
+                source_type=(fields or citation).get("source_type"),
+            )
+            if fields:
+                row.source = CitationSource.from_fields(fields)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(row)
+            except IntegrityError:
+                row = cls.query.filter_by(project_id=project_id, text_hash=text_hash).one()
+            existing[text_hash] = row
+
+        return [existing[text_hash] for text_hash in by_hash]
+
+    @classmethod
+    def for_outline(cls, outline_id):
+        """Reference list of an outline's sections, in order of first use"""
+        from app.models.content import ResearchContent
+
+        return (
+            cls.query.join(ContentCitation, ContentCitation.citation_id == cls.id)
+            .join(ResearchContent, ResearchContent.id == ContentCitation.content_id)
+            .filter(ResearchContent.outline_id == outline_id)
+            .distinct()
+            .order_by(cls.id)
+            .all()
+        )
+
+    @classmethod
+    def reference_list(cls, outline_id, contents):
+        """
+        Reference list for an outline, linking sections stored before the registry
+
+        Args:
+            contents: The outline's ResearchContent rows, already loaded by the caller
+        """
+        linked = {
+            content_id
+            for (content_id,) in db.session.query(ContentCitation.content_id)
+            .filter(ContentCitation.content_id.in_([content.id for content in contents]))
+            .distinct()
+        }
+        unlinked = [
+            content for content in contents if content.id not in linked and content.citations
+        ]
+        for content in unlinked:
+            content.link_citations(content.get_citations())
+        if unlinked:
+            db.session.commit()
+        return cls.for_outline(outline_id)
+
+    @property
+    def fields(self):
+        """Structured fields as from fields_of, or None for a text-only citation"""
+        if self.source is None:
+            return None
+        return {**self.source.to_dict(), "source_type": self.source_type}
+
+    def to_dict(self):
+        data = {
+            "id": str(self.id),
+            "text": self.text,
+            "source_type": self.source_type,
+        }
+        if self.source is not None:
+            data.update(self.source.to_dict())
+        return data
+
+    def __repr__(self):
+        return f"<Citation {self.id} for Project {self.project_id}>"
+
+
+class CitationSource(db.Model):
+    """Structured fields of a citation, rendered in the project's style when shown"""
+
+    __tablename__ = "citation_sources"
+
+    citation_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "citations.id",
+            ondelete="CASCADE",
+            name="fk_citation_sources_citation",
+        ),
+        primary_key=True,
+    )
+    # JSON encoded list of names, in the order given
+    authors = db.Column(db.Text, nullable=False, default="[]")
+    year = db.Column(db.String(20), nullable=True)
+    title = db.Column(db.Text, nullable=False)
+    venue = db.Column(db.Text, nullable=True)
+
+    @classmethod
+    def from_fields(cls, fields):
+        return cls(
+            authors=json.dumps(fields["authors"], ensure_ascii=False),
+            year=fields["year"] or None,
+            title=fields["title"],
+            venue=fields["venue"] or None,
+        )
+
+    def to_dict(self):
+        try:
+            authors = json.loads(self.authors or "[]")
+        except json.JSONDecodeError:
+            authors = []
+        return {
+            "authors": authors,
+            "year": self.year or "",
+            "title": self.title,
+            "venue": self.venue or "",
+        }
+
+
+class ContentCitation(db.Model):
+    """A citation used by a section"""
+
+    __tablename__ = "content_citations"
+
+    content_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_content.id",
+            ondelete="CASCADE",
+            name="fk_content_citations_content",
+        ),
+        primary_key=True,
+    )
+    citation_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "citations.id",
+            ondelete="CASCADE",
+            name="fk_content_citations_citation",
+        ),
+        primary_key=True,
+        index=True,
+    )
+    # Order within the section's reference list
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PageCitation(db.Model):
+    """A citation used by a stored page"""
+
+    __tablename__ = "page_citations"
+
+    page_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_content_pages.id",
+            ondelete="CASCADE",
+            name="fk_page_citations_page",
+        ),
+        primary_key=True,
+    )
+    citation_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "citations.id",
+            ondelete="CASCADE",
+            name="fk_page_citations_citation",
+        ),
+        primary_key=True,
+        index=True,
+    )
+    position = db.Column(db.Integer, nullable=False, default=0)
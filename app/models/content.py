@@ -1,7 +1,12 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+import hashlib
 import json
 from app.models.research import ResearchProject, ResearchOutline
+from app.models.citation import Citation, ContentCitation, PageCitation
+from app.models.job import GenerationRun
 
 
 class ResearchContent(db.Model):
@@ -39,6 +44,58 @@ class ResearchContent(db.Model):
     project = db.relationship("ResearchProject", backref="contents")
     outline = db.relationship("ResearchOutline", backref="contents")
 
+    @classmethod
+    def store_section(cls, project_id, outline_id, section_title, content_data):
+        """
+        Create or update the content row for a section from generated content data
+
+        The row is added to the session but not committed.
+        """
+        content = cls.query.filter_by(
+            project_id=project_id,
+            outline_id=outline_id,
+            section_title=section_title,
+        ).first()
+
+        if not content:
+            content = cls(
+                project_id=project_id,
+                outline_id=outline_id,
+                section_title=section_title,
+            )
+
+        content.from_json_response(content_data)
+        db.session.add(content)
+        content.set_citations(content.link_citations(content.get_citations()))
+        # The section is complete, so there is no run left to resume
+        SectionCheckpoint.clear(outline_id, section_title)
+        if content_data.get("summary"):
+            SectionSummary.save(
+                project_id,
+                outline_id,
+                section_title,
+                content_data["summary"],
+                content.content,
+            )
+        return content
+
+    def link_citations(self, citations):
+        """
+        Point the section at the project's citation registry
+
+        Returns:
+            list: The citations deduplicated, with their registry ids
+        """
+        rows = Citation.register(self.project_id, citations)
+        if self.id is None:
+            db.session.flush()
+        ContentCitation.query.filter_by(content_id=self.id).delete()
+        db.session.add_all(
+            ContentCitation(content_id=self.id, citation_id=row.id, position=position)
+            for position, row in enumerate(rows)
+        )
+        return [row.to_dict() for row in rows]
+
     def get_citations(self):
         """Get citations as a list of dictionaries"""
         if not self.citations:
@@ -142,3 +199,433 @@ class ResearchContent(db.Model):
 
     def __repr__(self):
         return f"<ResearchContent {self.section_title} for Project {self.project_id}>"
+
+
+class ResearchContentPage(db.Model):
+    """One generated page of a section, so single pages can be regenerated"""
+
+    __tablename__ = "research_content_pages"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "outline_id",
+            "section_title",
+            "page_number",
+            name="uq_research_content_pages_page",
+        ),
+    )
+
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    # Marked for regeneration by an editor
+    STATUS_STALE = "stale"
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_research_content_pages_project",
+        ),
+        nullable=False,
+    )
+    outline_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_outlines.id",
+            ondelete="CASCADE",
+            name="fk_research_content_pages_outline",
+        ),
+        nullable=False,
+    )
+    section_title = db.Column(db.String(255), nullable=False)
+    # Page number within the paper, as in the outline's page_range
+    page_number = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=True)
+    citations = db.Column(db.Text, nullable=True)
+    # sha256 of the prompt that produced the page
+    prompt_hash = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(20), default=STATUS_DONE, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    @classmethod
+    def for_section(cls, outline_id, section_title):
+        """All stored pages of a section in page order"""
+        return (
+            cls.query.filter_by(outline_id=outline_id, section_title=section_title)
+            .order_by(cls.page_number)
+            .all()
+        )
+
+    @classmethod
+    def save(
+        cls,
+        project_id,
+        outline_id,
+        section_title,
+        page_number,
+        prompt=None,
+        page_content=None,
+        error=None,
+    ):
+        """
+        Create or update a page from its parsed content, or record its failure
+
+        The row is added to the session but not committed.
+        """
+        page = cls.query.filter_by(
+            outline_id=outline_id,
+            section_title=section_title,
+            page_number=page_number,
+        ).first()
+
+        if not page:
+            page = cls(
+                project_id=project_id,
+                outline_id=outline_id,
+                section_title=section_title,
+                page_number=page_number,
+            )
+
+        if prompt is not None:
+            page.prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+        # Set even when the text is unchanged: SectionCheckpoint tells the pages
+        # of an unfinished run apart by this timestamp
+        page.updated_at = datetime.utcnow()
+        if error is not None:
+            # Keep the last good text, if any, until a retry succeeds
+            page.status = cls.STATUS_FAILED
+            page.error = error
+        else:
+            page.status = cls.STATUS_DONE
+            page.error = None
+            page.content = (page_content or {}).get("content", "")
+            rows = Citation.register(project_id, (page_content or {}).get("citations", []))
+            page.citations = json.dumps([row.to_dict() for row in rows])
+
+        db.session.add(page)
+        if error is None:
+            if page.id is None:
+                db.session.flush()
+            PageCitation.query.filter_by(page_id=page.id).delete()
+            db.session.add_all(
+                PageCitation(page_id=page.id, citation_id=row.id, position=position)
+                for position, row in enumerate(rows)
+            )
+        return page
+
+    @classmethod
+    def mark_stale(cls, outline_id, section_title, page_numbers):
+        """Flag pages for regeneration. Not committed."""
+        return cls.query.filter(
+            cls.outline_id == outline_id,
+            cls.section_title == section_title,
+            cls.page_number.in_(list(page_numbers)),
+        ).update({"status": cls.STATUS_STALE}, synchronize_session=False)
+
+    def get_citations(self):
+        if not self.citations:
+            return []
+
+        try:
+            return json.loads(self.citations)
+        except json.JSONDecodeError:
+            return []
+
+    def to_content_data(self):
+        """The page in the shape ContentService returns for a generated page"""
+        return {
+            "section_title": self.section_title,
+            "content": self.content or "",
+            "citations": self.get_citations(),
+        }
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "section_title": self.section_title,
+            "page_number": self.page_number,
+            "status": self.status,
+            "error": self.error,
+            "content": self.content,
+            "citations": self.get_citations(),
+            "prompt_hash": self.prompt_hash,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ResearchContentPage {self.section_title} p{self.page_number} ({self.status})>"
+
+
+class SectionBusy(Exception):
+    """Another live run is generating the section"""
+
+
+class SectionCheckpoint(db.Model):
+    """
+    An unfinished generation of a section
+
+    Pages are stored as they finish. The checkpoint records when the run
+    started, so a later run (a job retry after a worker died, a new request
+    after a cancel or a deadline) can tell this run's pages apart from older
+    ones, keep them and carry on after the last good page. It is removed
+    once the section is stored.
+
+    The GenerationRun working on the section owns the checkpoint and keeps
+    heartbeat_at fresh. Another run only takes it over once that run has
+    finished, or has stopped sending heartbeats because its process died.
+    """
+
+    # Seconds without a heartbeat after which the owning run counts as dead
+    STALE_SECONDS = 120
+
+    __tablename__ = "section_checkpoints"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "outline_id", "section_title", name="uq_section_checkpoints_section"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_section_checkpoints_project",
+        ),
+        nullable=False,
+    )
+    outline_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_outlines.id",
+            ondelete="CASCADE",
+            name="fk_section_checkpoints_outline",
+        ),
+        nullable=False,
+    )
+    section_title = db.Column(db.String(255), nullable=False)
+    # Pages stored since this time belong to the unfinished run
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # The page after the last good one
+    next_page = db.Column(db.Integer, nullable=True)
+    # GenerationRun that owns the checkpoint; None for untracked runs
+    run_id = db.Column(db.String(64), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    @classmethod
+    def begin(
+        cls, project_id, outline_id, section_title, run_id=None, stale_after=None
+    ):
+        """
+        Claim the section for a run, picking up an unfinished earlier one. Committed.
+
+        Args:
+            run_id: Id of the GenerationRun claiming the section
+            stale_after: Seconds without a heartbeat after which the owner
+                counts as dead; defaults to STALE_SECONDS
+
+        Returns:
+            tuple: (checkpoint, resumed) where resumed is True when an earlier
+            run had not finished
+
+        Raises:
+            SectionBusy: Another run is still working on the section
+        """
+        now = datetime.utcnow()
+        checkpoint = cls.query.filter_by(
+            outline_id=outline_id, section_title=section_title
+        ).first()
+        if checkpoint is None:
+            checkpoint = cls(
+                project_id=project_id,
+                outline_id=outline_id,
+                section_title=section_title,
+                run_id=run_id,
+                started_at=now,
+                heartbeat_at=now,
+            )
+            db.session.add(checkpoint)
+            try:
+                db.session.commit()
+                return checkpoint, False
+            except IntegrityError:
+                # Another run of the section started at the same moment
+                db.session.rollback()
+                checkpoint = cls.query.filter_by(
+                    outline_id=outline_id, section_title=section_title
+                ).first()
+                if checkpoint is None:
+                    raise SectionBusy(f"Section '{section_title}' is being generated")
+
+        if checkpoint.run_id != run_id and checkpoint._owner_alive(
+            now, cls.STALE_SECONDS if stale_after is None else stale_after
+        ):
+            raise SectionBusy(f"Section '{section_title}' is already being generated")
+
+        # Compare and set, so two runs cannot both take over a dead owner
+        owner = (
+            cls.run_id.is_(None)
+            if checkpoint.run_id is None
+            else cls.run_id == checkpoint.run_id
+        )
+        taken = db.session.execute(
+            update(cls)
+            .where(
+                cls.id == checkpoint.id,
+                owner,
+                cls.heartbeat_at == checkpoint.heartbeat_at,
+            )
+            .values(run_id=run_id, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not taken:
+            raise SectionBusy(f"Section '{section_title}' is already being generated")
+        db.session.refresh(checkpoint)
+        return checkpoint, True
+
+    def _owner_alive(self, now, stale_after):
+        """Whether the owning run is still working on the section"""
+        if self.run_id is None:
+            return False
+        status = db.session.execute(
+            select(GenerationRun.status).where(GenerationRun.id == self.run_id)
+        ).scalar()
+        # A finished (or deleted) run left its pages for the next one
+        if status != GenerationRun.STATUS_RUNNING:
+            return False
+        return self.heartbeat_at >= now - timedelta(seconds=stale_after)
+
+    @classmethod
+    def heartbeat(cls, checkpoint_id, run_id):
+        """
+        Show the owning run is alive. Committed.
+
+        Returns:
+            bool: False once the checkpoint is gone or owned by another run
+        """
+        owner = cls.run_id.is_(None) if run_id is None else cls.run_id == run_id
+        refreshed = db.session.execute(
+            update(cls)
+            .where(cls.id == checkpoint_id, owner)
+            .values(heartbeat_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return bool(refreshed)
+
+    @classmethod
+    def clear(cls, outline_id, section_title):
+        """Forget the section's unfinished run. Not committed."""
+        checkpoint = cls.query.filter_by(
+            outline_id=outline_id, section_title=section_title
+        ).first()
+        if checkpoint:
+            db.session.delete(checkpoint)
+
+    def advance(self, page_number):
+        """Record a good page. Not committed."""
+        self.next_page = max(self.next_page or 0, page_number + 1)
+        self.heartbeat_at = datetime.utcnow()
+        db.session.add(self)
+
+    def finished_pages(self):
+        """The good pages this run has stored so far, in page order"""
+        return [
+            page
+            for page in ResearchContentPage.for_section(
+                self.outline_id, self.section_title
+            )
+            if page.status == ResearchContentPage.STATUS_DONE
+            and page.updated_at >= self.started_at
+        ]
+
+    def __repr__(self):
+        return f"<SectionCheckpoint {self.section_title} next p{self.next_page}>"
+
+
+class SectionSummary(db.Model):
+    """
+    A few sentences standing in for a generated body section
+
+    The introduction and conclusion are written last, from the summaries of
+    the body sections instead of their full text. content_hash ties a summary
+    to the text it was taken from, so edited sections are summarized again.
+    """
+
+    __tablename__ = "section_summaries"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "outline_id", "section_title", name="uq_section_summaries_section"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_section_summaries_project",
+        ),
+        nullable=False,
+    )
+    outline_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_outlines.id",
+            ondelete="CASCADE",
+            name="fk_section_summaries_outline",
+        ),
+        nullable=False,
+    )
+    section_title = db.Column(db.String(255), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    @staticmethod
+    def hash_content(content):
+        return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+    @classmethod
+    def save(cls, project_id, outline_id, section_title, summary, content):
+        """Create or update a section's summary. Not committed."""
+        row = cls.query.filter_by(
+            outline_id=outline_id, section_title=section_title
+        ).first()
+        if not row:
+            row = cls(
+                project_id=project_id,
+                outline_id=outline_id,
+                section_title=section_title,
+            )
+        row.summary = summary
+        row.content_hash = cls.hash_content(content)
+        db.session.add(row)
+        return row
+
+    @classmethod
+    def for_outline(cls, outline_id):
+        """Summaries of an outline's sections, by section title"""
+        rows = cls.query.filter_by(outline_id=outline_id)
+        return {row.section_title: row for row in rows}
+
+    def summarizes(self, content):
+        """Whether the summary was taken from this text"""
+        return self.content_hash == self.hash_content(content)
+
+    def __repr__(self):
+        return f"<SectionSummary {self.section_title}>"
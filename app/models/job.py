@@ -0,0 +1,173 @@
+from app import db
+from datetime import datetime
+
+
+class GenerationJob(db.Model):
+    """A queued section generation, processed off the request path by `flask worker`"""
+
+    __tablename__ = "generation_jobs"
+
+    STATUS_QUEUED = "queued"
+    # Introduction and conclusion jobs wait for the outline's body sections,
+    # whose summaries they are written from
+    STATUS_WAITING = "waiting"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+
+    # Speculative jobs, queued on outline approval, run after anything a user asked for
+    PRIORITY_SPECULATIVE = -10
+
+    id = db.Column(db.Integer, primary_key=True)
+    # All jobs enqueued by one request share a batch id, which is the job id
+    # handed back to the client
+    batch_id = db.Column(db.String(32), nullable=False, index=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_generation_jobs_project",
+        ),
+        nullable=False,
+    )
+    outline_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_outlines.id",
+            ondelete="CASCADE",
+            name="fk_generation_jobs_outline",
+        ),
+        nullable=False,
+    )
+    section_title = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default=STATUS_QUEUED, nullable=False, index=True)
+    # Higher priority jobs are claimed first; position keeps reading order within a batch
+    priority = db.Column(db.Integer, default=0, nullable=False)
+    position = db.Column(db.Integer, default=0, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def is_speculative(self):
+        return self.priority <= self.PRIORITY_SPECULATIVE
+
+    @property
+    def is_finished(self):
+        return self.status in (
+            self.STATUS_DONE,
+            self.STATUS_FAILED,
+            self.STATUS_CANCELLED,
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "batch_id": self.batch_id,
+            "section_title": self.section_title,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<GenerationJob {self.id} {self.section_title} ({self.status})>"
+
+
+class GenerationRun(db.Model):
+    """
+    One section generation in progress, so it can be cancelled from any process
+
+    A generation polls its row between pages and LLM calls and stops once
+    cancel_requested is set or the row is gone.
+    """
+
+    __tablename__ = "generation_runs"
+
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    # Stopped at the request deadline with some pages still to write
+    STATUS_PARTIAL = "partial"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+
+    # Chosen by the client when it wants to cancel a request it is waiting on
+    id = db.Column(db.String(64), primary_key=True)
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_projects.id",
+            ondelete="CASCADE",
+            name="fk_generation_runs_project",
+        ),
+        nullable=False,
+        index=True,
+    )
+    outline_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "research_outlines.id",
+            ondelete="CASCADE",
+            name="fk_generation_runs_outline",
+        ),
+        nullable=False,
+    )
+    section_title = db.Column(db.String(255), nullable=False)
+    # Set when the run belongs to a background job
+    job_id = db.Column(db.Integer, nullable=True, index=True)
+    status = db.Column(db.String(20), default=STATUS_RUNNING, nullable=False)
+    cancel_requested = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "section_title": self.section_title,
+            "job_id": self.job_id,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f"<GenerationRun {self.id} {self.section_title} ({self.status})>"
+
+
+class GenerationLease(db.Model):
+    """Lease row that lets one process run a generation while identical requests wait"""
+
+    __tablename__ = "generation_leases"
+
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    key = db.Column(db.String(512), primary_key=True)
+    owner = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), default=STATUS_RUNNING, nullable=False)
+    # JSON encoded result, shared with every request that waited on this lease
+    result = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    def __repr__(self):
+        return f"<GenerationLease {self.key} ({self.status})>"
@@ -0,0 +1,221 @@
+from copy import deepcopy
+from dataclasses import dataclass, field
+import math
+
+# Sections written around the body of a paper, in English and Arabic. They
+# are generated last, from summaries of the body sections.
+INTRODUCTION_TITLES = ("Introduction", "المقدمة")
+CONCLUSION_TITLES = ("Conclusion", "الخاتمة")
+FRAMING_TITLES = INTRODUCTION_TITLES + CONCLUSION_TITLES
+
+
+def framing_titles(language):
+    """The (introduction, conclusion) titles used for a paper's language"""
+    index = 1 if language == "ar" else 0
+    return INTRODUCTION_TITLES[index], CONCLUSION_TITLES[index]
+
+
+def is_framing_section(title):
+    return title in FRAMING_TITLES
+
+
+def _to_pages(value, default=1.0):
+    """Page count as a float; the model sometimes returns strings or nothing"""
+    try:
+        pages = float(value)
+    except (TypeError, ValueError):
+        return default
+    return pages if pages > 0 else default
+
+
+def _to_page(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class PageRange:
+    """Inclusive range of page numbers in the final document"""
+
+    start: int
+    end: int
+
+    @classmethod
+    def from_dict(cls, data):
+        """The range in a page_range dict, or None when it is missing or unusable"""
+        if not isinstance(data, dict):
+            return None
+        start, end = _to_page(data.get("start")), _to_page(data.get("end"))
+        if start is None or end is None or end < start:
+            return None
+        return cls(start, end)
+
+    @property
+    def pages(self):
+        return self.end - self.start + 1
+
+    def __contains__(self, page_number):
+        return self.start <= page_number <= self.end
+
+    def __iter__(self):
+        return iter(range(self.start, self.end + 1))
+
+    def to_dict(self):
+        return {"start": self.start, "end": self.end}
+
+
+@dataclass(frozen=True, slots=True)
+class OutlineSubsection:
+    title: str
+    key_points: tuple = ()
+    pages: float = None
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        pages = data.pop("pages", None)
+        return cls(
+            title=data.pop("title", None),
+            key_points=tuple(data.pop("key_points", None) or ()),
+            pages=_to_pages(pages) if pages is not None else None,
+            extra=data,
+        )
+
+    def to_dict(self):
+        data = deepcopy(self.extra)
+        data["title"] = self.title
+        if self.pages is not None:
+            data["pages"] = self.pages
+        data["key_points"] = list(self.key_points)
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class OutlineSection:
+    title: str
+    pages: float
+    page_range: PageRange
+    subsections: tuple = ()
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def subsection_titles(self):
+        return [subsection.title for subsection in self.subsections]
+
+    def to_dict(self):
+        data = deepcopy(self.extra)
+        data.update(
+            title=self.title,
+            pages=self.pages,
+            page_range=self.page_range.to_dict(),
+            subsections=[subsection.to_dict() for subsection in self.subsections],
+        )
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class Outline:
+    """
+    A parsed outline, built once from the stored JSON
+
+    Page counts are floats and every section has a page range; sections the
+    model returned without one are laid out after the previous section.
+    Sections are indexed by title. Keys this class does not model are kept in
+    extra, so to_dict() round-trips the stored structure.
+    """
+
+    title: str = None
+    thesis_statement: str = ""
+    research_questions: tuple = ()
+    sections: tuple = ()
+    introduction_page_range: PageRange = None
+    conclusion_page_range: PageRange = None
+    extra: dict = field(default_factory=dict)
+    _by_title: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data or {})
+        sections = []
+        next_page = 1
+        for raw in data.pop("sections", None) or []:
+            if not isinstance(raw, dict):
+                continue
+            raw = dict(raw)
+            page_range = PageRange.from_dict(raw.pop("page_range", None))
+            pages = raw.pop("pages", None)
+            pages = _to_pages(
+                pages, float(page_range.pages) if page_range else 1.0
+            )
+            if page_range is None:
+                page_range = PageRange(
+                    next_page, next_page + max(1, math.ceil(pages)) - 1
+                )
+            next_page = page_range.end + 1
+            sections.append(
+                OutlineSection(
+                    title=raw.pop("title", None),
+                    pages=pages,
+                    page_range=page_range,
+                    subsections=tuple(
+                        OutlineSubsection.from_dict(subsection)
+                        for subsection in raw.pop("subsections", None) or []
+                        if isinstance(subsection, dict)
+                    ),
+                    extra=raw,
+                )
+            )
+
+        by_title = {}
+        for section in sections:
+            # The first section wins, as with the linear scans this replaces
+            by_title.setdefault(section.title, section)
+
+        return cls(
+            title=data.pop("title", None),
+            thesis_statement=data.pop("thesis_statement", "") or "",
+            research_questions=tuple(data.pop("research_questions", None) or ()),
+            sections=tuple(sections),
+            introduction_page_range=PageRange.from_dict(
+                data.pop("introduction_page_range", None)
+            ),
+            conclusion_page_range=PageRange.from_dict(
+                data.pop("conclusion_page_range", None)
+            ),
+            extra=data,
+            _by_title=by_title,
+        )
+
+    def section(self, title):
+        """The section with this title, or None"""
+        return self._by_title.get(title)
+
+    @property
+    def section_titles(self):
+        return [section.title for section in self.sections]
+
+    @property
+    def body_sections(self):
+        """Sections other than the introduction and conclusion, in order"""
+        return [
+            section
+            for section in self.sections
+            if not is_framing_section(section.title)
+        ]
+
+    def to_dict(self):
+        """The outline as a new plain dict, in the stored JSON layout"""
+        data = deepcopy(self.extra)
+        if self.title is not None:
+            data["title"] = self.title
+        data["thesis_statement"] = self.thesis_statement
+        data["research_questions"] = list(self.research_questions)
+        data["sections"] = [section.to_dict() for section in self.sections]
+        if self.introduction_page_range:
+            data["introduction_page_range"] = self.introduction_page_range.to_dict()
+        if self.conclusion_page_range:
+            data["conclusion_page_range"] = self.conclusion_page_range.to_dict()
+        return data
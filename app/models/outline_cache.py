@@ -0,0 +1,75 @@
+from collections import OrderedDict
+import json
+import threading
+
+from app.models.outline import Outline
+
+
+class OutlineCache:
+    """
+    Bounded LRU of typed outlines, shared by every request in a worker
+
+    Entries are keyed by (outline id, updated_at) and remember the JSON text
+    they were parsed from; a hit is only served when that text is unchanged,
+    so an edit that has not been flushed yet, or was rolled back, can never be
+    answered with another version's structure.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, outline_id, updated_at, outline_data):
+        """
+        The parsed Outline for this version of an outline
+
+        Returns:
+            Outline: Empty for an outline without data
+        """
+        if not outline_data:
+            return Outline()
+        if outline_id is None:
+            # Not saved yet, so there is no stable key
+            return Outline.from_dict(json.loads(outline_data))
+
+        key = (outline_id, updated_at)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Identity is the common case; equality is a memcmp, far cheaper than decoding
+            if entry is not None and (
+                entry[0] is outline_data or entry[0] == outline_data
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        structure = Outline.from_dict(json.loads(outline_data))
+        with self._lock:
+            self._entries[key] = (outline_data, structure)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return structure
+
+    def invalidate(self, outline_id):
+        """Drop every cached version of an outline"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == outline_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Process-wide cache; OUTLINE_CACHE_SIZE is applied by the app factory
+outline_cache = OutlineCache()
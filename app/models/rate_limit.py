@@ -0,0 +1,22 @@
+from app import db
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket shared by every worker process through the database"""
+
+    __tablename__ = "rate_limit_buckets"
+
+    name = db.Column(db.String(64), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    capacity = db.Column(db.Float, nullable=False)
+    # Tokens added back per second
+    refill_rate = db.Column(db.Float, nullable=False)
+    # Epoch seconds of the last refill
+    updated_at = db.Column(db.Float, nullable=False)
+    # Set after a quota error so that every worker backs off together
+    blocked_until = db.Column(db.Float, nullable=False, default=0.0)
+    # Optimistic concurrency: updates only apply to the version they read
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RateLimitBucket {self.name} {self.tokens:.0f}/{self.capacity:.0f}>"
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 import json
+from app.models.outline_cache import outline_cache
 
 
 class ResearchProject(db.Model):
@@ -43,7 +44,7 @@ class ResearchOutline(db.Model):
 
     def calculate_section_pages(self):
         """Convert string page counts to numbers and validate"""
-        structure = self.get_outline_structure()
+        structure = self.get_outline_structure(mutable=True)
 
         # Convert string page counts to float
         for section in structure.get("sections", []):
@@ -65,11 +66,11 @@ class ResearchOutline(db.Model):
 
     def generate_index(self, language="en"):
         """Generate index (فهرس) for the research"""
-        structure = self.get_outline_structure()
+        outline = self.get_outline()
         index = []
         current_page = 1
 
-        title = structure.get("title", "Research Paper")
+        title = outline.title or "Research Paper"
         index.append({"title": title, "page": current_page})
         current_page += 1
 
@@ -86,50 +87,46 @@ class ResearchOutline(db.Model):
         else:
             intro_title = "المقدمة"
 
-        intro_pages = structure.get("introduction_pages", 1)
-        intro_page_range = structure.get(
-            "introduction_page_range", {"start": current_page}
-        )
-
-        index.append(
-            {"title": intro_title, "page": intro_page_range.get("start", current_page)}
-        )
-        current_page = intro_page_range.get("end", current_page + intro_pages) + 1
+        intro_page_range = outline.introduction_page_range
+        if intro_page_range:
+            index.append({"title": intro_title, "page": intro_page_range.start})
+            current_page = intro_page_range.end + 1
+        else:
+            intro_pages = outline.extra.get("introduction_pages", 1)
+            index.append({"title": intro_title, "page": current_page})
+            current_page = current_page + intro_pages + 1
 
-        for section in structure.get("sections", []):
-            section_title = section.get("title")
-            page_range = section.get("page_range", {"start": current_page})
+        for section in outline.sections:
+            page_range = section.page_range
 
-            index.append(
-                {"title": section_title, "page": page_range.get("start", current_page)}
-            )
+            index.append({"title": section.title, "page": page_range.start})
 
-            for subsection in section.get("subsections", []):
+            for subsection in section.subsections:
                 index.append(
                     {
-                        "title": subsection.get("title"),
-                        "page": page_range.get("start", current_page),
+                        "title": subsection.title,
+                        "page": page_range.start,
                         "indent": True,
                     }
                 )
 
-            current_page = (
-                page_range.get("end", current_page + section.get("pages", 1)) + 1
-            )
+            current_page = page_range.end + 1
 
         if language == "en":
             conclusion_title = "Conclusion"
         else:
             conclusion_title = "الخاتمة"
 
-        conclusion_page_range = structure.get(
-            "conclusion_page_range", {"start": current_page}
-        )
+        conclusion_page_range = outline.conclusion_page_range
 
         index.append(
             {
                 "title": conclusion_title,
-                "page": conclusion_page_range.get("start", current_page),
+                "page": (
+                    conclusion_page_range.start
+                    if conclusion_page_range
+                    else current_page
+                ),
             }
         )
 
@@ -138,7 +135,9 @@ class ResearchOutline(db.Model):
         else:
             references_title = "المراجع"
 
-        current_page = conclusion_page_range.get("end", current_page) + 1
+        if conclusion_page_range:
+            current_page = conclusion_page_range.end
+        current_page += 1
 
         index.append({"title": references_title, "page": current_page})
 
@@ -147,10 +146,29 @@ class ResearchOutline(db.Model):
     def set_outline_structure(self, structure):
         """Set the outline structure from a Python object"""
         self.outline_data = json.dumps(structure)
+        if self.id is not None:
+            outline_cache.invalidate(self.id)
 
-    def get_outline_structure(self):
-        """Get outline structure from JSON data"""
-        return json.loads(self.outline_data) if self.outline_data else {}
+    def get_outline(self):
+        """
+        Get the typed outline
+
+        Built once per outline version and shared through the worker's outline
+        cache; Outline objects are immutable.
+        """
+        return outline_cache.get(self.id, self.updated_at, self.outline_data)
+
+    def get_outline_structure(self, mutable=False):
+        """
+        Get outline structure from JSON data
+
+        Returns a new dict built from the cached typed outline, so page counts
+        and page ranges are normalized. Pass mutable=True for the structure
+        exactly as stored, e.g. to change and save with set_outline_structure.
+        """
+        if mutable:
+            return json.loads(self.outline_data) if self.outline_data else {}
+        return self.get_outline().to_dict()
 
     def get_ordered_sections(self):
         """
@@ -159,14 +177,7 @@ class ResearchOutline(db.Model):
         Returns:
             List of section titles in order
         """
-        structure = self.get_outline_structure()
-        sections = []
-
-        # Add main sections
-        for section in structure.get("sections", []):
-            sections.append(section.get("title"))
-
-        return sections
+        return self.get_outline().section_titles
 
     def __repr__(self):
         return f"<ResearchOutline for Project {self.project_id}>"
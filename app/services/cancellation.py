@@ -0,0 +1,196 @@
+from flask import current_app
+from sqlalchemy import delete, select, update
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import uuid
+
+from app import db
+from app.models.job import GenerationRun
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Finished runs are only kept around for the cancel API to report on
+FINISHED_RUN_TTL = timedelta(days=1)
+
+# Tokens of runs in this process, so a cancel here takes effect at once
+_local_tokens = {}
+_local_tokens_lock = threading.Lock()
+
+
+class GenerationCancelled(BaseException):
+    """
+    Raised inside a generation once its token has been cancelled
+
+    Like asyncio.CancelledError this is not an Exception, so the per-page
+    error handling that turns failures into placeholder text lets it through.
+    """
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for one section generation
+
+    Generation code calls raise_if_cancelled() between pages and before each
+    LLM call. A token started with start() is backed by a GenerationRun row,
+    polled at most every check_interval seconds through its own connection,
+    so it can be checked from worker threads and cancelled from any process.
+    A token made with CancellationToken() only cancels in process.
+    """
+
+    def __init__(self, run_id=None, check_interval=1.0, engine=None):
+        self.run_id = run_id
+        self.check_interval = check_interval
+        self._engine = engine
+        self._event = threading.Event()
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, project_id, outline_id, section_title, run_id=None, job_id=None):
+        """
+        Register a running generation and get its token
+
+        Args:
+            run_id: Id picked by the client so it can cancel the request it is
+                waiting on. An id already in use by another project, or by a
+                running generation, is replaced with a fresh one.
+        """
+        now = datetime.utcnow()
+        db.session.execute(
+            delete(GenerationRun)
+            .where(
+                GenerationRun.status != GenerationRun.STATUS_RUNNING,
+                GenerationRun.updated_at < now - FINISHED_RUN_TTL,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if run_id is not None:
+            existing = db.session.get(GenerationRun, run_id)
+            if existing is not None and (
+                existing.project_id != project_id
+                or existing.status == GenerationRun.STATUS_RUNNING
+            ):
+                run_id = None
+            elif existing is not None:
+                db.session.delete(existing)
+                db.session.flush()
+
+        run_id = run_id or uuid.uuid4().hex
+        db.session.add(
+            GenerationRun(
+                id=run_id,
+                project_id=project_id,
+                outline_id=outline_id,
+                section_title=section_title,
+                job_id=job_id,
+                created_at=now,
+            )
+        )
+        db.session.commit()
+
+        check_interval = current_app.config.get("GENERATION_CANCEL_CHECK_SECONDS", 1.0)
+        token = cls(run_id, check_interval=check_interval, engine=db.engine)
+        with _local_tokens_lock:
+            _local_tokens[run_id] = token
+        return token
+
+    @property
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        if self._engine is None:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+
+        with self._engine.connect() as connection:
+            row = connection.execute(
+                select(GenerationRun.cancel_requested).where(
+                    GenerationRun.id == self.run_id
+                )
+            ).first()
+        # A missing row means the project or outline was deleted under us
+        if row is None or row[0]:
+            self._event.set()
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise GenerationCancelled(f"Generation {self.run_id or ''} was cancelled")
+
+    def cancel(self):
+        """Cancel in this process only; see cancel_runs() for the shared flag"""
+        self._event.set()
+
+    def finish(self, status):
+        """Record how the run ended and stop tracking it"""
+        with _local_tokens_lock:
+            _local_tokens.pop(self.run_id, None)
+        if self.run_id is None:
+            return
+        db.session.execute(
+            update(GenerationRun)
+            .where(GenerationRun.id == self.run_id)
+            .values(status=status, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def cancel_runs(
+        project_id,
+        run_id=None,
+        outline_id=None,
+        section_title=None,
+        job_ids=None,
+        keep_outline_id=None,
+    ):
+        """
+        Ask running generations of a project to stop
+
+        Returns:
+            list: Ids of the runs that were asked to stop
+        """
+        query = select(GenerationRun.id).where(
+            GenerationRun.project_id == project_id,
+            GenerationRun.status == GenerationRun.STATUS_RUNNING,
+        )
+        if run_id is not None:
+            query = query.where(GenerationRun.id == run_id)
+        if outline_id is not None:
+            query = query.where(GenerationRun.outline_id == outline_id)
+        if section_title is not None:
+            query = query.where(GenerationRun.section_title == section_title)
+        if job_ids is not None:
+            query = query.where(GenerationRun.job_id.in_(job_ids))
+        if keep_outline_id is not None:
+            query = query.where(GenerationRun.outline_id != keep_outline_id)
+
+        run_ids = [row_id for (row_id,) in db.session.execute(query)]
+        if not run_ids:
+            return []
+
+        db.session.execute(
+            update(GenerationRun)
+            .where(GenerationRun.id.in_(run_ids))
+            .values(cancel_requested=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        with _local_tokens_lock:
+            for cancelled_id in run_ids:
+                if cancelled_id in _local_tokens:
+                    _local_tokens[cancelled_id].cancel()
+
+        metrics.increment("content.cancellations", len(run_ids))
+        logger.info(f"Cancelling {len(run_ids)} generations of project {project_id}")
+        return run_ids
@@ -0,0 +1,264 @@
+from functools import lru_cache
+import re
+
+from app.models.citation import Citation
+
+# Styles a project can choose; anything else is rendered as APA
+CITATION_STYLES = ("APA", "MLA", "Chicago", "Harvard")
+
+# Rendered references kept per worker process
+FORMAT_CACHE_SIZE = 4096
+
+# Name particles that belong to the surname, in both languages
+NAME_PARTICLES = {"عبد", "أبو", "ابو", "ابن", "بن", "آل", "al", "el", "de", "van", "von"}
+WHITESPACE = re.compile(r"\s+")
+
+BOOK_TYPES = {"book", "كتاب"}
+
+LABELS = {
+    "en": {
+        # Given names shortened to initials where a style asks for them
+        "initials": True,
+        "and": "and",
+        "attach_and": False,
+        "et_al": "et al.",
+        "no_date": "n.d.",
+        "comma": ", ",
+        "quotes": ("“", "”"),
+        "single_quotes": ("'", "'"),
+    },
+    "ar": {
+        "initials": False,
+        "and": "و",
+        # Arabic writes "و" joined to the name that follows
+        "attach_and": True,
+        "et_al": "وآخرون",
+        "no_date": "د.ت.",
+        "comma": "، ",
+        "quotes": ("«", "»"),
+        "single_quotes": ("«", "»"),
+    },
+}
+
+
+def _split_name(name):
+    """(surname, given names) of "Given Surname" or "Surname, Given" """
+    name = WHITESPACE.sub(" ", name).strip()
+    if "," in name:
+        surname, given = name.split(",", 1)
+        return surname.strip(), given.strip()
+
+    parts = name.split(" ")
+    if len(parts) == 1:
+        # An organization or a mononym
+        return name, ""
+    cut = len(parts) - 1
+    while cut > 1 and parts[cut - 1].lower() in NAME_PARTICLES:
+        cut -= 1
+    return " ".join(parts[cut:]), " ".join(parts[:cut])
+
+
+def _initials(given):
+    return " ".join(f"{part[0]}." for part in given.replace("-", " ").split())
+
+
+def _inverted(name, labels, initials=False):
+    surname, given = _split_name(name)
+    if not given:
+        return surname
+    return f"{surname}{labels['comma']}{_initials(given) if initials else given}"
+
+
+def _direct(name):
+    surname, given = _split_name(name)
+    return f"{given} {surname}".strip()
+
+
+def _join(names, labels, serial=True, ampersand=False, inverted_first=False):
+    """
+    Names joined as a list: "A and B", "A, B, and C", or the Arabic "A، وB"
+
+    An inverted first name ("Smith, John") is followed by a comma even when
+    only one more name comes after it.
+    """
+    if len(names) == 1:
+        return names[0]
+    comma = labels["comma"]
+    if labels["attach_and"]:
+        head = comma.join(names[:-1])
+        return f"{head}{comma if len(names) > 2 else ' '}{labels['and']}{names[-1]}"
+    conjunction = "&" if ampersand else labels["and"]
+    final_comma = ampersand or inverted_first or (serial and len(names) > 2)
+    separator = comma if final_comma else " "
+    return f"{comma.join(names[:-1])}{separator}{conjunction} {names[-1]}"
+
+
+def _italic(text, markdown):
+    return f"*{text}*" if markdown and text else text
+
+
+def _sentence(text):
+    """Text ending in a period, without doubling one the title already has"""
+    return text if text.endswith((".", "?", "!", "؟")) else f"{text}."
+
+
+def _apa(authors, year, title, venue, is_book, labels, markdown):
+    initials = labels["initials"]
+    names = [_inverted(name, labels, initials) for name in authors]
+    date = f"({year or labels['no_date']})."
+    if is_book:
+        work = _sentence(_italic(title, markdown))
+        source = _sentence(venue) if venue else ""
+    else:
+        work = _sentence(title)
+        source = _sentence(_italic(venue, markdown)) if venue else ""
+    if not names:
+        # The title takes the author's place
+        return " ".join(part for part in (work, date, source) if part)
+    byline = _sentence(_join(names, labels, ampersand=True))
+    return " ".join(part for part in (byline, date, work, source) if part)
+
+
+def _mla(authors, year, title, venue, is_book, labels, markdown):
+    if len(authors) > 2:
+        byline = f"{_inverted(authors[0], labels)}{labels['comma']}{labels['et_al']}"
+    elif authors:
+        byline = _join(
+            [_inverted(authors[0], labels), *map(_direct, authors[1:])],
+            labels,
+            inverted_first=True,
+        )
+    else:
+        byline = ""
+    opening, closing = labels["quotes"]
+    if is_book:
+        work = _sentence(_italic(title, markdown))
+        container = venue
+    else:
+        work = f"{opening}{_sentence(title)}{closing}"
+        container = _italic(venue, markdown)
+    source = labels["comma"].join(part for part in (container, year) if part)
+    parts = [_sentence(byline) if byline else "", work, _sentence(source) if source else ""]
+    return " ".join(part for part in parts if part)
+
+
+def _chicago(authors, year, title, venue, is_book, labels, markdown):
+    if len(authors) > 10:
+        names = [_inverted(authors[0], labels), *map(_direct, authors[1:7])]
+        byline = f"{labels['comma'].join(names)} {labels['et_al']}"
+    elif authors:
+        byline = _join(
+            [_inverted(authors[0], labels), *map(_direct, authors[1:])],
+            labels,
+            inverted_first=True,
+        )
+    else:
+        byline = ""
+    opening, closing = labels["quotes"]
+    date = _sentence(str(year or labels["no_date"]))
+    if is_book:
+        work = _sentence(_italic(title, markdown))
+        source = _sentence(venue) if venue else ""
+    else:
+        work = f"{opening}{_sentence(title)}{closing}"
+        source = _sentence(_italic(venue, markdown)) if venue else ""
+    parts = [_sentence(byline) if byline else "", date, work, source]
+    return " ".join(part for part in parts if part)
+
+
+def _harvard(authors, year, title, venue, is_book, labels, markdown):
+    initials = labels["initials"]
+    if len(authors) > 3:
+        byline = f"{_inverted(authors[0], labels, initials)} {labels['et_al']}"
+    elif authors:
+        byline = _join(
+            [_inverted(name, labels, initials) for name in authors],
+            labels,
+            serial=False,
+        )
+    else:
+        byline = ""
+    opening, closing = labels["single_quotes"]
+    date = f"({year or labels['no_date']})"
+    if is_book:
+        work = _sentence(_italic(title, markdown))
+        source = _sentence(venue) if venue else ""
+        return " ".join(part for part in (byline, date, work, source) if part)
+    work = f"{opening}{title}{closing}"
+    if venue:
+        work = f"{work}{labels['comma'].rstrip()} {_sentence(_italic(venue, markdown))}"
+    else:
+        work = _sentence(work)
+    return " ".join(part for part in (byline, date, work) if part)
+
+
+FORMATTERS = {
+    "APA": _apa,
+    "MLA": _mla,
+    "Chicago": _chicago,
+    "Harvard": _harvard,
+}
+
+
+def normalize_style(style):
+    """The supported style a project's citation_style refers to"""
+    for name in CITATION_STYLES:
+        if name.lower() == str(style or "").strip().lower():
+            return name
+    return "APA"
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_citation(
+    authors, year, title, venue, source_type, style, language, markdown=True
+):
+    """
+    Render one reference from its fields
+
+    Args:
+        authors: Tuple of author names, "Given Surname" or "Surname, Given"
+        style: APA, MLA, Chicago or Harvard; anything else renders as APA
+        language: "ar" uses Arabic conjunctions, punctuation and quotation
+            marks, and keeps given names in full
+        markdown: Italicize titles and venues with *...*; plain text otherwise
+    """
+    labels = LABELS["ar" if language == "ar" else "en"]
+    is_book = str(source_type or "").strip().lower() in BOOK_TYPES
+    return FORMATTERS[normalize_style(style)](
+        list(authors), year, title, venue, is_book, labels, markdown
+    )
+
+
+def format_reference(citation, style, language="en", markdown=True):
+    """
+    Render a Citation row or a citation dict in a style
+
+    Citations without structured fields, such as those generated before the
+    model returned them, keep the text they were stored with.
+    """
+    fields = (
+        citation.fields if isinstance(citation, Citation) else Citation.fields_of(citation)
+    )
+    if not fields:
+        text = citation.text if isinstance(citation, Citation) else citation.get("text")
+        return text or ""
+    return format_citation(
+        tuple(fields["authors"]),
+        fields["year"],
+        fields["title"],
+        fields["venue"],
+        fields["source_type"],
+        normalize_style(style),
+        language,
+        markdown,
+    )
+
+
+def render_citations(citations, style, language="en"):
+    """Citation dicts with "text" rendered from their fields, where they have them"""
+    rendered = []
+    for citation in citations:
+        if Citation.fields_of(citation):
+            citation = {**citation, "text": format_reference(citation, style, language)}
+        rendered.append(citation)
+    return rendered
@@ -1,30 +1,129 @@
-import google.generativeai as genai
 from flask import current_app
 import logging
 import json
-from app.services.gemini_service import GeminiService
-import gc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from app.services.cancellation import CancellationToken, GenerationCancelled
+from app.services.citation_formatter import render_citations
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.llm_cache import LLMCache, get_llm_cache
+from app.services.llm_client import get_backend, get_model_name
+from app.services.metrics import metrics
+from app.services.page_scheduler import get_page_scheduler
+from app.services.rate_limiter import estimate_tokens, get_rate_limiter
+from app.services.retry_policy import RetryPolicy
+from app.services.section_context import SectionContext, extract_summary
+from app.services.lenient_json import LenientJSONParser, parse_lenient
+from app.services.schemas import (
+    PAGE_SCHEMA,
+    SchemaError,
+    parse_structured,
+    structured_generation_config,
+)
+from app.models.citation import Citation
+from app.models.content import (
+    ResearchContent,
+    ResearchContentPage,
+    SectionBusy,
+    SectionCheckpoint,
+    SectionSummary,
+)
+from app.models.outline import is_framing_section
+from app import db
+import re
+import threading
 import time
-import psutil
-import os
 
 logger = logging.getLogger(__name__)
 
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+]
+
+# Supported values for the generation_mode argument of generate_section_content
+GENERATION_MODES = ("sequential", "fan_out", "batched")
+
+# Smallest share of a full page a short deadline may shrink a page to
+MIN_PAGE_SCALE = 0.5
+# Latency samples needed before they replace CONTENT_PAGE_SECONDS
+PAGE_SECONDS_MIN_SAMPLES = 10
+
+# Delimiters between pages of a batched response
+PAGE_DELIMITER = re.compile(r"^\s*<<<PAGE (\d+)>>>\s*$", re.MULTILINE)
+END_DELIMITER = "<<<END>>>"
+
 
 class ContentService:
     """Service for generating research content"""
 
     def __init__(self):
-        self.gemini_service = GeminiService()
-        self.api_key = current_app.config.get("GEMINI_API_KEY")
-        if not self.api_key:
+        self.generation_mode = current_app.config.get(
+            "CONTENT_GENERATION_MODE", "sequential"
+        )
+        self.fan_out_workers = current_app.config.get("CONTENT_FAN_OUT_WORKERS", 4)
+        self.batch_max_pages = current_app.config.get("CONTENT_BATCH_MAX_PAGES", 4)
+        # Ask for schema-constrained JSON pages and parse them strictly; the
+        # legacy repair pipeline only runs when a response fails validation
+        self.structured_output = current_app.config.get("LLM_STRUCTURED_OUTPUT", False)
+        self.page_generation_config = (
+            structured_generation_config(GENERATION_CONFIG, PAGE_SCHEMA)
+            if self.structured_output
+            else GENERATION_CONFIG
+        )
+        self.model_name = get_model_name("content")
+        self.cache = get_llm_cache(current_app.config)
+        self.rate_limiter = get_rate_limiter(current_app.config)
+        self.retry_policy = RetryPolicy.from_config("content", current_app.config)
+        self.page_scheduler = get_page_scheduler(current_app.config)
+        # Replaced per generation by the caller's token, if it passes one
+        self.cancel_token = CancellationToken()
+        # Likewise the request deadline; off the request path there is none
+        self.deadline = Deadline()
+        self.page_seconds = current_app.config.get("CONTENT_PAGE_SECONDS", 20)
+        self.min_page_seconds = current_app.config.get("CONTENT_MIN_PAGE_SECONDS", 8)
+        # Checkpoint of the run being generated, when pages are persisted,
+        # and the heartbeat that shows other runs it is still alive
+        self.checkpoint = None
+        self.checkpoint_stale_seconds = current_app.config.get(
+            "SECTION_CHECKPOINT_STALE_SECONDS", 120
+        )
+        self._checkpoint_heartbeat = None
+        # Body sections are summarized as they finish; an introduction or
+        # conclusion is written from those summaries
+        self.summary_sentences = current_app.config.get(
+            "CONTENT_SECTION_SUMMARY_SENTENCES", 3
+        )
+        self.body_summaries = ""
+        # Citations are rendered in the section's style as pages are parsed
+        self.citation_style = "APA"
+        self.language = "en"
+        self.backend = get_backend("content")
+        if self.backend is None:
             logger.warning(
                 "Gemini API key not found. Service will not function properly."
             )
-            return
-
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash-lite")
 
     def generate_section_content(
         self,
@@ -35,238 +134,1408 @@ class ContentService:
         citation_style,
         language="en",
         page_by_page=True,
+        generation_mode=None,
+        use_cache=True,
+        persist_pages=False,
+        pages_to_generate=None,
+        cancel_token=None,
+        deadline=None,
     ):
-        """Generate content for a specific section"""
+        """
+        Generate content for a specific section
+
+        Args:
+            generation_mode: "sequential" generates pages one after another, each
+                continuing from the previous text. "fan_out" builds a per-page
+                plan from the outline and generates all pages concurrently.
+                "batched" is sequential but asks for several pages per call.
+                Defaults to the CONTENT_GENERATION_MODE setting.
+            use_cache: Reuse cached Gemini responses for identical prompts. Pass
+                False to force fresh text.
+            persist_pages: Save each page to research_content_pages as soon as
+                it finishes, and checkpoint the run. When an earlier run of the
+                section did not finish, its good pages are kept and generation
+                carries on after them.
+            pages_to_generate: Page numbers to regenerate. Other pages are taken from
+                storage when a good copy exists. None regenerates every page
+                that an unfinished run has not already written.
+            cancel_token: CancellationToken checked between pages and before each
+                LLM call. A cancelled generation returns {"error", "cancelled"};
+                pages saved before that are kept.
+            deadline: Deadline of the request. Pages are shortened to fit in it,
+                and when it runs out the pages written so far come back with
+                "partial" set and the unwritten page numbers in
+                "remaining_pages".
+        """
+        if cancel_token is not None:
+            self.cancel_token = cancel_token
+        if deadline is not None:
+            self.deadline = deadline
+        self.citation_style, self.language = citation_style, language
         try:
-            process = psutil.Process(os.getpid())
-            initial_memory = process.memory_info().rss / 1024 / 1024  # MB
-            logger.info(f"Initial memory usage: {initial_memory:.2f} MB")
-            outline_structure = outline.get_outline_structure()
-            section = None
-            for s in outline_structure.get("sections", []):
-                if s.get("title") == section_title:
-                    section = s
-                    break
+            outline_doc = outline.get_outline()
+            section = outline_doc.section(section_title)
 
             if not section:
                 return {"error": f"Section '{section_title}' not found in outline"}
 
-            pages = section.get("pages", 1)
+            if language not in ("en", "ar"):
+                return {"error": f"Unsupported language: {language}"}
+
+            generation_mode = generation_mode or self.generation_mode
+            if generation_mode not in GENERATION_MODES:
+                return {"error": f"Unsupported generation mode: {generation_mode}"}
+            self.body_summaries = self._body_summaries(
+                outline, outline_doc, section_title
+            )
+
+            pages = section.pages
             words_per_page = 250
             target_words = int(pages * words_per_page)
 
-            page_range = section.get("page_range", {"start": 1, "end": int(pages)})
+            page_range = section.page_range.to_dict()
+            stored_pages = self._reusable_pages(outline, section_title, pages_to_generate)
+            if persist_pages and page_by_page:
+                stored_pages = {
+                    **self._start_checkpoint(
+                        project, outline, section_title, pages_to_generate
+                    ),
+                    **stored_pages,
+                }
 
             # If not generating page by page, use the original approach
             if not page_by_page:
                 if language == "en":
                     prompt = self._create_english_content_prompt(
                         project.title,
-                        outline_structure.get("thesis_statement", ""),
+                        outline_doc.thesis_statement,
                         section_title,
-                        section.get("subsections", []),
+                        section.subsections,
                         citation_style,
                         target_words,
                         page_range,
                     )
-                elif language == "ar":
+                else:
                     prompt = self._create_arabic_content_prompt(
                         project.title,
-                        outline_structure.get("thesis_statement", ""),
+                        outline_doc.thesis_statement,
                         section_title,
-                        section.get("subsections", []),
+                        section.subsections,
                         citation_style,
                         target_words,
                         page_range,
                     )
-                else:
-                    return {"error": f"Unsupported language: {language}"}
 
                 # Generate content with increased timeout
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.7,
-                        "top_p": 0.8,
-                        "top_k": 40,
-                        "max_output_tokens": 2048,
-                    },
-                    safety_settings=[
-                        {
-                            "category": "HARM_CATEGORY_HARASSMENT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                        },
-                        {
-                            "category": "HARM_CATEGORY_HATE_SPEECH",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                        },
-                        {
-                            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                        },
-                        {
-                            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                        },
-                    ],
-                )
+                response_text = self._request_content(prompt, use_cache)
 
                 # Parse the response and include page range
-                content_data = self._parse_content_response(
-                    response.text, section_title, subsection_titles
+                content_data = self._parse_page(
+                    response_text, section_title, subsection_titles
                 )
 
-                return content_data
+                return self._with_summary(content_data)
+
+            # Batched generation: several consecutive pages per request
+            if generation_mode == "batched":
+                return self._with_summary(
+                    self._generate_pages_batched(
+                        project,
+                        outline,
+                        outline_doc,
+                        section,
+                        section_title,
+                        subsection_titles,
+                        citation_style,
+                        language,
+                        words_per_page,
+                        page_range,
+                        use_cache,
+                        persist_pages,
+                        stored_pages,
+                    )
+                )
+
+            # Fan-out generation: plan every page up front, then generate them concurrently
+            if generation_mode == "fan_out":
+                return self._with_summary(
+                    self._generate_pages_fan_out(
+                        project,
+                        outline,
+                        outline_doc,
+                        section,
+                        section_title,
+                        subsection_titles,
+                        citation_style,
+                        language,
+                        words_per_page,
+                        page_range,
+                        use_cache,
+                        persist_pages,
+                        stored_pages,
+                    )
+                )
 
             # Page by page generation approach
             else:
-                # Initialize the combined content data
+                # Initialize the combined content data; page texts are
+                # collected as chunks and joined once the section is done
                 combined_content = {
                     "section_title": section_title,
                     "content": "",
                     "citations": [],
                     "page_range": page_range,
                 }
+                chunks = []
+                seen_citations = set()
 
                 # Calculate the number of pages
                 total_pages = page_range["end"] - page_range["start"] + 1
-                
-                # Reduce batch size for larger sections to prevent memory issues
-                max_pages_per_batch = 2 if total_pages > 5 else 3
-                
-                logger.info(f"Processing {total_pages} pages in batches of {max_pages_per_batch}")
-                
-                for batch_start in range(
-                    page_range["start"], page_range["end"] + 1, max_pages_per_batch
+                # Summary of earlier pages plus the latest text, within a token budget
+                section_context = SectionContext.from_config(current_app.config)
+                page_numbers = list(range(page_range["start"], page_range["end"] + 1))
+                # Pages still to write, which the deadline is shared across
+                unwritten = {n for n in page_numbers if n not in stored_pages}
+                logger.info(f"Processing {total_pages} pages")
+
+                try:
+                    # Batches are sized from memory headroom; the scheduler only
+                    # collects and waits when RSS is close to the budget
+                    for batch in self.page_scheduler.batches(page_numbers):
+                        logger.info(
+                            f"Generating batch from page {batch[0]} to {batch[-1]}"
+                        )
+
+                        for page_num in batch:
+                            self.cancel_token.raise_if_cancelled()
+                            stored_page = stored_pages.get(page_num)
+                            if stored_page is not None:
+                                # Kept from an earlier run; only stale pages are regenerated
+                                page_content = stored_page
+                            else:
+                                current_page = {"start": page_num, "end": page_num}
+                                # Shorter pages when the deadline is close
+                                page_target_words, page_config = self._page_budget(
+                                    len(unwritten), words_per_page
+                                )
+
+                                # Create a prompt for this specific page
+                                prompt = self._create_page_prompt(
+                                    language,
+                                    project.title,
+                                    outline_doc.thesis_statement,
+                                    section_title,
+                                    section.subsections,
+                                    citation_style,
+                                    page_target_words,
+                                    current_page,
+                                    page_num - page_range["start"] + 1,
+                                    total_pages,
+                                    section_context.render(),
+                                )
+
+                                try:
+                                    start_time = time.time()
+
+                                    with self.page_scheduler.track():
+                                        response_text = self._request_content(
+                                            prompt,
+                                            use_cache,
+                                            generation_config=page_config,
+                                        )
+
+                                        elapsed_time = time.time() - start_time
+                                        logger.info(
+                                            f"Page generation took {elapsed_time:.2f} seconds"
+                                        )
+
+                                        page_content = self._parse_page(
+                                            response_text,
+                                            section_title,
+                                            subsection_titles,
+                                        )
+                                except DeadlineExceeded:
+                                    # Left unsaved, so a later run writes it
+                                    raise
+                                except Exception as page_error:
+                                    logger.error(
+                                        f"Error generating page {page_num}: {str(page_error)}"
+                                    )
+                                    unwritten.discard(page_num)
+                                    if persist_pages:
+                                        self._save_page(
+                                            project.id,
+                                            outline.id,
+                                            section_title,
+                                            page_num,
+                                            prompt,
+                                            error=str(page_error),
+                                        )
+                                    chunks.append(
+                                        f"[Content generation for page {page_num} failed: {str(page_error)}]"
+                                    )
+                                    continue
+
+                                unwritten.discard(page_num)
+                                if persist_pages:
+                                    self._save_page(
+                                        project.id,
+                                        outline.id,
+                                        section_title,
+                                        page_num,
+                                        prompt,
+                                        page_content,
+                                    )
+
+                            section_context.add_page(page_content.get("content", ""))
+                            chunks.append(page_content.get("content", ""))
+
+                            self._merge_citations(
+                                combined_content["citations"],
+                                seen_citations,
+                                page_content.get("citations", []),
+                            )
+                except DeadlineExceeded:
+                    combined_content["content"] = "\n\n".join(chunks)
+                    return self._partial_result(combined_content, unwritten)
+
+                combined_content["content"] = "\n\n".join(chunks)
+                logger.info(
+                    f"Section finished at {self.page_scheduler.rss_mb():.2f} MB RSS "
+                    f"(~{self.page_scheduler.page_cost_mb:.2f} MB per page)"
+                )
+                return self._with_summary(combined_content)
+        except GenerationCancelled:
+            logger.info(f"Generation of '{section_title}' was cancelled")
+            return {"error": "Generation cancelled", "cancelled": True}
+        except SectionBusy as e:
+            return {"error": str(e), "in_progress": True}
+        except Exception as e:
+            logger.error(f"Error generating section content: {str(e)}")
+            return {"error": str(e)}
+        finally:
+            self._stop_checkpoint_heartbeat()
+
+    def stream_section_content(
+        self,
+        project,
+        outline,
+        section_title,
+        subsection_titles,
+        citation_style,
+        language="en",
+        use_cache=True,
+        persist_pages=False,
+        cancel_token=None,
+        deadline=None,
+    ):
+        """
+        Generate a section page by page, yielding progress as Gemini streams it
+
+        With persist_pages, each page is saved as soon as it is parsed, and the
+        good pages of an unfinished earlier run are replayed instead of being
+        generated again. A cancel_token is checked between pages and while
+        text streams in. Pages
+        are shortened to fit in the deadline, and the stream ends with
+        "partial" instead of "complete" when it runs out.
+
+        Yields:
+            tuple: (event, data) where event is one of
+                "page_start"    - {"page", "total_pages"}
+                "delta"         - {"page", "text"}: newly streamed page text
+                "page_complete" - {"page", "content"}: the parsed page
+                "page_error"    - {"page", "error"}
+                "complete"      - the combined content data, including citations
+                "partial"       - the pages written before the deadline, as
+                                  from generate_section_content
+                "cancelled"     - {"page"}: the page being generated when stopped
+                "error"         - {"error"}, with "in_progress" set when
+                                  another run is generating the section
+        """
+        try:
+            yield from self._stream_section_content(
+                project,
+                outline,
+                section_title,
+                subsection_titles,
+                citation_style,
+                language,
+                use_cache,
+                persist_pages,
+                cancel_token,
+                deadline,
+            )
+        finally:
+            # However the stream ends, including the client going away
+            self._stop_checkpoint_heartbeat()
+
+    def _stream_section_content(
+        self,
+        project,
+        outline,
+        section_title,
+        subsection_titles,
+        citation_style,
+        language,
+        use_cache,
+        persist_pages,
+        cancel_token,
+        deadline,
+    ):
+        if cancel_token is not None:
+            self.cancel_token = cancel_token
+        if deadline is not None:
+            self.deadline = deadline
+        self.citation_style, self.language = citation_style, language
+        outline_doc = outline.get_outline()
+        section = outline_doc.section(section_title)
+
+        if not section:
+            yield "error", {"error": f"Section '{section_title}' not found in outline"}
+            return
+
+        if language not in ("en", "ar"):
+            yield "error", {"error": f"Unsupported language: {language}"}
+            return
+        self.body_summaries = self._body_summaries(outline, outline_doc, section_title)
+
+        words_per_page = 250
+        page_range = section.page_range.to_dict()
+        total_pages = page_range["end"] - page_range["start"] + 1
+
+        combined_content = {
+            "section_title": section_title,
+            "content": "",
+            "citations": [],
+            "page_range": page_range,
+        }
+        page_texts = []
+        seen_citations = set()
+        section_context = SectionContext.from_config(current_app.config)
+        try:
+            stored_pages = (
+                self._start_checkpoint(project, outline, section_title, None)
+                if persist_pages
+                else {}
+            )
+        except SectionBusy as e:
+            yield "error", {"error": str(e), "in_progress": True}
+            return
+        unwritten = {
+            n
+            for n in range(page_range["start"], page_range["end"] + 1)
+            if n not in stored_pages
+        }
+
+        def assembled():
+            combined_content["content"] = "\n\n".join(page_texts)
+            return combined_content
+
+        def add_page(page_content):
+            section_context.add_page(page_content.get("content", ""))
+            page_texts.append(page_content.get("content", ""))
+            self._merge_citations(
+                combined_content["citations"],
+                seen_citations,
+                page_content.get("citations", []),
+            )
+
+        for page_num in range(page_range["start"], page_range["end"] + 1):
+            page_index = page_num - page_range["start"] + 1
+            if self.cancel_token.cancelled:
+                logger.info(f"Streaming of '{section_title}' was cancelled")
+                yield "cancelled", {"page": page_index}
+                return
+
+            if page_num in stored_pages:
+                # Written by the unfinished run this one resumes
+                add_page(stored_pages[page_num])
+                yield "page_start", {"page": page_index, "total_pages": total_pages}
+                yield "page_complete", {
+                    "page": page_index,
+                    "content": stored_pages[page_num].get("content", ""),
+                }
+                continue
+
+            try:
+                page_words, page_config = self._page_budget(
+                    len(unwritten), words_per_page
+                )
+            except DeadlineExceeded:
+                yield "partial", self._partial_result(assembled(), unwritten)
+                return
+            yield "page_start", {"page": page_index, "total_pages": total_pages}
+
+            prompt = self._create_page_prompt(
+                language,
+                project.title,
+                outline_doc.thesis_statement,
+                section_title,
+                section.subsections,
+                citation_style,
+                page_words,
+                {"start": page_num, "end": page_num},
+                page_index,
+                total_pages,
+                section_context.render(),
+            )
+
+            try:
+                chunks = []
+                parser = LenientJSONParser("{")
+                streamed_length = 0
+                for chunk in self._stream_content(
+                    prompt, use_cache, generation_config=page_config
                 ):
-                    batch_end = min(
-                        batch_start + max_pages_per_batch - 1, page_range["end"]
+                    chunks.append(chunk)
+                    parser.feed(chunk)
+
+                    # Only forward the text of the "content" field, not the JSON around it
+                    delta = parser.field_text("content", streamed_length)
+                    if delta:
+                        yield "delta", {"page": page_index, "text": delta}
+                        streamed_length += len(delta)
+
+                page_content = self._parse_page(
+                    "".join(chunks), section_title, subsection_titles
+                )
+            except GenerationCancelled:
+                logger.info(f"Streaming of '{section_title}' was cancelled")
+                yield "cancelled", {"page": page_index}
+                return
+            except DeadlineExceeded:
+                # The half-streamed page is dropped; a later run writes it again
+                yield "partial", self._partial_result(assembled(), unwritten)
+                return
+            except Exception as page_error:
+                logger.error(f"Error streaming page {page_num}: {str(page_error)}")
+                unwritten.discard(page_num)
+                if persist_pages:
+                    self._save_page(
+                        project.id,
+                        outline.id,
+                        section_title,
+                        page_num,
+                        prompt,
+                        error=str(page_error),
                     )
-                    logger.info(f"Generating batch from page {batch_start} to {batch_end}")
-                    
-                    for page_num in range(batch_start, batch_end + 1):
-                        current_page = {"start": page_num, "end": page_num}
-                        # Words per page
-                        page_target_words = words_per_page
-
-                        # Create a prompt for this specific page
-                        if language == "en":
-                            prompt = self._create_english_page_prompt(
-                                project.title,
-                                outline_structure.get("thesis_statement", ""),
-                                section_title,
-                                section.get("subsections", []),
-                                citation_style,
-                                page_target_words,
-                                current_page,
-                                page_num - page_range["start"] + 1,
-                                total_pages,
-                                combined_content["content"],
-                            )
-                        elif language == "ar":
-                            prompt = self._create_arabic_page_prompt(
-                                project.title,
-                                outline_structure.get("thesis_statement", ""),
-                                section_title,
-                                section.get("subsections", []),
-                                citation_style,
-                                page_target_words,
-                                current_page,
-                                page_num - page_range["start"] + 1,
-                                total_pages,
-                                combined_content["content"],
-                            )
-                        else:
-                            return {"error": f"Unsupported language: {language}"}
+                page_texts.append(
+                    f"[Content generation for page {page_num} failed: {str(page_error)}]"
+                )
+                yield "page_error", {"page": page_index, "error": str(page_error)}
+                continue
 
-                        try:
-                            start_time = time.time()
+            unwritten.discard(page_num)
+            if persist_pages:
+                self._save_page(
+                    project.id, outline.id, section_title, page_num, prompt, page_content
+                )
+            add_page(page_content)
 
-                            response = self.model.generate_content(
-                                prompt,
-                                generation_config={
-                                    "temperature": 0.7,
-                                    "top_p": 0.8,
-                                    "top_k": 40,
-                                    "max_output_tokens": 2048,
-                                },
-                                safety_settings=[
-                                    {
-                                        "category": "HARM_CATEGORY_HARASSMENT",
-                                        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                                    },
-                                    {
-                                        "category": "HARM_CATEGORY_HATE_SPEECH",
-                                        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                                    },
-                                    {
-                                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                                        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                                    },
-                                    {
-                                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                                        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-                                    },
-                                ],
-                            )
+            yield "page_complete", {
+                "page": page_index,
+                "content": page_content.get("content", ""),
+            }
 
-                            elapsed_time = time.time() - start_time
-                            logger.info(f"Page generation took {elapsed_time:.2f} seconds")
+        yield "complete", self._with_summary(assembled())
 
-                            page_content = self._parse_content_response(
-                                response.text, section_title, subsection_titles
-                            )
+    def _stream_content(self, prompt, use_cache=True, generation_config=None):
+        """Send a content prompt to Gemini and yield the response text as it arrives"""
+        generation_config = generation_config or self.page_generation_config
+        cache_key = LLMCache.make_key(self.model_name, prompt, generation_config)
+        cached = self._cached_response(cache_key, use_cache, self._is_page_response)
+        if cached is not None:
+            yield cached
+            return
 
-                            if page_num > page_range["start"]:
-                                combined_content["content"] += "\n\n"
-                            combined_content["content"] += page_content.get(
-                                "content", ""
-                            )
+        prompt_tokens = estimate_tokens(prompt)
+        slot = (
+            self.rate_limiter.slot(
+                prompt_tokens + self._max_output_tokens(generation_config),
+                self.deadline.remaining(),
+            )
+            if self.rate_limiter
+            else nullcontext()
+        )
+        self.cancel_token.raise_if_cancelled()
+        self.deadline.raise_if_expired()
+        chunks = []
+        with slot as permit:
+            for text in self.backend.stream(
+                prompt,
+                generation_config=generation_config,
+                safety_settings=SAFETY_SETTINGS,
+            ):
+                # Stop reading a long response as soon as nobody wants it
+                self.cancel_token.raise_if_cancelled()
+                self.deadline.raise_if_expired()
+                chunks.append(text)
+                yield text
+            if permit:
+                permit.record(prompt_tokens + estimate_tokens("".join(chunks)))
+
+        self._cache_response(cache_key, "".join(chunks), self._is_page_response)
+
+    def _request_content(
+        self, prompt, use_cache=True, generation_config=None, cacheable=None
+    ):
+        """
+        Send a content prompt to Gemini and return the raw response text
+
+        generation_config defaults to the (schema-constrained) page config.
+        cacheable tells whether a response is complete enough to cache; by
+        default it must be a whole JSON page.
+        """
+        generation_config = generation_config or self.page_generation_config
+        cacheable = cacheable or self._is_page_response
+        cache_key = LLMCache.make_key(self.model_name, prompt, generation_config)
+        cached = self._cached_response(cache_key, use_cache, cacheable)
+        if cached is not None:
+            return cached
+
+        def send():
+            # Checked again after any wait for quota
+            self.cancel_token.raise_if_cancelled()
+            return self.backend.generate(
+                prompt,
+                generation_config=generation_config,
+                safety_settings=SAFETY_SETTINGS,
+            )
+
+        # Wait for cluster-wide quota rather than failing the page with a 429,
+        # but not past the request deadline
+        quota = (
+            self.rate_limiter.quota(prompt, self._max_output_tokens(generation_config))
+            if self.rate_limiter
+            else None
+        )
+
+        # Transient errors are retried and slow calls timed out (and optionally
+        # hedged) so one bad request does not stall or break the section; every
+        # attempt is also cut short at the request deadline
+        self.cancel_token.raise_if_cancelled()
+        response_text = self.retry_policy.call(send, self.deadline, quota)
+
+        self._cache_response(cache_key, response_text, cacheable)
+        return response_text
+
+    def _cached_response(self, cache_key, use_cache, cacheable):
+        """A cached response, or None; entries that no longer parse are dropped"""
+        if not (self.cache and use_cache):
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None and not cacheable(cached):
+            self.cache.delete(cache_key)
+            return None
+        return cached
+
+    def _cache_response(self, cache_key, response_text, cacheable):
+        """
+        Cache a response only if it parses
+
+        A truncated or malformed reply would otherwise be replayed to every
+        retry and regeneration instead of being asked for again.
+        """
+        if not self.cache or not response_text:
+            return
+        if cacheable(response_text):
+            self.cache.set(cache_key, self.model_name, response_text)
+        else:
+            metrics.increment("llm.cache.uncacheable")
+
+    @staticmethod
+    def _is_page_response(response_text):
+        """Whether a page response holds a complete JSON object with its content"""
+        parser = LenientJSONParser("{")
+        parser.feed(response_text)
+        return parser.done and isinstance((parser.root or {}).get("content"), str)
+
+    def _max_output_tokens(self, generation_config):
+        return (generation_config or {}).get(
+            "max_output_tokens", GENERATION_CONFIG["max_output_tokens"]
+        )
+
+    def _expected_page_seconds(self):
+        """Typical time for one full page: the recent median latency, once known"""
+        if metrics.sample_count("llm.content.latency") >= PAGE_SECONDS_MIN_SAMPLES:
+            return metrics.percentile("llm.content.latency", 50)
+        return self.page_seconds
+
+    def _page_budget(self, rounds_left, words_per_page):
+        """
+        Size the next page to its share of the time left before the deadline
+
+        Args:
+            rounds_left: Page generations still to run one after another,
+                including this one
+            words_per_page: Target length of a full page
+
+        Returns:
+            tuple: (target words, page generation config). Both are scaled down,
+            to no less than MIN_PAGE_SCALE, when the share of time left per
+            page is shorter than a full page usually takes.
+
+        Raises:
+            DeadlineExceeded: Too little time is left to start another page
+        """
+        if not self.deadline.bounded:
+            return words_per_page, self.page_generation_config
+
+        if self.deadline.remaining() < self.min_page_seconds:
+            raise DeadlineExceeded(
+                f"{self.deadline.remaining():.1f}s left, too little for another page"
+            )
+
+        scale = self.deadline.share(rounds_left) / self._expected_page_seconds()
+        if scale >= 1:
+            return words_per_page, self.page_generation_config
+
+        scale = max(MIN_PAGE_SCALE, scale)
+        metrics.increment("content.deadline.shrunk_pages")
+        generation_config = dict(
+            self.page_generation_config,
+            max_output_tokens=int(GENERATION_CONFIG["max_output_tokens"] * scale),
+        )
+        return int(words_per_page * scale), generation_config
+
+    def _partial_result(self, content_data, remaining_pages):
+        """
+        Mark the pages written before the deadline as a partial section
+
+        The finished pages are in order and, with persist_pages, already
+        stored, so regenerating the missing pages completes the section.
+        """
+        logger.warning(
+            f"Deadline reached for '{content_data['section_title']}'; "
+            f"{len(remaining_pages)} pages left"
+        )
+        metrics.increment("content.deadline.partial_sections")
+        content_data["partial"] = True
+        content_data["remaining_pages"] = sorted(remaining_pages)
+        return content_data
+
+    def _generate_pages_fan_out(
+        self,
+        project,
+        outline,
+        outline_doc,
+        section,
+        section_title,
+        subsection_titles,
+        citation_style,
+        language,
+        words_per_page,
+        page_range,
+        use_cache=True,
+        persist_pages=False,
+        stored_pages=None,
+    ):
+        """
+        Generate all pages of a section concurrently against a shared page plan
+
+        Pages do not depend on each other's text, so the section takes roughly as
+        long as its slowest page instead of the sum of all pages. Pages that
+        cannot start or finish before the deadline are left out of the result
+        and listed in "remaining_pages".
+        """
+        total_pages = page_range["end"] - page_range["start"] + 1
+        page_plan = self._build_page_plan(section, total_pages)
+        stored_pages = stored_pages or {}
+
+        # Read ORM attributes here; worker threads run outside the app context
+        title = project.title
+        thesis = outline_doc.thesis_statement
+        project_id, outline_id = project.id, outline.id
+
+        def generate_page(page_index):
+            self.cancel_token.raise_if_cancelled()
+            if self.deadline.remaining() < self.min_page_seconds:
+                raise DeadlineExceeded("Too little time left for another page")
+            page_num = page_range["start"] + page_index
+            prompt = self._create_page_prompt(
+                language,
+                title,
+                thesis,
+                section_title,
+                section.subsections,
+                citation_style,
+                page_words,
+                {"start": page_num, "end": page_num},
+                page_index + 1,
+                total_pages,
+                page_plan=page_plan,
+            )
+            start_time = time.time()
+            try:
+                response_text = self._request_content(
+                    prompt, use_cache, generation_config=page_config
+                )
+                logger.info(
+                    f"Page {page_num} generation took {time.time() - start_time:.2f} seconds"
+                )
+                return prompt, self._parse_page(
+                    response_text, section_title, subsection_titles
+                ), None
+            except DeadlineExceeded:
+                raise
+            except Exception as page_error:
+                logger.error(f"Error generating page {page_num}: {str(page_error)}")
+                return prompt, None, str(page_error)
+
+        page_numbers = [
+            page_range["start"] + page_index for page_index in range(total_pages)
+        ]
+        results = {
+            page_num: stored_pages[page_num]
+            for page_num in page_numbers
+            if page_num in stored_pages
+        }
+        todo = [page_num for page_num in page_numbers if page_num not in results]
+
+        # As many workers as memory headroom allows, up to the configured count
+        self.page_scheduler.wait_for_headroom()
+        workers = self.page_scheduler.concurrency(len(todo), self.fan_out_workers) or 1
+        logger.info(f"Fanning out {len(todo)} pages across {workers} workers")
+
+        # Pages run in rounds of one per worker; each round gets its share
+        remaining_pages = []
+        try:
+            page_words, page_config = self._page_budget(
+                -(-len(todo) // workers), words_per_page
+            )
+        except DeadlineExceeded:
+            remaining_pages, todo = todo, []
+
+        with self.page_scheduler.track(len(todo)), ThreadPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            futures = {
+                executor.submit(generate_page, page_num - page_range["start"]): page_num
+                for page_num in todo
+            }
+
+            # Save pages as they finish; the session is only used on this thread
+            for future in as_completed(futures):
+                page_num = futures[future]
+                try:
+                    prompt, page_content, error = future.result()
+                except DeadlineExceeded:
+                    remaining_pages.append(page_num)
+                    continue
+                results[page_num] = page_content or (
+                    f"[Content generation for page {page_num} failed: {error}]"
+                )
+                if persist_pages:
+                    self._save_page(
+                        project_id,
+                        outline_id,
+                        section_title,
+                        page_num,
+                        prompt,
+                        page_content,
+                        error,
+                    )
+
+        # Stitch the pages back together in page order
+        page_texts = []
+        citations = []
+        seen_citations = set()
+        for page_num in page_numbers:
+            page_content = results.get(page_num)
+            if page_content is None:
+                continue
+            if isinstance(page_content, str):
+                page_texts.append(page_content)
+                continue
+
+            page_texts.append(page_content.get("content", ""))
+            self._merge_citations(
+                citations, seen_citations, page_content.get("citations", [])
+            )
+
+        content_data = {
+            "section_title": section_title,
+            "content": "\n\n".join(page_texts),
+            "citations": citations,
+            "page_range": page_range,
+        }
+        if remaining_pages:
+            return self._partial_result(content_data, remaining_pages)
+        return content_data
+
+    def _pages_per_batch(self, language, words_per_page):
+        """How many pages fit in one response under max_output_tokens"""
+        # Gemini spends noticeably more tokens per Arabic word; the flat part
+        # covers the JSON wrapper and citations of each page
+        tokens_per_word = 2.5 if language == "ar" else 1.4
+        page_tokens = words_per_page * tokens_per_word + 200
+        fit = int(GENERATION_CONFIG["max_output_tokens"] * 0.9 // page_tokens)
+        return max(1, min(self.batch_max_pages, fit))
+
+    def _generate_pages_batched(
+        self,
+        project,
+        outline,
+        outline_doc,
+        section,
+        section_title,
+        subsection_titles,
+        citation_style,
+        language,
+        words_per_page,
+        page_range,
+        use_cache=True,
+        persist_pages=False,
+        stored_pages=None,
+    ):
+        """
+        Generate a section a few pages per request
 
-                            for citation in page_content.get("citations", []):
-                                citation_exists = False
-                                for existing_citation in combined_content["citations"]:
-                                    if existing_citation.get("id") == citation.get(
-                                        "id"
-                                    ):
-                                        citation_exists = True
-                                        break
+        Each request shares one copy of the thesis, plan and instructions across
+        its pages, and asks for the pages separated by <<<PAGE n>>> lines. Pages
+        missing or malformed in the response are generated again on their own.
+        Batches are cut to what the deadline leaves time for, and pages after
+        the deadline are left out like in sequential generation.
+        """
+        total_pages = page_range["end"] - page_range["start"] + 1
+        page_plan = self._build_page_plan(section, total_pages)
+        stored_pages = stored_pages or {}
+        pages_per_batch = self._pages_per_batch(language, words_per_page)
+        thesis = outline_doc.thesis_statement
+        section_context = SectionContext.from_config(current_app.config)
+        logger.info(f"Generating {total_pages} pages in batches of {pages_per_batch}")
+
+        page_texts = []
+        citations = []
+        seen_citations = set()
+        unwritten = {
+            n
+            for n in range(page_range["start"], page_range["end"] + 1)
+            if n not in stored_pages
+        }
+
+        def add_page(page_content):
+            section_context.add_page(page_content.get("content", ""))
+            page_texts.append(page_content.get("content", ""))
+            self._merge_citations(
+                citations, seen_citations, page_content.get("citations", [])
+            )
 
-                                if not citation_exists:
-                                    combined_content["citations"].append(citation)
+        page_num = page_range["start"]
+        partial = False
+        try:
+            while page_num <= page_range["end"]:
+                self.cancel_token.raise_if_cancelled()
+                if page_num in stored_pages:
+                    add_page(stored_pages[page_num])
+                    page_num += 1
+                    continue
+
+                # Shorter pages when the deadline is close, and no more of
+                # them per request than there is time for
+                page_words, page_config = self._page_budget(
+                    len(unwritten), words_per_page
+                )
+                pages_in_time = pages_per_batch
+                if self.deadline.bounded:
+                    pages_in_time = max(
+                        1,
+                        int(self.deadline.remaining() // self._expected_page_seconds()),
+                    )
+                self.page_scheduler.wait_for_headroom()
+                batch_limit = self.page_scheduler.batch_size(
+                    page_range["end"] - page_num + 1,
+                    min(pages_per_batch, pages_in_time),
+                )
+                batch = []
+                while (
+                    page_num <= page_range["end"]
+                    and page_num not in stored_pages
+                    and len(batch) < batch_limit
+                ):
+                    batch.append(page_num)
+                    page_num += 1
+
+                batch_pages = {}
+                prompt = None
+                if len(batch) > 1:
+                    page_indices = [n - page_range["start"] + 1 for n in batch]
+                    prompt = self._create_batch_prompt(
+                        language,
+                        project.title,
+                        thesis,
+                        section_title,
+                        section.subsections,
+                        citation_style,
+                        page_words,
+                        page_indices,
+                        total_pages,
+                        section_context.render(),
+                        page_plan,
+                    )
+                    try:
+                        with self.page_scheduler.track(len(batch)):
+                            # Delimited pages are not one JSON document, so no schema here
+                            response_text = self._request_content(
+                                prompt,
+                                use_cache,
+                                generation_config=GENERATION_CONFIG,
+                                cacheable=lambda text: set(page_indices)
+                                <= set(self._split_batch_response(text)),
+                            )
+                            blocks = self._split_batch_response(response_text)
+                            for batch_page, page_index in zip(batch, page_indices):
+                                page_content = self._parse_batch_page(
+                                    blocks.get(page_index), section_title
+                                )
+                                if page_content:
+                                    batch_pages[batch_page] = page_content
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as batch_error:
+                        logger.error(
+                            f"Error generating pages {batch[0]}-{batch[-1]}: {str(batch_error)}"
+                        )
 
+                for batch_page in batch:
+                    page_content = batch_pages.get(batch_page)
+                    page_prompt = prompt
+                    if page_content is None:
+                        # Fall back to a request for just this page
+                        if len(batch) > 1:
+                            metrics.increment("content.batch_fallback_pages")
+                        page_words, page_config = self._page_budget(
+                            len(unwritten), words_per_page
+                        )
+                        page_prompt = self._create_page_prompt(
+                            language,
+                            project.title,
+                            thesis,
+                            section_title,
+                            section.subsections,
+                            citation_style,
+                            page_words,
+                            {"start": batch_page, "end": batch_page},
+                            batch_page - page_range["start"] + 1,
+                            total_pages,
+                            section_context.render(),
+                        )
+                        try:
+                            response_text = self._request_content(
+                                page_prompt, use_cache, generation_config=page_config
+                            )
+                            page_content = self._parse_page(
+                                response_text, section_title, subsection_titles
+                            )
+                        except DeadlineExceeded:
+                            raise
                         except Exception as page_error:
                             logger.error(
-                                f"Error generating page {page_num}: {str(page_error)}"
+                                f"Error generating page {batch_page}: {str(page_error)}"
+                            )
+                            unwritten.discard(batch_page)
+                            if persist_pages:
+                                self._save_page(
+                                    project.id,
+                                    outline.id,
+                                    section_title,
+                                    batch_page,
+                                    page_prompt,
+                                    error=str(page_error),
+                                )
+                            page_texts.append(
+                                f"[Content generation for page {batch_page} failed: {str(page_error)}]"
                             )
-                            combined_content[
-                                "content"
-                            ] += f"\n\n[Content generation for page {page_num} failed: {str(page_error)}]\n\n"
                             continue
-                    
-                    # Force garbage collection after each batch
-                    gc.collect()
-                    
-                    # Log memory usage after each batch
-                    current_memory = process.memory_info().rss / 1024 / 1024  # MB
-                    memory_diff = current_memory - initial_memory
-                    logger.info(
-                        f"Memory after batch {batch_start}-{batch_end}: {current_memory:.2f} MB (change: {memory_diff:+.2f} MB)"
-                    )
-                    
-                    # Add a small delay between batches to allow memory cleanup
-                    time.sleep(1)
-                
-                # Final memory usage report
-                current_memory = process.memory_info().rss / 1024 / 1024  # MB
-                memory_diff = current_memory - initial_memory
-                logger.info(
-                    f"Final memory usage: {current_memory:.2f} MB (change: {memory_diff:+.2f} MB)"
+
+                    unwritten.discard(batch_page)
+                    if persist_pages:
+                        self._save_page(
+                            project.id,
+                            outline.id,
+                            section_title,
+                            batch_page,
+                            page_prompt,
+                            page_content,
+                        )
+                    add_page(page_content)
+        except DeadlineExceeded:
+            partial = True
+
+        content_data = {
+            "section_title": section_title,
+            "content": "\n\n".join(page_texts),
+            "citations": citations,
+            "page_range": page_range,
+        }
+        if partial:
+            return self._partial_result(content_data, unwritten)
+        return content_data
+
+    def _split_batch_response(self, response_text):
+        """
+        Split a batched response on its <<<PAGE n>>> delimiters
+
+        Returns:
+            dict: page index -> the text of that page's block
+        """
+        end = response_text.find(END_DELIMITER)
+        if end >= 0:
+            response_text = response_text[:end]
+
+        matches = list(PAGE_DELIMITER.finditer(response_text))
+        blocks = {}
+        for i, match in enumerate(matches):
+            block_end = (
+                matches[i + 1].start() if i + 1 < len(matches) else len(response_text)
+            )
+            blocks[int(match.group(1))] = response_text[match.end() : block_end].strip()
+        return blocks
+
+    def _parse_batch_page(self, block, section_title):
+        """
+        Validate one page of a batched response
+
+        Returns:
+            dict: The page content data, or None if the block is missing or not
+            a well-formed page (the caller then regenerates the page alone)
+        """
+        if not block:
+            return None
+
+        try:
+            page = parse_structured(block, PAGE_SCHEMA)
+        except SchemaError:
+            return None
+
+        if not page["content"].strip():
+            return None
+        return self._normalize_page(page, section_title)
+
+    def _parse_page(self, response_text, section_title, subsection_titles):
+        """
+        Parse one generated page
+
+        Structured responses are validated against PAGE_SCHEMA; anything that
+        fails goes through the legacy repair pipeline, counted in metrics.
+        """
+        if self.structured_output:
+            try:
+                page = parse_structured(response_text, PAGE_SCHEMA)
+                metrics.increment("content.parse.structured")
+                return self._normalize_page(page, section_title)
+            except SchemaError as e:
+                metrics.increment("content.parse.fallback")
+                logger.warning(
+                    f"Structured page for {section_title} failed validation ({str(e)}), "
+                    "falling back to repair"
                 )
-                return combined_content
+
+        content_data = self._parse_content_response(
+            response_text, section_title, subsection_titles
+        )
+        content_data["citations"] = render_citations(
+            content_data.get("citations") or [], self.citation_style, self.language
+        )
+        return content_data
+
+    def _merge_citations(self, merged, seen, citations):
+        """Append the citations not seen yet, matched as the registry matches them"""
+        for citation in citations:
+            identity = Citation.identity(citation)
+            key = Citation.hash_text(identity) if identity else citation.get("id")
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(citation)
+
+    def _normalize_page(self, page, section_title):
+        """Shape a validated page like the rest of the pipeline expects"""
+        return {
+            "section_title": page.get("section_title") or section_title,
+            "content": page["content"],
+            "citations": render_citations(
+                [
+                    citation
+                    for citation in page["citations"]
+                    if isinstance(citation, dict)
+                ],
+                self.citation_style,
+                self.language,
+            ),
+        }
+
+    def _summarize(self, content):
+        return " ".join(extract_summary(content, self.summary_sentences))
+
+    def _with_summary(self, content_data):
+        """Attach a short summary to a finished body section, for store_section"""
+        if (
+            "error" not in content_data
+            and not content_data.get("partial")
+            and not is_framing_section(content_data.get("section_title"))
+        ):
+            content_data["summary"] = self._summarize(content_data.get("content", ""))
+        return content_data
+
+    def _body_summaries(self, outline, outline_doc, section_title):
+        """
+        The outline's written body sections as summary lines, for an
+        introduction or conclusion prompt; empty for any other section
+
+        Stored summaries are used while they still match the section text;
+        sections stored without one, or edited since, are summarized here.
+        """
+        if not is_framing_section(section_title):
+            return ""
+
+        summaries = SectionSummary.for_outline(outline.id)
+        contents = {
+            row.section_title: row.content
+            for row in ResearchContent.query.filter_by(outline_id=outline.id)
+        }
+        lines = []
+        for section in outline_doc.body_sections:
+            content = contents.get(section.title)
+            if not content:
+                continue
+            summary = summaries.get(section.title)
+            text = (
+                summary.summary
+                if summary and summary.summarizes(content)
+                else self._summarize(content)
+            )
+            lines.append(f"- {section.title}: {text}")
+        return "\n".join(lines)
+
+    def _reusable_pages(self, outline, section_title, pages_to_generate):
+        """
+        Stored pages to keep when only some pages of a section are regenerated
+
+        Returns:
+            dict: page number -> page content data for every good stored page
+            outside pages_to_generate; empty when every page is regenerated
+        """
+        if pages_to_generate is None:
+            return {}
+
+        pages_to_generate = set(pages_to_generate)
+        return {
+            page.page_number: page.to_content_data()
+            for page in ResearchContentPage.for_section(outline.id, section_title)
+            if page.status == ResearchContentPage.STATUS_DONE
+            and page.page_number not in pages_to_generate
+        }
+
+    def _start_checkpoint(self, project, outline, section_title, pages_to_generate):
+        """
+        Checkpoint this run, picking up an unfinished earlier one
+
+        Returns:
+            dict: page number -> page content data for the good pages the
+            unfinished run stored; empty for a fresh run, and when the caller
+            chose the pages to generate itself
+
+        Raises:
+            SectionBusy: Another live run is generating the section
+        """
+        self._stop_checkpoint_heartbeat()
+        self.checkpoint, resumed = SectionCheckpoint.begin(
+            project.id,
+            outline.id,
+            section_title,
+            run_id=self.cancel_token.run_id,
+            stale_after=self.checkpoint_stale_seconds,
+        )
+        self._start_checkpoint_heartbeat()
+        if not resumed or pages_to_generate is not None:
+            return {}
+
+        pages = {
+            page.page_number: page.to_content_data()
+            for page in self.checkpoint.finished_pages()
+        }
+        if pages:
+            logger.info(
+                f"Resuming '{section_title}' with {len(pages)} pages from the "
+                f"unfinished run (next page {self.checkpoint.next_page})"
+            )
+            metrics.increment("content.checkpoint.resumed_pages", len(pages))
+        return pages
+
+    def _start_checkpoint_heartbeat(self):
+        """Refresh the checkpoint's heartbeat until the generation ends"""
+        app = current_app._get_current_object()
+        checkpoint_id, run_id = self.checkpoint.id, self.checkpoint.run_id
+        interval = max(1, self.checkpoint_stale_seconds / 3)
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                with app.app_context():
+                    if not SectionCheckpoint.heartbeat(checkpoint_id, run_id):
+                        # Stored, cleared, or taken over after we stalled
+                        return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        self._checkpoint_heartbeat = (stop, thread)
+
+    def _stop_checkpoint_heartbeat(self):
+        if self._checkpoint_heartbeat is not None:
+            stop, thread = self._checkpoint_heartbeat
+            stop.set()
+            thread.join()
+            self._checkpoint_heartbeat = None
+
+    def _save_page(
+        self,
+        project_id,
+        outline_id,
+        section_title,
+        page_num,
+        prompt,
+        page_content=None,
+        error=None,
+    ):
+        """Store one finished (or failed) page right away"""
+        try:
+            ResearchContentPage.save(
+                project_id,
+                outline_id,
+                section_title,
+                page_num,
+                prompt=prompt,
+                page_content=page_content,
+                error=error,
+            )
+            if self.checkpoint is not None and error is None:
+                # In the same commit, so the checkpoint never runs ahead of its pages
+                self.checkpoint.advance(page_num)
+            db.session.commit()
         except Exception as e:
-            logger.error(f"Error generating section content: {str(e)}")
-            return {"error": str(e)}
+            db.session.rollback()
+            logger.error(f"Error saving page {page_num} of {section_title}: {str(e)}")
+
+    def _build_page_plan(self, section, total_pages):
+        """
+        Split a section's subsections and key points across its pages
+
+        Returns:
+            list: One entry per page with the subsections and key points that
+            page is responsible for
+        """
+        items = []
+        for subsection in section.subsections:
+            key_points = subsection.key_points or [None]
+            for point in key_points:
+                items.append((subsection.title, point))
+
+        plan = []
+        for page_index in range(total_pages):
+            if items:
+                # Spread the items evenly; when there are more pages than items,
+                # neighbouring pages share (and go deeper into) the same item
+                start = page_index * len(items) // total_pages
+                end = max(start + 1, (page_index + 1) * len(items) // total_pages)
+                page_items = items[start:end]
+            else:
+                page_items = []
+
+            subsections = []
+            for title, point in page_items:
+                if not subsections or subsections[-1]["title"] != title:
+                    subsections.append({"title": title, "key_points": []})
+                if point:
+                    subsections[-1]["key_points"].append(point)
+
+            plan.append({"page_number": page_index + 1, "subsections": subsections})
+
+        return plan
+
+    def _create_page_prompt(
+        self,
+        language,
+        title,
+        thesis,
+        section_title,
+        subsections,
+        citation_style,
+        target_words,
+        page_range,
+        current_page_num,
+        total_pages,
+        previous_content="",
+        page_plan=None,
+    ):
+        """
+        Create a single page prompt in the requested language
+
+        previous_content is the rendered SectionContext of the pages before this one.
+        """
+        create_prompt = (
+            self._create_arabic_page_prompt
+            if language == "ar"
+            else self._create_english_page_prompt
+        )
+        return create_prompt(
+            title,
+            thesis,
+            section_title,
+            subsections,
+            citation_style,
+            target_words,
+            page_range,
+            current_page_num,
+            total_pages,
+            previous_content,
+            page_plan,
+            self.body_summaries,
+        )
+
+    def _format_page_plan(
+        self, page_plan, current_page_num, page_label, this_page_label
+    ):
+        """
+        Render a page plan as prompt text, marking the page being written
+
+        current_page_num may also be a list of the pages being written.
+        """
+        current_pages = (
+            set(current_page_num)
+            if isinstance(current_page_num, (list, tuple, set))
+            else {current_page_num}
+        )
+        plan_text = ""
+        for page in page_plan:
+            marker = f" {this_page_label}" if page["page_number"] in current_pages else ""
+            plan_text += f"- {page_label} {page['page_number']}{marker}:\n"
+            for subsection in page["subsections"]:
+                plan_text += f"  - {subsection['title']}\n"
+                for point in subsection["key_points"]:
+                    plan_text += f"    - {point}\n"
+        return plan_text
+
+    def _framing_context(self, body_summaries, language):
+        """Prompt text giving an introduction or conclusion the body it frames"""
+        if not body_summaries:
+            return ""
+        if language == "ar":
+            return f"""
+            أقسام متن البحث مكتوبة بالفعل، وهذا ملخص كل منها:
+            {body_summaries}
+
+            اعتمد على ما تقوله هذه الأقسام فعلًا: مهّد لها في المقدمة، واجمع نتائجها في
+            الخاتمة، دون أن تناقضها أو تضيف نتائج لم ترد فيها.
+            """
+        return f"""
+            The body sections of this paper are already written. A summary of each:
+            {body_summaries}
+
+            Build on what these sections actually say: lead into them in an introduction
+            and draw their findings together in a conclusion, without contradicting them
+            or adding findings they do not contain.
+            """
 
     def _create_english_page_prompt(
         self,
@@ -280,21 +1549,34 @@ class ContentService:
         current_page_num,
         total_pages,
         previous_content="",
+        page_plan=None,
+        body_summaries="",
     ):
         """Create a prompt for English content generation for a single page"""
         subsection_text = ""
         for subsection in subsections:
-            subsection_text += f"- {subsection.get('title')}\n"
-            for point in subsection.get("key_points", []):
+            subsection_text += f"- {subsection.title}\n"
+            for point in subsection.key_points:
                 subsection_text += f"  - {point}\n"
 
         context = ""
         if previous_content:
             context = f"""
-            Previous content generated for this section:
-            {previous_content[:1000]}... [truncated]
+            Summary of the pages written so far for this section, followed by the most recent text:
+            {previous_content}
             
-            Continue from where the previous content left off, maintaining consistency.
+            Continue from where the most recent text leaves off, maintaining consistency.
+            """
+        elif page_plan:
+            plan_text = self._format_page_plan(
+                page_plan, current_page_num, "Page", "(this page)"
+            )
+            context = f"""
+            The other pages of this section are being written in parallel following this page plan:
+            {plan_text}
+            Write only page {current_page_num}, covering the points planned for it. Do not repeat
+            material planned for other pages, and do not write an introduction or conclusion for the
+            section unless this is its first or last page.
             """
 
         return f"""
@@ -303,6 +1585,7 @@ class ContentService:
         Thesis statement: {thesis}
         
         {context}
+        {self._framing_context(body_summaries, "en")}
         
         The section should cover the following subsections and key points:
         {subsection_text}
@@ -316,6 +1599,7 @@ class ContentService:
         6. This is page {page_range['start']} in the final document
         7. If this is not the first page, continue naturally from the previous content
         8. write the content in markdown format
+        9. List each cited work in "citations" by its fields only, not as a formatted reference
         Format your response as a structured JSON object with the following schema:
         {{
             "section_title": "{section_title}",
@@ -323,10 +1607,12 @@ class ContentService:
             "citations": [
                 {{
                     "id": "citation1",
-                    "text": "Full citation text in {citation_style} format", // (markdown)
-                    "source_type": "journal/book/website/etc.",
-                }},
-                ...
+                    "authors": ["Given Surname"],
+                    "year": "2020",
+                    "title": "Title of the cited work",
+                    "venue": "Journal, publisher or website",
+                    "source_type": "journal/book/website/etc."
+                }}
             ],
             "page_number": {current_page_num}
         }}
@@ -346,21 +1632,33 @@ class ContentService:
         current_page_num,
         total_pages,
         previous_content="",
+        page_plan=None,
+        body_summaries="",
     ):
         """Create a prompt for Arabic content generation for a single page"""
         subsection_text = ""
         for subsection in subsections:
-            subsection_text += f"- {subsection.get('title')}\n"
-            for point in subsection.get("key_points", []):
+            subsection_text += f"- {subsection.title}\n"
+            for point in subsection.key_points:
                 subsection_text += f"  - {point}\n"
 
         context = ""
         if previous_content:
             context = f"""
-            المحتوى السابق المولد لهذا القسم:
-            {previous_content[:1000]}... [مختصر]
+            ملخص الصفحات المكتوبة حتى الآن في هذا القسم، يليه أحدث نص:
+            {previous_content}
             
-            استمر من حيث انتهى المحتوى السابق، مع الحفاظ على الاتساق.
+            استمر من حيث انتهى أحدث نص، مع الحفاظ على الاتساق.
+            """
+        elif page_plan:
+            plan_text = self._format_page_plan(
+                page_plan, current_page_num, "الصفحة", "(هذه الصفحة)"
+            )
+            context = f"""
+            تتم كتابة بقية صفحات هذا القسم بالتوازي وفق خطة الصفحات التالية:
+            {plan_text}
+            اكتب الصفحة {current_page_num} فقط، وغطِّ النقاط المخططة لها. لا تكرر المادة المخططة
+            لصفحات أخرى، ولا تكتب مقدمة أو خاتمة للقسم إلا إذا كانت هذه صفحته الأولى أو الأخيرة.
             """
 
         return f"""
@@ -369,6 +1667,7 @@ class ContentService:
         بيان الأطروحة: {thesis}
         
         {context}
+        {self._framing_context(body_summaries, "ar")}
         
         يجب أن يغطي القسم النقاط الفرعية التالية:
         {subsection_text}
@@ -382,17 +1681,20 @@ class ContentService:
         6. هذه هي الصفحة {page_range['start']} في البحث النهائي
         7. إذا لم تكن هذه الصفحة الأولى، استمر بشكل طبيعي من المحتوى السابق
         8. قم بكنابة المحتوى باسلوب (markdown)
+        9. اذكر كل مرجع في "citations" بحقوله فقط، وليس كمرجع منسق
         قم بتنسيق الإجابة بتنسيق JSON كما يلي:
         {{
             "section_title": "{section_title}",
-            "content": "محتوى هذه الصفحة مع المراجع بتنسيق {citation_style}", // (markdown)
+            "content": "محتوى هذه الصفحة مع المراجع بتنسيق {citation_style} (markdown)",
             "citations": [
                 {{
                     "id": "citation1",
-                    "text": "نص المرجع بتنسيق {citation_style}",
-                    "source_type": "نوع المصدر",
-                }},
-                ...
+                    "authors": ["الاسم الأول واسم العائلة"],
+                    "year": "2020",
+                    "title": "عنوان العمل المقتبس",
+                    "venue": "المجلة أو الناشر أو الموقع",
+                    "source_type": "نوع المصدر"
+                }}
             ],
             "page_number": {current_page_num}
         }}
@@ -400,119 +1702,241 @@ class ContentService:
         تأكد من أن JSON صالح ومنسق بشكل صحيح.
         """
 
-    def _parse_content_response(self, response_text, section_title, subsection_titles):
-        """Parse the response from Gemini API into structured content"""
-        try:
-            # Clean up the response text
-            response_text = response_text.strip()
-
-            # Find JSON content - look for JSON blocks first
-            json_text = None
-
-            # Check for ```json blocks
-            start_idx = response_text.find("```json")
-            if start_idx >= 0:
-                end_idx = response_text.find("```", start_idx + 6)
-                if end_idx > start_idx:
-                    json_text = response_text[start_idx + 7 : end_idx].strip()
-
-            # If no JSON blocks found, look for just ``` blocks
-            if json_text is None:
-                start_idx = response_text.find("```")
-                if start_idx >= 0:
-                    end_idx = response_text.find("```", start_idx + 3)
-                    if end_idx > start_idx:
-                        json_text = response_text[start_idx + 3 : end_idx].strip()
-
-            # If still no JSON blocks, check if the entire response is JSON
-            if json_text is None:
-                if response_text.strip().startswith(
-                    "{"
-                ) and response_text.strip().endswith("}"):
-                    json_text = response_text.strip()
-
-            # If we couldn't find any JSON content, create a basic structure
-            if json_text is None:
-                logger.warning(
-                    f"No JSON found in response for section: {section_title}"
-                )
-                return {
-                    "section_title": section_title,
-                    "content": response_text,
-                    "citations": [],
-                }
+    def _create_batch_prompt(
+        self,
+        language,
+        title,
+        thesis,
+        section_title,
+        subsections,
+        citation_style,
+        target_words,
+        page_indices,
+        total_pages,
+        previous_content="",
+        page_plan=None,
+    ):
+        """Create a prompt for several consecutive pages in the requested language"""
+        create_prompt = (
+            self._create_arabic_batch_prompt
+            if language == "ar"
+            else self._create_english_batch_prompt
+        )
+        return create_prompt(
+            title,
+            thesis,
+            section_title,
+            subsections,
+            citation_style,
+            target_words,
+            page_indices,
+            total_pages,
+            previous_content,
+            page_plan,
+            self.body_summaries,
+        )
 
-            # Now try to parse the JSON
-            try:
-                content_data = json.loads(json_text)
-            except json.JSONDecodeError as e:
-                logger.warning(f"Initial JSON parsing failed: {str(e)}")
-                # Try fixing common JSON issues
-                fixed_json = json_text
+    def _create_english_batch_prompt(
+        self,
+        title,
+        thesis,
+        section_title,
+        subsections,
+        citation_style,
+        target_words,
+        page_indices,
+        total_pages,
+        previous_content="",
+        page_plan=None,
+        body_summaries="",
+    ):
+        """Create a prompt for English content generation for several pages"""
+        first_page, last_page = page_indices[0], page_indices[-1]
+        subsection_text = ""
+        for subsection in subsections:
+            subsection_text += f"- {subsection.title}\n"
+            for point in subsection.key_points:
+                subsection_text += f"  - {point}\n"
 
-                # Replace single quotes with double quotes
-                fixed_json = fixed_json.replace("'", '"')
+        context = ""
+        if previous_content:
+            context = f"""
+            Summary of the pages written so far for this section, followed by the most recent text:
+            {previous_content}
+            
+            Continue from where the most recent text leaves off, maintaining consistency.
+            """
 
-                # Replace True/False/None with JavaScript equivalents
-                fixed_json = fixed_json.replace("True", "true")
-                fixed_json = fixed_json.replace("False", "false")
-                fixed_json = fixed_json.replace("None", "null")
+        plan_text = ""
+        if page_plan:
+            plan_text = self._format_page_plan(
+                page_plan, page_indices, "Page", "(write now)"
+            )
 
-                # Try to fix unescaped quotes in strings
-                fixed_json = self._fix_unescaped_quotes(fixed_json)
+        return f"""
+        Generate academic content for pages {first_page} to {last_page} of {total_pages} of the "{section_title}" section in a research paper titled "{title}".
+        
+        Thesis statement: {thesis}
+        
+        {context}
+        {self._framing_context(body_summaries, "en")}
+        
+        The pages of this section follow this plan:
+        {plan_text}
+        
+        The section should cover the following subsections and key points:
+        {subsection_text}
+        
+        Requirements:
+        1. Write in a formal academic style appropriate for scholarly publication
+        2. Include at least 1-2 citations per page using {citation_style} format
+        3. Ensure logical flow from one page to the next
+        4. Use appropriate academic terminology
+        5. Write approximately {target_words} words for each page
+        6. Cover only the points planned for pages {first_page} to {last_page}
+        7. write the content in markdown format
+        8. List each cited work in "citations" by its fields only, not as a formatted reference
+        Write each page as its own JSON object, on the lines after a delimiter line
+        "<<<PAGE n>>>" where n is the page number, and finish with a line "<<<END>>>":
+        <<<PAGE {first_page}>>>
+        {{
+            "section_title": "{section_title}",
+            "content": "The content for this page with citations in {citation_style} format",
+            "citations": [
+                {{
+                    "id": "citation1",
+                    "authors": ["Given Surname"],
+                    "year": "2020",
+                    "title": "Title of the cited work",
+                    "venue": "Journal, publisher or website",
+                    "source_type": "journal/book/website/etc."
+                }}
+            ],
+            "page_number": {first_page}
+        }}
+        <<<PAGE {first_page + 1}>>>
+        ...
+        <<<END>>>
+        
+        Write every page from {first_page} to {last_page}. Each JSON object must be valid on its own; do not use code fences.
+        """
 
-                # Additional fixes for Arabic text and newlines
-                fixed_json = self._fix_arabic_json(fixed_json)
+    def _create_arabic_batch_prompt(
+        self,
+        title,
+        thesis,
+        section_title,
+        subsections,
+        citation_style,
+        target_words,
+        page_indices,
+        total_pages,
+        previous_content="",
+        page_plan=None,
+        body_summaries="",
+    ):
+        """Create a prompt for Arabic content generation for several pages"""
+        first_page, last_page = page_indices[0], page_indices[-1]
+        subsection_text = ""
+        for subsection in subsections:
+            subsection_text += f"- {subsection.title}\n"
+            for point in subsection.key_points:
+                subsection_text += f"  - {point}\n"
 
-                # Try more aggressive JSON repair if still failing
-                try:
-                    content_data = json.loads(fixed_json)
-                except json.JSONDecodeError as e2:
-                    logger.warning(
-                        f"Standard fixes failed: {str(e2)}, trying advanced repair"
-                    )
-                    try:
-                        # Try manual extraction of key components
-                        content_data = self._manual_json_extraction(
-                            fixed_json, section_title
-                        )
-                    except Exception as e3:
-                        logger.error(f"Failed to parse JSON after all fixes: {str(e3)}")
-                        # If all parsing fails, return the raw text with proper structure
-                        return {
-                            "section_title": section_title,
-                            "content": response_text,
-                            "citations": [],
-                        }
-
-            # Validate the content structure
-            if not isinstance(content_data, dict):
+        context = ""
+        if previous_content:
+            context = f"""
+            ملخص الصفحات المكتوبة حتى الآن في هذا القسم، يليه أحدث نص:
+            {previous_content}
+            
+            استمر من حيث انتهى أحدث نص، مع الحفاظ على الاتساق.
+            """
+
+        plan_text = ""
+        if page_plan:
+            plan_text = self._format_page_plan(
+                page_plan, page_indices, "الصفحة", "(اكتبها الآن)"
+            )
+
+        return f"""
+        قم بإنشاء محتوى أكاديمي للصفحات من {first_page} إلى {last_page} من {total_pages} من قسم "{section_title}" في ورقة بحثية بعنوان "{title}".
+        
+        بيان الأطروحة: {thesis}
+        
+        {context}
+        {self._framing_context(body_summaries, "ar")}
+        
+        تتبع صفحات هذا القسم الخطة التالية:
+        {plan_text}
+        
+        يجب أن يغطي القسم النقاط الفرعية التالية:
+        {subsection_text}
+        
+        المتطلبات:
+        1. اكتب حوالي {target_words} كلمة لكل صفحة
+        2. قم بتضمين 1-2 اقتباسات على الأقل في كل صفحة
+        3. استخدم تنسيق {citation_style} للمراجع
+        4. اكتب بأسلوب أكاديمي رسمي
+        5. قم بتنظيم المحتوى في فقرات واضحة
+        6. غطِّ فقط النقاط المخططة للصفحات من {first_page} إلى {last_page}
+        7. قم بكنابة المحتوى باسلوب (markdown)
+        8. اذكر كل مرجع في "citations" بحقوله فقط، وليس كمرجع منسق
+        اكتب كل صفحة ككائن JSON مستقل في الأسطر التي تلي سطر الفاصل
+        "<<<PAGE n>>>" حيث n رقم الصفحة، واختم بسطر "<<<END>>>":
+        <<<PAGE {first_page}>>>
+        {{
+            "section_title": "{section_title}",
+            "content": "محتوى هذه الصفحة مع المراجع بتنسيق {citation_style}",
+            "citations": [
+                {{
+                    "id": "citation1",
+                    "authors": ["الاسم الأول واسم العائلة"],
+                    "year": "2020",
+                    "title": "عنوان العمل المقتبس",
+                    "venue": "المجلة أو الناشر أو الموقع",
+                    "source_type": "نوع المصدر"
+                }}
+            ],
+            "page_number": {first_page}
+        }}
+        <<<PAGE {first_page + 1}>>>
+        ...
+        <<<END>>>
+        
+        اكتب كل الصفحات من {first_page} إلى {last_page}. يجب أن يكون كل كائن JSON صالحًا بمفرده، ولا تستخدم علامات الكود.
+        """
+
+    def _parse_content_response(self, response_text, section_title, subsection_titles):
+        """
+        Parse a page response that is not strictly valid JSON
+
+        The lenient parser skips fences and prose around the object and repairs
+        trailing commas, raw newlines and stray quotes in a single pass, without
+        rewriting the text itself.
+        """
+        try:
+            content_data = parse_lenient(response_text, "{")
+
+            # If we couldn't find any JSON content, keep the text as the page
+            if not isinstance(content_data, dict) or "content" not in content_data:
                 logger.warning(
-                    "Content data is not a dictionary, converting to proper format"
+                    f"No JSON found in response for section: {section_title}"
                 )
+                metrics.increment("content.parse.raw_text")
                 return {
                     "section_title": section_title,
-                    "content": str(content_data),
+                    "content": response_text.strip(),
                     "citations": [],
                 }
 
             # Ensure required fields exist
-            required_fields = ["section_title", "content", "citations"]
-            for field in required_fields:
-                if field not in content_data:
-                    if field == "citations":
-                        content_data[field] = []
-                    else:
-                        content_data[field] = (
-                            "" if field == "content" else section_title
-                        )
-
-            # If section_title is empty, use the provided one
-            if not content_data["section_title"]:
+            if not isinstance(content_data["content"], str):
+                content_data["content"] = str(content_data["content"] or "")
+            if not content_data.get("section_title"):
                 content_data["section_title"] = section_title
 
             # Ensure citations is a list
-            if not isinstance(content_data["citations"], list):
+            if not isinstance(content_data.get("citations"), list):
                 logger.warning("Citations is not a list, converting to empty list")
                 content_data["citations"] = []
 
@@ -530,122 +1954,6 @@ class ContentService:
                 "citations": [],
             }
 
-    def _fix_unescaped_quotes(self, json_text):
-        """Try to fix unescaped quotes in JSON strings"""
-        # This is a simplified approach - in a production environment, you might want
-        # a more sophisticated JSON repair library
-        result = ""
-        in_string = False
-        escape_next = False
-
-        for char in json_text:
-            if char == '"' and not escape_next:
-                in_string = not in_string
-            elif char == "\\" and not escape_next:
-                escape_next = True
-            else:
-                escape_next = False
-
-            # If we're in a string and encounter an unescaped quote, escape it
-            if in_string and char == '"' and not escape_next:
-                result += "\\"
-
-            result += char
-
-        return result
-
-    def _fix_arabic_json(self, json_text):
-        """Fix common issues with Arabic text in JSON"""
-        # Replace problematic newlines within strings
-        import re
-
-        # First, try to normalize newlines
-        json_text = json_text.replace("\r\n", "\\n").replace("\n", "\\n")
-
-        # Fix newlines in content field
-        content_pattern = re.compile(
-            r'"content":\s*"(.*?)"(?=\s*,\s*"citations"|$)', re.DOTALL
-        )
-        match = content_pattern.search(json_text)
-        if match:
-            content = match.group(1)
-            # Escape newlines properly
-            fixed_content = content.replace("\n", "\\n")
-            # Replace with fixed content
-            json_text = (
-                json_text[: match.start(1)] + fixed_content + json_text[match.end(1) :]
-            )
-
-        # Fix potential issues with Arabic quotes and special characters
-        json_text = json_text.replace("،", ",")  # Arabic comma
-        json_text = json_text.replace("؛", ";")  # Arabic semicolon
-        json_text = json_text.replace("«", '"').replace("»", '"')  # Arabic quotes
-        json_text = json_text.replace("؟", "?")  # Arabic question mark
-
-        return json_text
-
-    def _manual_json_extraction(self, json_text, section_title):
-        """Manually extract JSON components when standard parsing fails"""
-        import re
-
-        # Initialize with default structure
-        result = {"section_title": section_title, "content": "", "citations": []}
-
-        # Try to extract section_title
-        title_match = re.search(r'"section_title"\s*:\s*"([^"]+)"', json_text)
-        if title_match:
-            result["section_title"] = title_match.group(1)
-
-        # Try to extract content
-        content_match = re.search(
-            r'"content"\s*:\s*"(.*?)(?:"|$)(?=\s*,\s*"citations"|$)',
-            json_text,
-            re.DOTALL,
-        )
-        if content_match:
-            # Clean up content - replace escaped newlines and quotes
-            content = content_match.group(1)
-            content = content.replace("\\n", "\n").replace('\\"', '"')
-            result["content"] = content
-        else:
-            # If no content match, use everything between content and citations as fallback
-            content_start = json_text.find('"content"')
-            citations_start = json_text.find('"citations"')
-            if content_start > 0 and citations_start > content_start:
-                content_text = json_text[content_start:citations_start].strip()
-                # Remove the "content": part
-                if ":" in content_text:
-                    content_text = content_text.split(":", 1)[1].strip()
-                # Remove trailing comma and quotes
-                content_text = content_text.rstrip(",").strip('"')
-                result["content"] = content_text
-
-        # Try to extract citations
-        citations_match = re.search(
-            r'"citations"\s*:\s*(\[.*?\])', json_text, re.DOTALL
-        )
-        if citations_match:
-            citations_text = citations_match.group(1)
-            try:
-                # Try to parse the citations array
-                citations = json.loads(citations_text)
-                result["citations"] = citations
-            except json.JSONDecodeError:
-                # If parsing fails, try to extract individual citations
-                citation_matches = re.finditer(
-                    r'\{\s*"id"\s*:\s*"([^"]+)"\s*,\s*"text"\s*:\s*"([^"]+)"\s*,\s*"source_type"\s*:\s*"([^"]+)"\s*\}',
-                    citations_text,
-                )
-                for match in citation_matches:
-                    citation = {
-                        "id": match.group(1),
-                        "text": match.group(2),
-                        "source_type": match.group(3),
-                    }
-                    result["citations"].append(citation)
-
-        return result
-
     def process_json_content(self, json_data, section_title):
         """
         Process JSON content directly
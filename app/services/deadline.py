@@ -0,0 +1,53 @@
+import math
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time before an LLM call could be made or finish"""
+
+
+class Deadline:
+    """
+    Time left to answer one request
+
+    Views create a deadline as a request comes in, below the gunicorn worker
+    timeout, and pass it down to the services. Generation code splits what is
+    left across the pages still to write, caps each LLM call with it, and
+    stops with a partial result instead of letting the worker be killed.
+    Deadline() without seconds never expires, for callers off the request
+    path such as the job worker.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    @classmethod
+    def for_request(cls, config):
+        return cls(config.get("REQUEST_DEADLINE_SECONDS", 100))
+
+    @property
+    def bounded(self):
+        return self.expires_at is not None
+
+    def remaining(self):
+        """Seconds left, never negative; infinite for an unbounded deadline"""
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def share(self, parts):
+        """Fair share of the time left for each of the given number of parts"""
+        return self.remaining() / max(1, parts)
+
+    def cap(self, seconds):
+        """seconds, or less when the deadline is closer than that"""
+        return min(seconds, self.remaining())
+
+    def raise_if_expired(self):
+        if self.expired:
+            raise DeadlineExceeded(f"Request deadline of {self.seconds}s exceeded")
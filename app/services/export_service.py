@@ -1,6 +1,8 @@
 import logging
 from app.models.research import ResearchProject, ResearchOutline
+from app.models.citation import Citation
 from app.models.content import ResearchContent
+from app.services.citation_formatter import format_reference
 import os
 from flask import current_app
 from datetime import datetime, timedelta
@@ -179,15 +181,15 @@ class ExportService:
             elements.append(Spacer(1, 0.25 * 72))
 
             # Add sections to TOC
-            outline_structure = outline.get_outline_structure()
-            for section in outline_structure.get("sections", []):
-                section_title = format_text(section.get("title", ""))
+            outline_doc = outline.get_outline()
+            for section in outline_doc.sections:
+                section_title = format_text(section.title or "")
                 elements.append(Paragraph(section_title, heading_style))
                 elements.append(PageBreak())
 
             # Add content for each section
-            for section in outline_structure.get("sections", []):
-                section_title = format_text(section.get("title", ""))
+            for section in outline_doc.sections:
+                section_title = format_text(section.title or "")
                 elements.append(Paragraph(section_title, heading_style))
 
                 content_sections = ResearchContent.query.filter_by(
@@ -197,7 +199,7 @@ class ExportService:
                     (
                         s.content
                         for s in content_sections
-                        if s.section_title == section["title"]
+                        if s.section_title == section.title
                     ),
                     None,
                 )
@@ -285,11 +287,10 @@ class ExportService:
             for section in content_sections:
                 content_by_section[section.section_title] = {
                     "content": section.content,
-                    "citations": section.get_citations(),
                 }
 
-            # Get the outline structure
-            outline_structure = outline.get_outline_structure()
+            # Get the outline
+            outline_doc = outline.get_outline()
 
             # Create a new Document
             doc = Document()
@@ -313,7 +314,7 @@ class ExportService:
             toc = doc.add_paragraph()
 
             # Add thesis statement to TOC if available
-            if "thesis_statement" in outline_structure:
+            if outline_doc.thesis_statement:
                 if is_rtl:
                     toc.add_run("بيان الأطروحة").bold = True
                 else:
@@ -321,10 +322,7 @@ class ExportService:
                 toc.add_run(" ........................... 1\n")
 
             # Add research questions to TOC if available
-            if (
-                "research_questions" in outline_structure
-                and outline_structure["research_questions"]
-            ):
+            if outline_doc.research_questions:
                 if is_rtl:
                     toc.add_run("أسئلة البحث").bold = True
                 else:
@@ -333,8 +331,8 @@ class ExportService:
 
             # Add sections to TOC
             page_num = 3
-            for section in outline_structure.get("sections", []):
-                section_title = section.get("title", "")
+            for section in outline_doc.sections:
+                section_title = section.title or ""
                 toc.add_run(f"{section_title}").bold = True
                 toc.add_run(f" ........................... {page_num}\n")
                 page_num += 1
@@ -350,34 +348,29 @@ class ExportService:
             doc.add_page_break()
 
             # Add thesis statement if available
-            if "thesis_statement" in outline_structure:
+            if outline_doc.thesis_statement:
                 if is_rtl:
                     doc.add_heading("بيان الأطروحة", level=1)
                 else:
                     doc.add_heading("Thesis Statement", level=1)
-                doc.add_paragraph(outline_structure["thesis_statement"])
+                doc.add_paragraph(outline_doc.thesis_statement)
                 doc.add_page_break()
 
             # Add research questions if available
-            if (
-                "research_questions" in outline_structure
-                and outline_structure["research_questions"]
-            ):
+            if outline_doc.research_questions:
                 if is_rtl:
                     doc.add_heading("أسئلة البحث", level=1)
                 else:
                     doc.add_heading("Research Questions", level=1)
 
-                for i, question in enumerate(
-                    outline_structure["research_questions"], 1
-                ):
+                for i, question in enumerate(outline_doc.research_questions, 1):
                     doc.add_paragraph(f"{i}. {question}")
 
                 doc.add_page_break()
 
             # Add content for each section in the outline
-            for section in outline_structure.get("sections", []):
-                section_title = section.get("title", "")
+            for section in outline_doc.sections:
+                section_title = section.title or ""
                 doc.add_heading(section_title, level=1)
 
                 # Add the content if available
@@ -439,20 +432,17 @@ class ExportService:
             else:
                 doc.add_heading("References", level=1)
 
-            all_citations = []
-            for section_data in content_by_section.values():
-                all_citations.extend(section_data["citations"])
-
-            # Remove duplicate citations
-            unique_citations = {}
-            for citation in all_citations:
-                citation_id = citation.get("id", "")
-                if citation_id and citation_id not in unique_citations:
-                    unique_citations[citation_id] = citation
-
-            # Add citations to DOCX
-            for citation in unique_citations.values():
-                doc.add_paragraph(citation.get("text", ""))
+            # One query on the citation registry, already deduplicated, rendered
+            # in the project's current style
+            for citation in Citation.reference_list(outline.id, content_sections):
+                doc.add_paragraph(
+                    format_reference(
+                        citation,
+                        project.citation_style,
+                        project.language,
+                        markdown=False,
+                    )
+                )
 
             # Create export directory if it doesn't exist
             export_dir = os.path.join(current_app.root_path, "static", "exports")
@@ -1,7 +1,18 @@
-import google.generativeai as genai
 from flask import current_app
 import logging
-import json
+from app.services.deadline import Deadline
+from app.services.llm_cache import LLMCache, get_llm_cache
+from app.services.lenient_json import parse_lenient
+from app.services.llm_client import get_backend, get_model_name
+from app.services.metrics import metrics
+from app.services.rate_limiter import get_rate_limiter
+from app.services.retry_policy import RetryPolicy
+from app.services.schemas import (
+    OUTLINE_SCHEMA,
+    SchemaError,
+    parse_structured,
+    structured_generation_config,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -10,18 +21,31 @@ class GeminiService:
     """Service for interacting with Google's Gemini API"""
 
     def __init__(self):
-        self.api_key = current_app.config.get("GEMINI_API_KEY")
-        if not self.api_key:
+        self.model_name = get_model_name("outline")
+        self.cache = get_llm_cache(current_app.config)
+        self.rate_limiter = get_rate_limiter(current_app.config)
+        self.retry_policy = RetryPolicy.from_config("outline", current_app.config)
+        self.structured_output = current_app.config.get("LLM_STRUCTURED_OUTPUT", False)
+        # None keeps the model defaults when the SDK cannot constrain output
+        self.generation_config = None
+        if self.structured_output:
+            self.generation_config = (
+                structured_generation_config(None, OUTLINE_SCHEMA) or None
+            )
+        self.backend = get_backend("outline")
+        if self.backend is None:
             logger.warning(
                 "Gemini API key not found. Service will not function properly."
             )
-            return
-
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash-lite")
 
     def generate_research_outline(
-        self, topic, complexity="medium", language="en", total_pages=10
+        self,
+        topic,
+        complexity="medium",
+        language="en",
+        total_pages=10,
+        use_cache=True,
+        deadline=None,
     ):
         """
         Generate a research outline based on the given topic
@@ -31,11 +55,14 @@ class GeminiService:
             complexity (str): The complexity level (basic, medium, advanced)
             language (str): The language code (en, ar)
             total_pages (int): Total number of pages required
+            use_cache (bool): Reuse a cached response for identical inputs
+            deadline (Deadline): Deadline of the request; the Gemini call and
+                any retries are cut short to end before it
 
         Returns:
             dict: The generated outline structure
         """
-        if not self.api_key:
+        if self.backend is None:
             return {"error": "Gemini API key not configured"}
 
         try:
@@ -47,15 +74,35 @@ class GeminiService:
             else:
                 return {"error": f"Unsupported language: {language}"}
 
-            response = self.model.generate_content(prompt)
-            print(response.text)
+            response_text = self._request_outline(prompt, use_cache, deadline)
+            logger.debug(f"Outline response: {response_text}")
             # Parse the response
-            return self._parse_outline_response(response.text, topic)
+            return self._parse_outline(response_text, topic)
 
         except Exception as e:
             logger.error(f"Error generating research outline: {str(e)}")
             return {"error": str(e)}
 
+    def _request_outline(self, prompt, use_cache=True, deadline=None):
+        """Send an outline prompt to Gemini, going through the response cache"""
+        cache_key = LLMCache.make_key(self.model_name, prompt, self.generation_config)
+        if self.cache and use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Outline response served from cache")
+                return cached
+
+        def send():
+            return self.backend.generate(prompt, generation_config=self.generation_config)
+
+        deadline = deadline or Deadline()
+        quota = self.rate_limiter.quota(prompt) if self.rate_limiter else None
+        response_text = self.retry_policy.call(send, deadline, quota)
+
+        if self.cache:
+            self.cache.set(cache_key, self.model_name, response_text)
+        return response_text
+
     def _create_english_prompt(self, topic, complexity, total_pages):
         """Create a prompt for English research outline"""
         complexity_descriptions = {
@@ -171,30 +218,33 @@ class GeminiService:
         تأكد من أن الناتج عبارة عن JSON صالح ومنسق بشكل صحيح.
         """
 
+    def _parse_outline(self, response_text, topic):
+        """
+        Parse an outline, validating it against OUTLINE_SCHEMA first
+
+        Responses that fail validation go through the legacy parser, counted
+        in metrics.
+        """
+        if self.structured_output:
+            try:
+                outline = parse_structured(response_text, OUTLINE_SCHEMA)
+                metrics.increment("outline.parse.structured")
+                return outline
+            except SchemaError as e:
+                metrics.increment("outline.parse.fallback")
+                logger.warning(
+                    f"Structured outline failed validation ({str(e)}), falling back"
+                )
+
+        return self._parse_outline_response(response_text, topic)
+
     def _parse_outline_response(self, response_text, topic):
         """Parse the response from Gemini API into a structured outline"""
         try:
-            # Try to extract JSON from the response
-            # First, look for JSON block in markdown
-            if (
-                "```json" in response_text
-                and "```" in response_text.split("```json")[1]
-            ):
-                json_text = response_text.split("```json")[1].split("```")[0].strip()
-                outline = json.loads(json_text)
-            # If not found, try to parse the entire response as JSON
-            else:
-                try:
-                    outline = json.loads(response_text)
-                except:
-                    # If that fails, try to extract anything that looks like JSON
-                    start_idx = response_text.find("{")
-                    end_idx = response_text.rfind("}") + 1
-                    if start_idx >= 0 and end_idx > start_idx:
-                        json_text = response_text[start_idx:end_idx]
-                        outline = json.loads(json_text)
-                    else:
-                        raise ValueError("Could not extract JSON from response")
+            # Skip fences and prose, repairing malformed JSON in a single pass
+            outline = parse_lenient(response_text, "{")
+            if not isinstance(outline, dict):
+                raise ValueError("Could not extract JSON from response")
 
             # Validate the outline structure
             if not all(
@@ -0,0 +1,636 @@
+from flask import current_app
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+
+from app import db
+from app.models.job import GenerationJob, GenerationRun
+from app.models.research import ResearchProject, ResearchOutline
+from app.models.content import ResearchContent
+from app.models.outline import framing_titles, is_framing_section
+from app.services.cancellation import CancellationToken, GenerationCancelled
+from app.services.single_flight import SingleFlight, section_key
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Database-backed queue of section generation jobs
+
+    Jobs are claimed with a conditional UPDATE, so any number of worker
+    processes, on any number of nodes, can share one database. A claimed job
+    holds a lease that its worker keeps renewing; if the worker dies the lease
+    runs out and another worker picks the job up again.
+
+    Body sections of an outline run in parallel, up to JOB_MAX_PARALLEL_SECTIONS
+    at a time. The introduction and conclusion wait until no body section is
+    left queued or running, then are written from the body summaries.
+    """
+
+    # Jobs that still hold up an outline's introduction and conclusion
+    ACTIVE_STATUSES = (GenerationJob.STATUS_QUEUED, GenerationJob.STATUS_RUNNING)
+    # Jobs that have not started yet
+    PENDING_STATUSES = (GenerationJob.STATUS_QUEUED, GenerationJob.STATUS_WAITING)
+
+    def __init__(self, lease_seconds=None, max_attempts=None, max_parallel=None):
+        self.lease_seconds = lease_seconds or current_app.config.get(
+            "JOB_LEASE_SECONDS", 300
+        )
+        self.max_attempts = max_attempts or current_app.config.get(
+            "JOB_MAX_ATTEMPTS", 3
+        )
+        self.max_parallel = max_parallel or current_app.config.get(
+            "JOB_MAX_PARALLEL_SECTIONS", 3
+        )
+
+    def enqueue_sections(self, project, outline, section_titles, priority=0):
+        """
+        Queue one job per section
+
+        The introduction and conclusion are put on hold while body sections of
+        the outline are queued with them or still generating.
+
+        Returns:
+            tuple: (batch_id, list of GenerationJob)
+        """
+        body_pending = any(
+            not is_framing_section(title)
+            for title in [*section_titles, *self.active_section_titles(outline.id)]
+        )
+
+        batch_id = uuid.uuid4().hex
+        jobs = []
+        for position, section_title in enumerate(section_titles):
+            status = (
+                GenerationJob.STATUS_WAITING
+                if body_pending and is_framing_section(section_title)
+                else GenerationJob.STATUS_QUEUED
+            )
+            job = GenerationJob(
+                batch_id=batch_id,
+                project_id=project.id,
+                outline_id=outline.id,
+                section_title=section_title,
+                status=status,
+                priority=priority,
+                position=position,
+                max_attempts=self.max_attempts,
+            )
+            db.session.add(job)
+            jobs.append(job)
+
+        db.session.commit()
+        logger.info(f"Queued {len(jobs)} generation jobs in batch {batch_id}")
+        return batch_id, jobs
+
+    def pending_sections(self, project, outline):
+        """
+        Sections of an outline still to generate, in reading order
+
+        Sections that already have content, or an unfinished job, are left
+        out, as are titles listed twice (outlines often include their own
+        Introduction).
+        """
+        intro_title, conclusion_title = framing_titles(project.language)
+        titles = [
+            intro_title,
+            *outline.get_outline().section_titles,
+            conclusion_title,
+        ]
+
+        skip = {
+            title
+            for (title,) in db.session.query(ResearchContent.section_title).filter_by(
+                project_id=project.id, outline_id=outline.id
+            )
+        }
+        skip |= self.active_section_titles(outline.id)
+
+        pending = []
+        for title in titles:
+            if title not in skip:
+                pending.append(title)
+                skip.add(title)
+        return pending
+
+    def enqueue_speculative(self, project, outline):
+        """
+        Queue every pending section of a just-approved outline at low priority
+
+        Does nothing unless SPECULATIVE_GENERATION is on. Speculative jobs for
+        the project's other outlines are cancelled first, since approving this
+        one replaces them.
+
+        Returns:
+            str: The batch id, or None if nothing was queued
+        """
+        if not current_app.config.get("SPECULATIVE_GENERATION", False):
+            return None
+
+        self.cancel_speculative(project.id, keep_outline_id=outline.id)
+        sections = self.pending_sections(project, outline)
+        if not sections:
+            return None
+
+        batch_id, _ = self.enqueue_sections(
+            project, outline, sections, priority=GenerationJob.PRIORITY_SPECULATIVE
+        )
+        return batch_id
+
+    def cancel_speculative(self, project_id, keep_outline_id=None):
+        """
+        Cancel queued speculative jobs of a project's outlines
+
+        Args:
+            keep_outline_id: Outline whose jobs stay queued, e.g. the new one
+
+        Returns:
+            int: Number of jobs cancelled
+        """
+        query = update(GenerationJob).where(
+            GenerationJob.project_id == project_id,
+            GenerationJob.status.in_(self.PENDING_STATUSES),
+            GenerationJob.priority <= GenerationJob.PRIORITY_SPECULATIVE,
+        )
+        if keep_outline_id is not None:
+            query = query.where(GenerationJob.outline_id != keep_outline_id)
+
+        result = db.session.execute(
+            query.values(
+                status=GenerationJob.STATUS_CANCELLED,
+                error="Outline was replaced",
+                finished_at=datetime.utcnow(),
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.info(
+                f"Cancelled {result.rowcount} speculative jobs of project {project_id}"
+            )
+        return result.rowcount
+
+    def cancel(self, project_id, batch_id=None, keep_outline_id=None):
+        """
+        Cancel a project's queued jobs and ask its running ones to stop
+
+        Args:
+            batch_id: Only jobs of this batch
+            keep_outline_id: Leave jobs of this outline alone, e.g. the outline
+                that replaced the others
+
+        Returns:
+            int: Number of jobs cancelled or asked to stop
+        """
+        query = db.session.query(GenerationJob.id, GenerationJob.status).filter(
+            GenerationJob.project_id == project_id,
+            GenerationJob.status.in_(
+                [*self.PENDING_STATUSES, GenerationJob.STATUS_RUNNING]
+            ),
+        )
+        if batch_id is not None:
+            query = query.filter(GenerationJob.batch_id == batch_id)
+        if keep_outline_id is not None:
+            query = query.filter(GenerationJob.outline_id != keep_outline_id)
+        jobs = query.all()
+
+        queued = [job_id for job_id, status in jobs if status in self.PENDING_STATUSES]
+        running = [
+            job_id for job_id, status in jobs if status == GenerationJob.STATUS_RUNNING
+        ]
+        if queued:
+            db.session.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.id.in_(queued),
+                    GenerationJob.status.in_(self.PENDING_STATUSES),
+                )
+                .values(
+                    status=GenerationJob.STATUS_CANCELLED,
+                    error="Cancelled",
+                    finished_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        if running:
+            # The worker marks these cancelled when it notices, between pages
+            CancellationToken.cancel_runs(project_id, job_ids=running)
+
+        if jobs:
+            logger.info(
+                f"Cancelling {len(jobs)} generation jobs of project {project_id}"
+            )
+        return len(jobs)
+
+    def promote(self, outline_id):
+        """
+        Move queued speculative jobs of an outline up to normal priority
+
+        Used when a user asks for sections that are already queued
+        speculatively, so they are not left waiting behind other users' work.
+
+        Returns:
+            list: The promoted GenerationJob rows, in queue order
+        """
+        jobs = (
+            GenerationJob.query.filter(
+                GenerationJob.outline_id == outline_id,
+                GenerationJob.status.in_(self.PENDING_STATUSES),
+                GenerationJob.priority <= GenerationJob.PRIORITY_SPECULATIVE,
+            )
+            .order_by(GenerationJob.position, GenerationJob.id)
+            .all()
+        )
+        for job in jobs:
+            job.priority = 0
+        db.session.commit()
+        return jobs
+
+    def _claimable(self, now):
+        """Jobs that are waiting, or whose worker stopped renewing its lease"""
+        return and_(
+            GenerationJob.attempts < GenerationJob.max_attempts,
+            or_(
+                GenerationJob.status == GenerationJob.STATUS_QUEUED,
+                and_(
+                    GenerationJob.status == GenerationJob.STATUS_RUNNING,
+                    GenerationJob.lease_expires_at < now,
+                ),
+            ),
+        )
+
+    def _saturated_outlines(self, now):
+        """Outlines already generating as many sections as they may at once"""
+        return (
+            select(GenerationJob.outline_id)
+            .where(
+                GenerationJob.status == GenerationJob.STATUS_RUNNING,
+                GenerationJob.lease_expires_at >= now,
+            )
+            .group_by(GenerationJob.outline_id)
+            .having(func.count() >= self.max_parallel)
+        )
+
+    def _release_waiting(self):
+        """Queue introductions and conclusions whose body sections are all done"""
+        body = aliased(GenerationJob)
+        result = db.session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.status == GenerationJob.STATUS_WAITING,
+                ~exists().where(
+                    body.outline_id == GenerationJob.outline_id,
+                    body.status.in_(self.ACTIVE_STATUSES),
+                ),
+            )
+            .values(status=GenerationJob.STATUS_QUEUED)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.info(f"Released {result.rowcount} jobs waiting on body sections")
+
+    def _fail_abandoned(self, now):
+        """Give up on jobs whose lease expired after their last allowed attempt"""
+        result = db.session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.status == GenerationJob.STATUS_RUNNING,
+                GenerationJob.lease_expires_at < now,
+                GenerationJob.attempts >= GenerationJob.max_attempts,
+            )
+            .values(
+                status=GenerationJob.STATUS_FAILED,
+                error="Worker lease expired on the final attempt",
+                finished_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.warning(f"Marked {result.rowcount} abandoned jobs as failed")
+
+    def claim(self, worker_id):
+        """
+        Atomically claim the next job for a worker
+
+        Returns:
+            GenerationJob or None if nothing is waiting
+        """
+        now = datetime.utcnow()
+        self._fail_abandoned(now)
+        self._release_waiting()
+
+        # A soft limit: workers racing for the last free slot may both get one
+        candidates = (
+            db.session.query(GenerationJob.id)
+            .filter(
+                self._claimable(now),
+                GenerationJob.outline_id.not_in(self._saturated_outlines(now)),
+            )
+            .order_by(
+                GenerationJob.priority.desc(),
+                GenerationJob.created_at,
+                GenerationJob.position,
+                GenerationJob.id,
+            )
+            .limit(10)
+            .all()
+        )
+
+        for (job_id,) in candidates:
+            result = db.session.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, self._claimable(now))
+                .values(
+                    status=GenerationJob.STATUS_RUNNING,
+                    worker_id=worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=GenerationJob.attempts + 1,
+                    started_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            # Another worker won the race for this job; try the next one
+            if result.rowcount == 1:
+                return db.session.get(GenerationJob, job_id)
+
+        return None
+
+    def renew_lease(self, job_id, worker_id):
+        """Extend a running job's lease. Returns False if the lease was lost."""
+        result = db.session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.id == job_id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == GenerationJob.STATUS_RUNNING,
+            )
+            .values(
+                lease_expires_at=datetime.utcnow()
+                + timedelta(seconds=self.lease_seconds)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def cancelled(self, job, worker_id):
+        """Mark a job whose generation was cancelled while it ran"""
+        return self._finish(
+            job, worker_id, GenerationJob.STATUS_CANCELLED, "Cancelled"
+        )
+
+    def complete(self, job, worker_id):
+        """Mark a job as done if this worker still owns it"""
+        return self._finish(job, worker_id, GenerationJob.STATUS_DONE, None)
+
+    def fail(self, job, worker_id, error):
+        """Record a failed attempt, requeueing the job while attempts remain"""
+        status = (
+            GenerationJob.STATUS_QUEUED
+            if job.attempts < job.max_attempts
+            else GenerationJob.STATUS_FAILED
+        )
+        return self._finish(job, worker_id, status, error)
+
+    def _finish(self, job, worker_id, status, error):
+        values = {"status": status, "error": error, "lease_expires_at": None}
+        if status != GenerationJob.STATUS_QUEUED:
+            values["finished_at"] = datetime.utcnow()
+
+        result = db.session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.id == job.id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == GenerationJob.STATUS_RUNNING,
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.expire(job)
+        return result.rowcount == 1
+
+    def active_section_titles(self, outline_id):
+        """Titles of sections with an unfinished job for an outline"""
+        rows = (
+            db.session.query(GenerationJob.section_title)
+            .filter(
+                GenerationJob.outline_id == outline_id,
+                GenerationJob.status.in_(
+                    [*self.PENDING_STATUSES, GenerationJob.STATUS_RUNNING]
+                ),
+            )
+            .all()
+        )
+        return {title for (title,) in rows}
+
+    def get_batch(self, batch_id, project_id=None):
+        """Get all jobs of a batch in queue order"""
+        query = GenerationJob.query.filter_by(batch_id=batch_id)
+        if project_id is not None:
+            query = query.filter_by(project_id=project_id)
+        return query.order_by(GenerationJob.position, GenerationJob.id).all()
+
+
+class JobWorker:
+    """
+    Long-running loop that claims and runs generation jobs (`flask worker`)
+
+    Each of the worker's threads claims jobs on its own, under its own worker
+    id, so the body sections of an outline generate side by side.
+    """
+
+    def __init__(self, app, worker_id=None, poll_interval=None, threads=None):
+        self.app = app
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval or app.config.get("JOB_POLL_INTERVAL", 2)
+        self.threads = max(1, threads or app.config.get("JOB_WORKER_THREADS", 3))
+        self._stopping = threading.Event()
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+    def stop(self, *args):
+        """Finish the current jobs, then exit"""
+        logger.info(f"Worker {self.worker_id} stopping")
+        self._stopping.set()
+
+    def run(self, once=False):
+        """
+        Process jobs until stopped
+
+        Args:
+            once: Exit as soon as the queue is empty instead of polling
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        loops = self.start(once)
+        # Joined with a timeout so the main thread keeps handling signals
+        for loop in loops:
+            while loop.is_alive():
+                loop.join(1)
+
+    def start(self, once=False):
+        """Start the worker's threads in the background and return them"""
+        logger.info(f"Worker {self.worker_id} started with {self.threads} threads")
+        loops = [
+            threading.Thread(
+                target=self._loop,
+                args=(f"{self.worker_id}/{index}", once),
+                name=f"job-worker-{index}",
+                daemon=True,
+            )
+            for index in range(self.threads)
+        ]
+        for loop in loops:
+            loop.start()
+        return loops
+
+    def _loop(self, worker_id, once):
+        while not self._stopping.is_set():
+            with self.app.app_context():
+                job = JobQueue().claim(worker_id)
+                if job:
+                    with self._busy_lock:
+                        self._busy += 1
+                    try:
+                        self.process(job, worker_id)
+                    finally:
+                        with self._busy_lock:
+                            self._busy -= 1
+                    continue
+
+            # Jobs another thread is running may still release an introduction
+            # or conclusion, so only stop once the whole worker is idle
+            if once and not self._busy:
+                break
+            self._stopping.wait(self.poll_interval)
+
+    def process(self, job, worker_id=None):
+        """Run one claimed job, renewing its lease while it runs"""
+        worker_id = worker_id or self.worker_id
+        queue = JobQueue()
+        logger.info(
+            f"Worker {worker_id} generating '{job.section_title}' "
+            f"(job {job.id}, attempt {job.attempts})"
+        )
+
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job.id, worker_id, queue.lease_seconds, heartbeat_stop),
+            daemon=True,
+        )
+        heartbeat.start()
+
+        cancelled = False
+        try:
+            error = self._generate(job)
+        except GenerationCancelled:
+            cancelled = True
+            error = None
+        except Exception as e:
+            logger.error(f"Job {job.id} crashed: {str(e)}")
+            db.session.rollback()
+            error = str(e)
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+
+        if cancelled:
+            logger.info(f"Job {job.id} was cancelled")
+            queue.cancelled(job, worker_id)
+        elif error:
+            queue.fail(job, worker_id, error)
+        elif not queue.complete(job, worker_id):
+            logger.warning(f"Job {job.id} finished after its lease was taken over")
+
+    def _generate(self, job):
+        """Generate and store one section. Returns an error message or None."""
+        # Imported here so that the worker module stays importable without Gemini
+        from app.services.content_service import ContentService
+
+        project = db.session.get(ResearchProject, job.project_id)
+        outline = db.session.get(ResearchOutline, job.outline_id)
+        if not project or not outline:
+            return "Project or outline no longer exists"
+
+        # The user may have generated this section themselves since it was queued
+        if job.is_speculative and ResearchContent.query.filter_by(
+            project_id=project.id,
+            outline_id=outline.id,
+            section_title=job.section_title,
+        ).first():
+            logger.info(f"Skipping speculative job {job.id}; section already exists")
+            return None
+
+        def generate():
+            token = CancellationToken.start(
+                project.id, outline.id, job.section_title, job_id=job.id
+            )
+            content_service = ContentService()
+            content_data = content_service.generate_section_content(
+                project,
+                outline,
+                job.section_title,
+                [],
+                project.citation_style,
+                project.language,
+                page_by_page=True,
+                persist_pages=True,
+                cancel_token=token,
+            )
+
+            if content_data.get("cancelled"):
+                token.finish(GenerationRun.STATUS_CANCELLED)
+                raise GenerationCancelled(f"Job {job.id} was cancelled")
+            if "error" in content_data:
+                token.finish(GenerationRun.STATUS_FAILED)
+                return content_data
+
+            ResearchContent.store_section(
+                project.id, outline.id, job.section_title, content_data
+            )
+            db.session.commit()
+            token.finish(GenerationRun.STATUS_DONE)
+            return content_data
+
+        # A request generating the same section already stores it; wait for
+        # that instead of writing the section twice
+        content_data = SingleFlight().run(
+            section_key(project.id, outline.id, job.section_title), generate
+        )
+        return content_data.get("error")
+
+    def _heartbeat(self, job_id, worker_id, lease_seconds, stop):
+        interval = max(1, lease_seconds / 3)
+        while not stop.wait(interval):
+            with self.app.app_context():
+                if not JobQueue(lease_seconds=lease_seconds).renew_lease(
+                    job_id, worker_id
+                ):
+                    logger.warning(f"Lost lease on job {job_id}")
+                    return
+
+
+def cancel_project_generations(project_id, keep_outline_id=None):
+    """
+    Stop everything generating content for a project
+
+    Cancels queued jobs and asks running jobs and in-request generations to
+    stop. Used when the project is deleted, or when a new outline replaces the
+    others (keep_outline_id).
+    """
+    JobQueue().cancel(project_id, keep_outline_id=keep_outline_id)
+    CancellationToken.cancel_runs(project_id, keep_outline_id=keep_outline_id)
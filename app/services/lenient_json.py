@@ -0,0 +1,315 @@
+"""
+Incremental, lenient JSON parser for model responses
+
+Model output is JSON-shaped but often not valid JSON: it arrives wrapped in
+code fences or prose, with trailing commas, raw newlines inside strings,
+unescaped quotes in the middle of text, Python literals or a truncated tail.
+LenientJSONParser reads such text in one left-to-right pass (chunks can be fed
+as they stream in), repairs those problems locally, and never rewrites the
+text itself, so Arabic punctuation and quotes survive untouched.
+"""
+
+# Characters that may start a JSON value inside an array
+_ARRAY_VALUE_START = set('"{[-0123456789tfnTFN')
+_WHITESPACE = set(" \t\r\n")
+_ESCAPES = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "b": "\b",
+    "f": "\f",
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+}
+_LITERALS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "True": True,
+    "False": False,
+    "None": None,
+}
+
+# Parser modes
+_START = 0
+_VALUE = 1
+_STRING = 2
+_ESCAPE = 3
+_UNICODE = 4
+_QUOTE = 5
+_LITERAL = 6
+_DONE = 7
+
+
+class LenientJSONParser:
+    """
+    Parse the first JSON object or array found in a stream of text
+
+    Usage:
+        parser = LenientJSONParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+            parser.field_text("content")  # text of a field so far
+        value = parser.close()
+
+    Text before the first "{" or "[" (prose, code fences) and everything after
+    the matching close is ignored. An unescaped quote inside a string only ends
+    the string if what follows looks like JSON structure; otherwise it is kept
+    as part of the text. Work per character is constant, apart from short
+    lookahead after a quote, so parsing is linear in the response length.
+    """
+
+    def __init__(self, start_chars="{["):
+        # Only a value starting with one of these begins parsing; pass "{" when
+        # an object is expected so bracketed prose before it is skipped
+        self.start_chars = start_chars
+        self.root = None
+        self._mode = _START
+        # Frames are [container, key]; key is the pending key of an object
+        self._stack = []
+        self._buf = []
+        self._is_key = False
+        self._pending = []
+        self._unicode = []
+
+    @property
+    def done(self):
+        """Whether the top-level value has been closed"""
+        return self._mode == _DONE
+
+    def feed(self, text):
+        """Consume the next chunk of the response"""
+        for char in text:
+            if self._mode == _DONE:
+                return
+            self._step(char)
+
+    def close(self):
+        """
+        Finish parsing, closing anything left open by a truncated response
+
+        Returns:
+            The parsed dict/list, or None if no JSON value was found
+        """
+        if self._mode == _QUOTE:
+            self._pending = []
+            self._finish_string()
+        elif self._mode in (_STRING, _ESCAPE, _UNICODE):
+            self._finish_string()
+        elif self._mode == _LITERAL:
+            self._finish_literal()
+        self._stack = []
+        self._mode = _DONE
+        return self.root
+
+    def field_text(self, key, start=0):
+        """
+        Text of a string field of the top-level object, as far as it has arrived
+
+        Args:
+            key: Field name, e.g. "content"
+            start: Offset to read from, so callers streaming deltas only copy
+                the new part
+
+        Returns:
+            str: The (possibly partial) field text from start, or "" if the
+            field has not started
+        """
+        if (
+            self._mode in (_STRING, _ESCAPE, _UNICODE, _QUOTE)
+            and not self._is_key
+            and len(self._stack) == 1
+            and isinstance(self._stack[0][0], dict)
+            and self._stack[0][1] == key
+        ):
+            return "".join(self._buf[start:])
+
+        if isinstance(self.root, dict):
+            value = self.root.get(key)
+            if isinstance(value, str):
+                return value[start:]
+        return ""
+
+    # Character handling
+
+    def _step(self, char):
+        mode = self._mode
+        if mode == _STRING:
+            if char == '"':
+                self._mode = _QUOTE
+                self._pending = []
+            elif char == "\\":
+                self._mode = _ESCAPE
+            else:
+                # Raw newlines and control characters are kept as they are
+                self._buf.append(char)
+        elif mode == _VALUE:
+            self._value_char(char)
+        elif mode == _QUOTE:
+            self._pending.append(char)
+            self._resolve_quote()
+        elif mode == _ESCAPE:
+            if char == "u":
+                self._unicode = []
+                self._mode = _UNICODE
+            else:
+                # Unknown escapes keep the escaped character
+                self._buf.append(_ESCAPES.get(char, char))
+                self._mode = _STRING
+        elif mode == _UNICODE:
+            self._unicode.append(char)
+            if len(self._unicode) == 4:
+                digits = "".join(self._unicode)
+                try:
+                    self._buf.append(chr(int(digits, 16)))
+                except ValueError:
+                    self._buf.append("\\u" + digits)
+                self._mode = _STRING
+        elif mode == _LITERAL:
+            if char in _WHITESPACE or char in ",}]:":
+                self._finish_literal()
+                self._value_char(char)
+            else:
+                self._buf.append(char)
+        elif mode == _START:
+            if char in self.start_chars:
+                self._mode = _VALUE
+                self._value_char(char)
+
+    def _value_char(self, char):
+        if char in _WHITESPACE or char in ",:":
+            # Commas and colons carry no information once containers and keys
+            # are tracked, which makes trailing and doubled commas harmless
+            return
+        if char == "{" or char == "[":
+            container = {} if char == "{" else []
+            self._attach(container)
+            self._stack.append([container, None])
+        elif char == "}" or char == "]":
+            if self._stack:
+                self._stack.pop()
+            if not self._stack:
+                self._mode = _DONE
+        elif char == '"':
+            top = self._stack[-1] if self._stack else None
+            self._is_key = (
+                top is not None and isinstance(top[0], dict) and top[1] is None
+            )
+            self._buf = []
+            self._mode = _STRING
+        else:
+            self._buf = [char]
+            self._mode = _LITERAL
+
+    def _resolve_quote(self):
+        """Decide whether a quote inside a string closed it, using what follows"""
+        ends = self._quote_ends_string()
+        if ends is None:
+            return
+
+        pending = self._pending
+        self._pending = []
+        if ends:
+            self._finish_string()
+            self._mode = _VALUE
+        else:
+            # A stray quote in the text; keep it and rescan what followed
+            self._buf.append('"')
+            self._mode = _STRING
+        for char in pending:
+            self._step(char)
+
+    def _quote_ends_string(self):
+        """
+        Returns:
+            True if the quote closes the string, False if it is part of the
+            text, None if more input is needed to tell
+        """
+        index = 0
+        pending = self._pending
+        while index < len(pending) and pending[index] in _WHITESPACE:
+            index += 1
+        if index == len(pending):
+            return None
+
+        char = pending[index]
+        if not self._stack or char in "}]":
+            return True
+        if self._is_key:
+            return char in ":,"
+        if char != ",":
+            return False
+
+        # A comma only ends the string if the next thing starts a key or value
+        index += 1
+        while index < len(pending) and pending[index] in _WHITESPACE:
+            index += 1
+        if index == len(pending):
+            return None
+
+        after = pending[index]
+        if isinstance(self._stack[-1][0], dict):
+            return after in '"}'
+        return after in _ARRAY_VALUE_START or after == "]"
+
+    # Building values
+
+    def _attach(self, value):
+        if not self._stack:
+            if self.root is None:
+                self.root = value
+            return
+
+        frame = self._stack[-1]
+        container = frame[0]
+        if isinstance(container, list):
+            container.append(value)
+        elif frame[1] is not None:
+            container[frame[1]] = value
+            frame[1] = None
+
+    def _finish_string(self):
+        text = "".join(self._buf)
+        self._buf = []
+        if any("\ud800" <= char <= "\udfff" for char in text):
+            # Join surrogate pairs that arrived as two \u escapes
+            text = text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        if self._is_key:
+            self._stack[-1][1] = text
+            self._is_key = False
+        else:
+            self._attach(text)
+
+    def _finish_literal(self):
+        token = "".join(self._buf)
+        self._buf = []
+        self._mode = _VALUE
+        if token in _LITERALS:
+            self._attach(_LITERALS[token])
+            return
+        try:
+            self._attach(int(token))
+        except ValueError:
+            try:
+                self._attach(float(token))
+            except ValueError:
+                # An unquoted word; keep it as text
+                top = self._stack[-1] if self._stack else None
+                if top is not None and isinstance(top[0], dict) and top[1] is None:
+                    top[1] = token
+                else:
+                    self._attach(token)
+
+
+def parse_lenient(text, start_chars="{["):
+    """
+    Parse a complete model response
+
+    Returns:
+        The first JSON object (or array, unless start_chars excludes it) in the
+        text, repaired where needed, or None if there is none
+    """
+    parser = LenientJSONParser(start_chars)
+    parser.feed(text)
+    return parser.close()
@@ -0,0 +1,327 @@
+from google.api_core import exceptions as google_exceptions
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend:
+    """
+    What the services need from a language model
+
+    Implementations take the same generation_config and safety_settings
+    arguments as the Gemini SDK, so services can pass them through unchanged.
+    """
+
+    # Used in cache keys and logs
+    name = "base"
+
+    def generate(self, prompt, generation_config=None, safety_settings=None):
+        """Return the full response text for a prompt"""
+        raise NotImplementedError
+
+    def stream(self, prompt, generation_config=None, safety_settings=None):
+        """Yield the response text in chunks as it is produced"""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Adapter over a google.generativeai GenerativeModel"""
+
+    name = "gemini"
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, prompt, generation_config=None, safety_settings=None):
+        return self.model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+        ).text
+
+    def stream(self, prompt, generation_config=None, safety_settings=None):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            stream=True,
+        )
+        for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+
+# Word banks for the local backend's generated text
+
+EN_VOCABULARY = (
+    "analysis evidence framework findings literature methodology approach "
+    "significant empirical theoretical context implications variables outcomes "
+    "participants data model policy practice research study results impact "
+    "perspective limitations contribution relationship factors process"
+).split()
+AR_VOCABULARY = (
+    "التحليل الأدلة الإطار النتائج الأدبيات المنهجية المقاربة التجريبية النظرية "
+    "السياق الآثار المتغيرات المشاركين البيانات النموذج السياسات الممارسة البحث "
+    "الدراسة التأثير المنظور القيود الإسهام العلاقة العوامل العملية"
+).split()
+EN_CONNECTIVES = ["Moreover,", "However,", "In particular,", "As a result,", "Notably,"]
+AR_CONNECTIVES = ["علاوة على ذلك،", "ومع ذلك،", "وبشكل خاص،", "ونتيجة لذلك،", "ومن اللافت أن"]
+EN_AUTHORS = ["Smith", "Johnson", "Lee", "Garcia", "Brown", "Martin", "Nguyen"]
+AR_AUTHORS = ["العلي", "الحسن", "المنصوري", "الزهراني", "القحطاني", "الشمري"]
+
+EN_SECTIONS = [
+    "Introduction",
+    "Literature Review",
+    "Methodology",
+    "Results",
+    "Discussion",
+    "Conclusion",
+]
+AR_SECTIONS = ["المقدمة", "مراجعة الأدبيات", "المنهجية", "النتائج", "المناقشة", "الخاتمة"]
+
+# What the local backend reads back out of the service prompts
+ARABIC_LETTER = re.compile(r"[\u0600-\u06FF]")
+LATIN_LETTER = re.compile(r"[A-Za-z]")
+OUTLINE_PAGES = re.compile(r'"total_pages":\s*(\d+)')
+OUTLINE_TOPIC = re.compile(r'(?:topic|الموضوع):\s*"([^"]*)"')
+BATCH_PAGES = re.compile(r"(?:pages|للصفحات من) (\d+) (?:to|إلى) (\d+) (?:of|من) (\d+)")
+SINGLE_PAGE = re.compile(r"(?:page|للصفحة) (\d+) (?:of|من) (\d+)")
+SECTION_TITLE = re.compile(r'(?:the|قسم) "([^"]+)"')
+TARGET_WORDS = re.compile(r"(?:about|حوالي) (\d+) (?:words|كلمة)")
+
+MALFORMATIONS = ("fence", "trailing_comma", "raw_newlines", "prose", "truncated")
+
+
+class LocalBackend(LLMBackend):
+    """
+    Offline stand-in that answers service prompts with plausible payloads
+
+    Outline, page and batched-page prompts (English or Arabic) get responses
+    in the shape the real prompts ask for, with text derived from the prompt
+    so the same prompt always yields the same payload. Latency is drawn from a
+    log-normal distribution, and a configurable share of calls fail with
+    transient or quota errors or return malformed JSON, so the retry, rate
+    limiting and repair paths run as they would against Gemini.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        latency_median=0.8,
+        latency_sigma=0.5,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        malformed_rate=0.0,
+        seed=None,
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        # Latency, failures and malformations come from one seeded stream;
+        # payload text is seeded from the prompt instead
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            latency_median=config.get("LOCAL_LLM_LATENCY_MEDIAN_SECONDS", 0.8),
+            latency_sigma=config.get("LOCAL_LLM_LATENCY_SIGMA", 0.5),
+            error_rate=config.get("LOCAL_LLM_ERROR_RATE", 0.0),
+            throttle_rate=config.get("LOCAL_LLM_THROTTLE_RATE", 0.0),
+            malformed_rate=config.get("LOCAL_LLM_MALFORMED_RATE", 0.0),
+            seed=config.get("LOCAL_LLM_SEED"),
+        )
+
+    def generate(self, prompt, generation_config=None, safety_settings=None):
+        latency, failure, malformation = self._draw()
+        time.sleep(latency)
+        if failure:
+            raise failure
+        return self._respond(prompt, malformation)
+
+    def stream(self, prompt, generation_config=None, safety_settings=None):
+        latency, failure, malformation = self._draw()
+        # A third of the latency before the first chunk, the rest spread out
+        time.sleep(latency * 0.3)
+        if failure:
+            raise failure
+        text = self._respond(prompt, malformation)
+        chunk_size = 200
+        chunks = max(1, math.ceil(len(text) / chunk_size))
+        for i in range(0, len(text), chunk_size):
+            time.sleep(latency * 0.7 / chunks)
+            yield text[i : i + chunk_size]
+
+    def _draw(self):
+        with self._lock:
+            rng = self._rng
+            latency = 0.0
+            if self.latency_median > 0:
+                latency = self.latency_median * math.exp(
+                    rng.gauss(0, self.latency_sigma)
+                )
+            failure = None
+            roll = rng.random()
+            if roll < self.throttle_rate:
+                failure = google_exceptions.ResourceExhausted("429 Local quota exceeded")
+            elif roll < self.throttle_rate + self.error_rate:
+                failure = google_exceptions.ServiceUnavailable("503 Local backend unavailable")
+            malformation = None
+            if rng.random() < self.malformed_rate:
+                malformation = rng.choice(MALFORMATIONS)
+        return latency, failure, malformation
+
+    # Payloads
+
+    def _respond(self, prompt, malformation):
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        arabic = len(ARABIC_LETTER.findall(prompt)) > len(LATIN_LETTER.findall(prompt))
+        target = TARGET_WORDS.search(prompt)
+        words = int(target.group(1)) if target else 250
+        section = SECTION_TITLE.search(prompt)
+        section_title = section.group(1) if section else ("القسم" if arabic else "Section")
+
+        outline_pages = OUTLINE_PAGES.search(prompt)
+        batch = BATCH_PAGES.search(prompt)
+        if outline_pages and "sections" in prompt:
+            topic = OUTLINE_TOPIC.search(prompt)
+            payload = self._outline(
+                topic.group(1) if topic else "", int(outline_pages.group(1)), arabic, rng
+            )
+            return self._malform(json.dumps(payload, ensure_ascii=False, indent=2), malformation)
+
+        if batch and "<<<PAGE" in prompt:
+            first, last = int(batch.group(1)), int(batch.group(2))
+            blocks = []
+            for page in range(first, last + 1):
+                page_json = json.dumps(
+                    self._page(section_title, page, words, arabic, rng),
+                    ensure_ascii=False,
+                    indent=2,
+                )
+                blocks.append(f"<<<PAGE {page}>>>\n{page_json}")
+            # A malformed batch breaks one page, which the service regenerates
+            if malformation and blocks:
+                index = rng.randrange(len(blocks))
+                header, body = blocks[index].split("\n", 1)
+                blocks[index] = header + "\n" + self._malform(body, malformation)
+            return "\n".join(blocks) + "\n<<<END>>>"
+
+        single = SINGLE_PAGE.search(prompt)
+        page = int(single.group(1)) if single else 1
+        payload = self._page(section_title, page, words, arabic, rng)
+        return self._malform(json.dumps(payload, ensure_ascii=False, indent=2), malformation)
+
+    def _outline(self, topic, total_pages, arabic, rng):
+        titles = AR_SECTIONS if arabic else EN_SECTIONS
+        # Spread the pages over the sections, at least one page each
+        shares = [1] * len(titles)
+        for _ in range(max(0, total_pages - len(titles))):
+            shares[rng.randrange(len(titles))] += 1
+
+        sections = []
+        start = 1
+        for title, pages in zip(titles, shares):
+            subsections = [
+                {
+                    "title": f"{title}: {self._phrase(arabic, rng, 3)}",
+                    "pages": round(pages / 3, 2),
+                    "key_points": [self._phrase(arabic, rng, 6) for _ in range(3)],
+                }
+                for _ in range(3)
+            ]
+            sections.append(
+                {
+                    "title": title,
+                    "pages": pages,
+                    "page_range": {"start": start, "end": start + pages - 1},
+                    "subsections": subsections,
+                }
+            )
+            start += pages
+
+        return {
+            "title": topic or self._phrase(arabic, rng, 5),
+            "thesis_statement": self._sentence(arabic, rng),
+            "research_questions": [
+                self._phrase(arabic, rng, 8) + ("؟" if arabic else "?") for _ in range(3)
+            ],
+            "total_pages": sum(shares),
+            "sections": sections,
+        }
+
+    def _page(self, section_title, page, words, arabic, rng):
+        authors = AR_AUTHORS if arabic else EN_AUTHORS
+        citations = []
+        for i in range(rng.randint(1, 3)):
+            author, year = rng.choice(authors), rng.randint(2005, 2024)
+            citations.append(
+                {
+                    "id": f"{author.lower()}{year}",
+                    "authors": [author],
+                    "year": str(year),
+                    "title": self._phrase(arabic, rng, 6),
+                    "venue": self._phrase(arabic, rng, 3),
+                    "source_type": "journal",
+                }
+            )
+
+        paragraphs = []
+        written = 0
+        while written < words:
+            sentences = []
+            for _ in range(rng.randint(3, 6)):
+                sentence = self._sentence(arabic, rng)
+                if rng.random() < 0.3:
+                    citation = rng.choice(citations)
+                    cite = f"{citation['authors'][0]}, {citation['year']}"
+                    sentence = sentence[:-1] + f" ({cite})" + sentence[-1]
+                sentences.append(sentence)
+                written += len(sentence.split())
+            paragraphs.append(" ".join(sentences))
+
+        return {
+            "section_title": section_title,
+            "content": "\n\n".join(paragraphs),
+            "citations": citations,
+            "page_number": page,
+        }
+
+    def _phrase(self, arabic, rng, length):
+        vocabulary = AR_VOCABULARY if arabic else EN_VOCABULARY
+        phrase = " ".join(rng.choice(vocabulary) for _ in range(length))
+        return phrase if arabic else phrase.capitalize()
+
+    def _sentence(self, arabic, rng):
+        connectives = AR_CONNECTIVES if arabic else EN_CONNECTIVES
+        body = self._phrase(arabic, rng, rng.randint(8, 16))
+        if rng.random() < 0.3:
+            opener = rng.choice(connectives)
+            body = f"{opener} {body if arabic else body[0].lower() + body[1:]}"
+        return body + "."
+
+    def _malform(self, text, malformation):
+        """Damage a JSON response the way model output tends to be damaged"""
+        if malformation == "fence":
+            return f"```json\n{text}\n```"
+        if malformation == "trailing_comma":
+            return text.replace("\n  ]", ",\n  ]").replace("\n}", ",\n}")
+        if malformation == "raw_newlines":
+            return text.replace("\\n", "\n")
+        if malformation == "prose":
+            return f"Here is the requested JSON:\n{text}\nI hope this helps."
+        if malformation == "truncated":
+            return text[: max(1, int(len(text) * 0.8))]
+        return text
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class LLMCache:
+    """
+    Content-addressed cache of LLM responses stored in a local SQLite file
+
+    Entries are keyed by a hash of (model, prompt, generation_config), expire
+    after a TTL and are evicted least-recently-used once the cache holds more
+    than max_entries responses.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all threads of the process, serialized by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_accessed "
+            "ON llm_cache (last_accessed)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt, generation_config=None):
+        """Hash the inputs that determine a response"""
+        payload = json.dumps(
+            [model_name, prompt, generation_config or {}],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response text, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if not row:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 "
+                "WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model_name, response_text):
+        """Store a response and evict the least recently used entries over the limit"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, model, response, created_at, last_accessed, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, model_name, response_text, now, now),
+            )
+
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY last_accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def delete(self, key):
+        """Drop one cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current cache size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+def get_llm_cache(config):
+    """
+    Get the process-wide cache for an app config
+
+    Returns:
+        LLMCache or None when caching is disabled
+    """
+    if not config.get("LLM_CACHE_ENABLED", True):
+        return None
+
+    path = config.get("LLM_CACHE_PATH")
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = LLMCache(
+                path,
+                ttl_seconds=config.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+                max_entries=config.get("LLM_CACHE_MAX_ENTRIES", 5000),
+            )
+            logger.info(f"LLM response cache opened at {path}")
+        return _caches[path]
@@ -0,0 +1,99 @@
+import google.generativeai as genai
+from flask import current_app
+import logging
+import threading
+
+from app.services.llm_backend import GeminiBackend, LocalBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash-lite"
+
+# Config key holding the model name for each use case
+MODEL_SETTINGS = {
+    "outline": "GEMINI_OUTLINE_MODEL",
+    "content": "GEMINI_CONTENT_MODEL",
+}
+
+_lock = threading.Lock()
+_configured_api_key = None
+_models = {}
+_local_backends = {}
+
+
+def get_model_name(use_case, config=None):
+    """Get the configured Gemini model name for a use case ("outline", "content")"""
+    config = config if config is not None else current_app.config
+    setting = MODEL_SETTINGS.get(use_case)
+    name = (setting and config.get(setting)) or config.get(
+        "GEMINI_DEFAULT_MODEL", DEFAULT_MODEL
+    )
+    # Part of the response cache key, so local responses never mix with Gemini's
+    if config.get("LLM_BACKEND", "gemini") == "local":
+        return f"local/{name}"
+    return name
+
+
+def get_model(use_case, config=None):
+    """
+    Get the process-wide Gemini model for a use case
+
+    The client is configured and each model is built once per worker process,
+    on first use, so requests reuse the same transport instead of reconfiguring
+    the SDK (which drops its cached clients) every time a service is created.
+
+    Returns:
+        genai.GenerativeModel or None if no API key is configured
+    """
+    global _configured_api_key
+
+    config = config if config is not None else current_app.config
+    api_key = config.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+
+    model_name = get_model_name(use_case, config)
+
+    # Fast path once the registry is warm
+    model = _models.get(model_name)
+    if model is not None and _configured_api_key == api_key:
+        return model
+
+    with _lock:
+        if _configured_api_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+            _models.clear()
+            logger.info("Gemini client configured for this process")
+
+        model = _models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+            logger.info(f"Gemini model {model_name} created")
+
+        return model
+
+
+def get_backend(use_case, config=None):
+    """
+    Get the LLM backend for a use case, as selected by the LLM_BACKEND setting
+
+    "gemini" wraps the shared Gemini model; "local" is the offline stand-in,
+    one per process so its seeded failure sequence is not restarted by every
+    service.
+
+    Returns:
+        LLMBackend or None if Gemini is selected and no API key is configured
+    """
+    config = config if config is not None else current_app.config
+    if config.get("LLM_BACKEND", "gemini") == "local":
+        key = config.get("LOCAL_LLM_SEED")
+        with _lock:
+            if key not in _local_backends:
+                _local_backends[key] = LocalBackend.from_config(config)
+                logger.info("Using the local LLM backend")
+            return _local_backends[key]
+
+    model = get_model(use_case, config)
+    return GeminiBackend(model) if model is not None else None
@@ -0,0 +1,76 @@
+from collections import defaultdict, deque
+import threading
+
+# Latency samples kept per metric for percentile estimates
+LATENCY_WINDOW = 500
+
+
+class Metrics:
+    """
+    In-process counters and rolling latency windows
+
+    Values are per worker process; they are meant for logs, the admin metrics
+    endpoint and adaptive decisions such as the hedging delay.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=self.window))
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        """Record one latency sample, in seconds"""
+        with self._lock:
+            self._latencies[name].append(seconds)
+
+    def count(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def sample_count(self, name):
+        with self._lock:
+            return len(self._latencies.get(name, ()))
+
+    def percentile(self, name, percent):
+        """
+        Latency percentile over the rolling window
+
+        Returns:
+            float or None when there are no samples yet
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(name, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        """All counters plus p50/p95/p99 for every latency metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._latencies)
+
+        latencies = {}
+        for name in names:
+            latencies[name] = {
+                "samples": self.sample_count(name),
+                "p50": self.percentile(name, 50),
+                "p95": self.percentile(name, 95),
+                "p99": self.percentile(name, 99),
+            }
+        return {"counters": counters, "latencies": latencies}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._latencies.clear()
+
+
+# Process-wide registry
+metrics = Metrics()
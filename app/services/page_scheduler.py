@@ -0,0 +1,182 @@
+from contextlib import contextmanager
+import gc
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-page memory growth assumed until real pages have been measured
+DEFAULT_PAGE_COST_MB = 4.0
+# Weight of the newest measurement in the running per-page estimate
+COST_SMOOTHING = 0.3
+
+
+class PageScheduler:
+    """
+    Sizes page batches and concurrency from a resident memory budget
+
+    The scheduler keeps a running estimate of how much RSS one page adds,
+    measured around real page generations, and compares it to the room left
+    under the budget. Far from the limit it gets out of the way: batches and
+    worker counts are only capped by what the caller asks for, and there is no
+    collection or sleeping. Close to the limit it shrinks batches, and past the
+    pressure line it runs a collection and waits for memory to come back
+    before the next page starts.
+    """
+
+    def __init__(
+        self,
+        rss_budget_mb=512,
+        pressure_ratio=0.85,
+        max_wait_seconds=30,
+        default_page_cost_mb=DEFAULT_PAGE_COST_MB,
+    ):
+        self.rss_budget_mb = rss_budget_mb
+        self.pressure_ratio = pressure_ratio
+        self.max_wait_seconds = max_wait_seconds
+        self._page_cost_mb = default_page_cost_mb
+        # Pages being generated in this process right now, across threads
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._process = psutil.Process(os.getpid())
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            rss_budget_mb=config.get("CONTENT_RSS_BUDGET_MB", 512),
+            pressure_ratio=config.get("CONTENT_RSS_PRESSURE_RATIO", 0.85),
+            max_wait_seconds=config.get("CONTENT_BACKPRESSURE_MAX_WAIT_SECONDS", 30),
+        )
+
+    @property
+    def page_cost_mb(self):
+        with self._lock:
+            return self._page_cost_mb
+
+    def rss_mb(self):
+        return self._process.memory_info().rss / 1024 / 1024
+
+    def capacity(self):
+        """How many more pages fit below the pressure line, at the current estimate"""
+        free = self.rss_budget_mb * self.pressure_ratio - self.rss_mb()
+        return max(0, int(free // max(self.page_cost_mb, 0.1)))
+
+    def batch_size(self, remaining, upper=None):
+        """
+        Pages to run before memory is looked at again
+
+        Args:
+            remaining: Pages still to generate
+            upper: Cap from the caller, e.g. what fits in one response
+
+        Returns:
+            int: At least 1 when anything remains
+        """
+        if remaining <= 0:
+            return 0
+        size = min(remaining, upper or remaining, self.capacity())
+        return max(1, size)
+
+    def concurrency(self, pending, upper):
+        """Workers to run pending pages with, as many as memory allows up to upper"""
+        return self.batch_size(pending, upper)
+
+    def batches(self, page_numbers, upper=None):
+        """
+        Split page numbers into batches sized from the current headroom
+
+        Backpressure is applied before each batch, so the caller only has to
+        iterate.
+        """
+        index = 0
+        while index < len(page_numbers):
+            self.wait_for_headroom()
+            size = self.batch_size(len(page_numbers) - index, upper)
+            yield page_numbers[index : index + size]
+            index += size
+
+    def wait_for_headroom(self):
+        """
+        Block while RSS is past the pressure line, up to max_wait_seconds
+
+        Returns:
+            float: Seconds spent waiting (0 when there was room)
+        """
+        limit = self.rss_budget_mb * self.pressure_ratio
+        rss = self.rss_mb()
+        if rss + self.page_cost_mb <= limit:
+            return 0.0
+
+        start = time.monotonic()
+        metrics.increment("content.scheduler.backpressure")
+        gc.collect()
+        rss = self.rss_mb()
+        delay = 0.1
+        while rss + self.page_cost_mb > limit:
+            waited = time.monotonic() - start
+            if not self._inflight:
+                # Nothing in this process will finish and free memory, so
+                # waiting cannot help; the baseline itself is over budget
+                logger.warning(
+                    f"RSS {rss:.1f} MB is above {limit:.1f} MB with no pages in flight; continuing"
+                )
+                metrics.increment("content.scheduler.over_budget")
+                break
+            if waited >= self.max_wait_seconds:
+                # Running over the budget beats stalling the section forever
+                logger.warning(
+                    f"RSS {rss:.1f} MB still above {limit:.1f} MB after {waited:.1f}s; continuing"
+                )
+                metrics.increment("content.scheduler.backpressure_timeouts")
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            rss = self.rss_mb()
+
+        waited = time.monotonic() - start
+        metrics.observe("content.scheduler.backpressure_wait", waited)
+        logger.info(f"Waited {waited:.2f}s for memory headroom (RSS {rss:.1f} MB)")
+        return waited
+
+    @contextmanager
+    def track(self, pages=1):
+        """Measure the RSS growth of a block that generates the given number of pages"""
+        before = self.rss_mb()
+        with self._lock:
+            self._inflight += pages
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= pages
+            if pages > 0:
+                self.observe((self.rss_mb() - before) / pages)
+
+    def observe(self, page_delta_mb):
+        """Fold one per-page RSS measurement into the running estimate"""
+        # Freed memory is not a negative cost; the floor keeps estimates usable
+        sample = max(page_delta_mb, 0.1)
+        with self._lock:
+            self._page_cost_mb += COST_SMOOTHING * (sample - self._page_cost_mb)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_page_scheduler(config):
+    """Get the process-wide page scheduler, so page cost estimates are shared"""
+    key = (
+        config.get("CONTENT_RSS_BUDGET_MB", 512),
+        config.get("CONTENT_RSS_PRESSURE_RATIO", 0.85),
+    )
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = PageScheduler.from_config(config)
+        return _schedulers[key]
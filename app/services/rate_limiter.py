@@ -0,0 +1,376 @@
+from contextlib import contextmanager
+from google.api_core import exceptions as google_exceptions
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+import logging
+import random
+import threading
+import time
+
+from app import db
+from app.models.rate_limit import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_BUCKET = "gemini:requests"
+TOKENS_BUCKET = "gemini:tokens"
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited longer than RATE_LIMIT_MAX_WAIT_SECONDS for quota"""
+
+
+class _VersionConflict(Exception):
+    """Another worker updated a bucket between our read and our write"""
+
+
+def estimate_tokens(text):
+    """Rough token count for quota accounting (about four characters per token)"""
+    return max(1, len(text or "") // 4)
+
+
+def is_throttle_error(error):
+    """Whether an exception from the Gemini SDK means we are over quota"""
+    if isinstance(
+        error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+    ):
+        return True
+    message = str(error).lower()
+    return "429" in message or "resource exhausted" in message or "quota" in message
+
+
+class AdaptiveConcurrency:
+    """
+    Per-process cap on in-flight LLM calls, adjusted AIMD-style
+
+    Every successful call raises the limit by 1/limit (about +1 per round of
+    calls); every quota error halves it. Callers over the limit wait for a slot.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self.in_flight < max(1, int(self.limit)), timeout
+            ):
+                raise RateLimitTimeout("Timed out waiting for an LLM call slot")
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+                logger.warning(f"LLM concurrency reduced to {int(self.limit)}")
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class _Permit:
+    """Quota reserved for one call; record the real usage once it is known"""
+
+    def __init__(self, reserved_tokens):
+        self.reserved_tokens = reserved_tokens
+        self.used_tokens = None
+
+    def record(self, used_tokens):
+        self.used_tokens = used_tokens
+
+
+class RequestQuota:
+    """
+    Quota for one request, reserved afresh for every attempt
+
+    Quota errors are not retried with backoff like other transient errors: the
+    slot that saw the 429 pauses every worker, so the call is queued again and
+    the next reservation waits out the cooldown, up to max_requeues times.
+    """
+
+    def __init__(self, limiter, prompt, max_output_tokens=0):
+        self.limiter = limiter
+        self.prompt_tokens = estimate_tokens(prompt)
+        self.reserved_tokens = self.prompt_tokens + max_output_tokens
+        self.max_requeues = limiter.max_throttle_retries
+
+    def reserve(self, max_wait_seconds=None):
+        """Wait for quota and a concurrency slot; held until the block exits"""
+        return self.limiter.slot(self.reserved_tokens, max_wait_seconds)
+
+    def record(self, permit, result):
+        """Settle a reservation with the size of the response"""
+        permit.record(
+            self.prompt_tokens
+            + (estimate_tokens(result) if isinstance(result, str) else 0)
+        )
+
+
+class RateLimiter:
+    """
+    Token buckets for Gemini requests and tokens per minute, shared cluster-wide
+
+    Bucket state lives in the rate_limit_buckets table and is updated with
+    optimistic version checks, so every gunicorn and `flask worker` process
+    draws from the same quota. Callers that find a bucket empty sleep until it
+    refills instead of sending a request that would come back as a 429. When a
+    429 does arrive, all processes pause for a cooldown and this process halves
+    its concurrency; RetryPolicy then queues the call again.
+    """
+
+    def __init__(
+        self,
+        engine,
+        requests_per_minute,
+        tokens_per_minute,
+        max_concurrency=8,
+        cooldown_seconds=10,
+        max_wait_seconds=300,
+        max_throttle_retries=5,
+    ):
+        # Keep the engine rather than the scoped session so that fan-out
+        # threads without an app context can use the limiter
+        self.engine = engine
+        self.cooldown_seconds = cooldown_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.max_throttle_retries = max_throttle_retries
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.buckets = {
+            REQUESTS_BUCKET: float(requests_per_minute),
+            TOKENS_BUCKET: float(tokens_per_minute),
+        }
+        self._ensure_buckets()
+
+    def _ensure_buckets(self):
+        for name, per_minute in self.buckets.items():
+            values = {"capacity": per_minute, "refill_rate": per_minute / 60}
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        insert(RateLimitBucket).values(
+                            name=name,
+                            tokens=per_minute,
+                            updated_at=time.time(),
+                            blocked_until=0.0,
+                            version=0,
+                            **values,
+                        )
+                    )
+            except IntegrityError:
+                # Another process created it; pick up any quota change from config
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        update(RateLimitBucket)
+                        .where(RateLimitBucket.name == name)
+                        .values(version=RateLimitBucket.version + 1, **values)
+                    )
+
+    def quota(self, prompt, max_output_tokens=0):
+        """
+        Quota for one request, to be reserved before each attempt at sending it
+
+        Args:
+            prompt: The prompt text, used to estimate token usage
+            max_output_tokens: Output tokens to reserve until the response is known
+
+        Returns:
+            RequestQuota for RetryPolicy.call
+        """
+        return RequestQuota(self, prompt, max_output_tokens)
+
+    @contextmanager
+    def slot(self, reserved_tokens, max_wait_seconds=None):
+        """
+        Hold quota and a concurrency slot for the duration of one LLM call
+
+        Yields a permit; call permit.record(tokens) with the real usage so the
+        unused part of the reservation is handed back to the token bucket.
+        """
+        max_wait = self.max_wait_seconds
+        if max_wait_seconds is not None:
+            max_wait = min(max_wait, max_wait_seconds)
+        deadline = time.monotonic() + max_wait
+        self.concurrency.acquire(max_wait)
+        throttled = False
+        try:
+            self._take(reserved_tokens, deadline)
+            permit = _Permit(reserved_tokens)
+            try:
+                yield permit
+            except Exception as e:
+                if is_throttle_error(e):
+                    throttled = True
+                    self._block(self.cooldown_seconds)
+                raise
+            finally:
+                if permit.used_tokens is not None:
+                    self._refund(TOKENS_BUCKET, reserved_tokens - permit.used_tokens)
+        finally:
+            self.concurrency.release(throttled)
+
+    def _take(self, tokens, deadline):
+        """Block until both buckets can pay for one request of the given size"""
+        costs = {REQUESTS_BUCKET: 1.0, TOKENS_BUCKET: float(tokens)}
+        while True:
+            try:
+                wait = self._try_take(costs)
+            except (_VersionConflict, OperationalError):
+                # Lost a race with another worker (or SQLite was busy); retry soon
+                wait = random.uniform(0.01, 0.05)
+            if wait <= 0:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitTimeout("Timed out waiting for Gemini quota")
+            time.sleep(min(wait, remaining, 1.0) + random.uniform(0, 0.05))
+
+    def _try_take(self, costs):
+        """
+        Take the costs from the buckets if all of them can pay
+
+        Returns:
+            float: 0 on success, otherwise seconds until the buckets could pay
+        """
+        now = time.time()
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                select(RateLimitBucket.__table__).where(
+                    RateLimitBucket.name.in_(list(costs))
+                )
+            ).all()
+
+            wait = 0.0
+            balances = []
+            for bucket in rows:
+                if bucket.blocked_until > now:
+                    wait = max(wait, bucket.blocked_until - now)
+                    continue
+                available = min(
+                    bucket.capacity,
+                    bucket.tokens + (now - bucket.updated_at) * bucket.refill_rate,
+                )
+                # A request larger than the whole bucket goes through once it is full
+                needed = min(costs[bucket.name], bucket.capacity)
+                if available < needed:
+                    wait = max(wait, (needed - available) / bucket.refill_rate)
+                balances.append((bucket, available - costs[bucket.name]))
+
+            if wait > 0:
+                return wait
+
+            for bucket, balance in balances:
+                result = conn.execute(
+                    update(RateLimitBucket)
+                    .where(
+                        RateLimitBucket.name == bucket.name,
+                        RateLimitBucket.version == bucket.version,
+                    )
+                    .values(
+                        tokens=balance,
+                        updated_at=now,
+                        version=RateLimitBucket.version + 1,
+                    )
+                )
+                if result.rowcount != 1:
+                    raise _VersionConflict(bucket.name)
+        return 0.0
+
+    def _refund(self, name, tokens):
+        """Return (or, if negative, charge) tokens after the real usage is known"""
+        if not tokens:
+            return
+        balance = RateLimitBucket.tokens + tokens
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(RateLimitBucket)
+                    .where(RateLimitBucket.name == name)
+                    .values(
+                        tokens=case(
+                            (balance > RateLimitBucket.capacity, RateLimitBucket.capacity),
+                            else_=balance,
+                        ),
+                        version=RateLimitBucket.version + 1,
+                    )
+                )
+        except OperationalError as e:
+            logger.warning(f"Could not settle rate limit usage: {str(e)}")
+
+    def _block(self, seconds):
+        """Pause every worker after a quota error"""
+        until = time.time() + seconds
+        logger.warning(f"Gemini quota exceeded, pausing all calls for {seconds}s")
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.name == REQUESTS_BUCKET)
+                .values(
+                    blocked_until=case(
+                        (RateLimitBucket.blocked_until > until, RateLimitBucket.blocked_until),
+                        else_=until,
+                    ),
+                    tokens=0.0,
+                    updated_at=until,
+                    version=RateLimitBucket.version + 1,
+                )
+            )
+
+    def stats(self):
+        """Current bucket levels plus this process's concurrency limit"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    RateLimitBucket.name,
+                    RateLimitBucket.tokens,
+                    RateLimitBucket.capacity,
+                    RateLimitBucket.blocked_until,
+                )
+            ).all()
+        return {
+            "buckets": {
+                name: {
+                    "tokens": tokens,
+                    "capacity": capacity,
+                    "blocked_for": max(0.0, blocked_until - time.time()),
+                }
+                for name, tokens, capacity, blocked_until in rows
+            },
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+def get_rate_limiter(config):
+    """
+    Get the process-wide rate limiter for an app config
+
+    Must be called inside an app context the first time, to bind the engine.
+
+    Returns:
+        RateLimiter or None when rate limiting is disabled
+    """
+    if not config.get("RATE_LIMIT_ENABLED", True):
+        return None
+
+    key = config.get("SQLALCHEMY_DATABASE_URI")
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                db.engine,
+                requests_per_minute=config.get("GEMINI_REQUESTS_PER_MINUTE", 30),
+                tokens_per_minute=config.get("GEMINI_TOKENS_PER_MINUTE", 1000000),
+                max_concurrency=config.get("RATE_LIMIT_MAX_CONCURRENCY", 8),
+                cooldown_seconds=config.get("RATE_LIMIT_COOLDOWN_SECONDS", 10),
+                max_wait_seconds=config.get("RATE_LIMIT_MAX_WAIT_SECONDS", 300),
+                max_throttle_retries=config.get("RATE_LIMIT_MAX_THROTTLE_RETRIES", 5),
+            )
+            logger.info("Gemini rate limiter initialised")
+        return _limiters[key]
@@ -0,0 +1,224 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from google.api_core import exceptions as google_exceptions
+import logging
+import random
+import threading
+import time
+
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.metrics import metrics
+from app.services.rate_limiter import RateLimitTimeout, is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt; anything else (bad request, safety block,
+# auth) fails straight away
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
+
+# Quota errors; backed off like transient errors only when no rate limiter
+# takes care of them
+THROTTLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CallTimeout(TimeoutError):
+    """An LLM call did not return within LLM_CALL_TIMEOUT_SECONDS"""
+
+
+def _get_executor():
+    """Threads that run LLM calls so they can be timed out and hedged"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="llm-call"
+            )
+        return _executor
+
+
+def is_transient_error(error):
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class RetryPolicy:
+    """
+    Retries, timeouts and hedging for one kind of LLM call
+
+    Each attempt runs on a worker thread and is abandoned after the timeout.
+    Transient failures are retried with full-jitter exponential backoff. With
+    hedging on, an attempt still running after the recent p95 latency gets a
+    duplicate request and whichever finishes first wins.
+
+    With a rate limiter, quota is reserved before each attempt rather than
+    inside it, so the wait for quota neither counts against the timeout nor
+    shows up in the latency samples.
+    """
+
+    def __init__(
+        self,
+        name,
+        max_attempts=3,
+        base_delay=1.0,
+        max_delay=20.0,
+        timeout=60.0,
+        hedge=False,
+        hedge_min_samples=20,
+    ):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_config(cls, name, config):
+        return cls(
+            name,
+            max_attempts=config.get("LLM_MAX_ATTEMPTS", 3),
+            base_delay=config.get("LLM_RETRY_BASE_DELAY", 1.0),
+            max_delay=config.get("LLM_RETRY_MAX_DELAY", 20.0),
+            timeout=config.get("LLM_CALL_TIMEOUT_SECONDS", 60.0),
+            hedge=config.get("LLM_HEDGE_ENABLED", False),
+            hedge_min_samples=config.get("LLM_HEDGE_MIN_SAMPLES", 20),
+        )
+
+    def call(self, fn, deadline=None, quota=None):
+        """
+        Run fn() under the policy
+
+        Args:
+            deadline: Deadline of the request; attempts are cut short to fit in
+                it and no retry is started once it cannot finish in time
+            quota: RequestQuota from the rate limiter, reserved before every
+                attempt; quota errors then requeue the call instead of retrying
+
+        Returns:
+            The first successful return value of fn()
+
+        Raises:
+            The last error once attempts are exhausted, or a non-transient error.
+            DeadlineExceeded once the deadline has run out.
+        """
+        deadline = deadline or Deadline()
+        attempt = 1
+        requeues = 0
+        while True:
+            deadline.raise_if_expired()
+            try:
+                if quota is None:
+                    return self._attempt(fn, deadline.cap(self.timeout))
+                with quota.reserve(deadline.remaining()) as permit:
+                    result = self._attempt(fn, deadline.cap(self.timeout), quota)
+                    quota.record(permit, result)
+                    return result
+            except Exception as e:
+                if deadline.expired:
+                    metrics.increment(f"llm.{self.name}.deadline_exceeded")
+                    raise DeadlineExceeded(
+                        f"{self.name} call ran past the request deadline"
+                    ) from e
+                if quota is not None and is_throttle_error(e):
+                    if requeues >= quota.max_requeues:
+                        metrics.increment(f"llm.{self.name}.failures")
+                        raise
+                    # The limiter paused every worker; the next reservation
+                    # waits out the cooldown
+                    requeues += 1
+                    metrics.increment(f"llm.{self.name}.requeues")
+                    logger.warning(
+                        f"Gemini quota exceeded, requeueing {self.name} call "
+                        f"(attempt {requeues})"
+                    )
+                    continue
+                retryable = is_transient_error(e) or (
+                    quota is None and isinstance(e, THROTTLE_ERRORS)
+                )
+                if not retryable or attempt == self.max_attempts:
+                    metrics.increment(f"llm.{self.name}.failures")
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                )
+                if delay >= deadline.remaining():
+                    # Sleeping would leave no time for the retry itself
+                    metrics.increment(f"llm.{self.name}.failures")
+                    raise
+                metrics.increment(f"llm.{self.name}.retries")
+                logger.warning(
+                    f"{self.name} call failed ({type(e).__name__}: {str(e)}), "
+                    f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_attempts})"
+                )
+                time.sleep(delay)
+                attempt += 1
+
+    def _hedge_delay(self):
+        """Seconds to wait before hedging, or None while there is too little history"""
+        latency_metric = f"llm.{self.name}.latency"
+        if not self.hedge or metrics.sample_count(latency_metric) < self.hedge_min_samples:
+            return None
+        return metrics.percentile(latency_metric, 95)
+
+    @staticmethod
+    def _hedged(fn, quota):
+        """A hedge is sent only with quota to spare; it never queues for it"""
+        if quota is None:
+            return fn()
+        with quota.reserve(0) as permit:
+            result = fn()
+            quota.record(permit, result)
+            return result
+
+    def _attempt(self, fn, timeout, quota=None):
+        executor = _get_executor()
+        started = time.monotonic()
+        give_up_at = started + timeout
+
+        primary = executor.submit(fn)
+        pending = {primary}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                metrics.increment(f"llm.{self.name}.hedges")
+                pending.add(executor.submit(self._hedged, fn, quota))
+
+        error = None
+        while pending:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if isinstance(future.exception(), RateLimitTimeout):
+                    # A hedge with no quota to spare was never sent
+                    metrics.increment(f"llm.{self.name}.hedges_skipped")
+                    continue
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is not primary:
+                    metrics.increment(f"llm.{self.name}.hedge_wins")
+                metrics.observe(f"llm.{self.name}.latency", time.monotonic() - started)
+                # The losing request cannot be interrupted; its result is dropped
+                return future.result()
+
+        if pending:
+            metrics.increment(f"llm.{self.name}.timeouts")
+            raise CallTimeout(f"{self.name} call timed out after {timeout:.1f}s")
+        raise error
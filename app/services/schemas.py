@@ -0,0 +1,167 @@
+from google.generativeai.types import generation_types
+import inspect
+import json
+
+# Response schemas in the OpenAPI subset Gemini accepts for constrained output
+
+# References come back as fields and are formatted locally in the project's
+# style (app.services.citation_formatter), which costs fewer output tokens
+CITATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "authors": {"type": "array", "items": {"type": "string"}},
+        "year": {"type": "string"},
+        "title": {"type": "string"},
+        "venue": {"type": "string"},
+        "source_type": {"type": "string"},
+    },
+    "required": ["title"],
+}
+
+PAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "section_title": {"type": "string"},
+        "content": {"type": "string"},
+        "citations": {"type": "array", "items": CITATION_SCHEMA},
+        "page_number": {"type": "integer"},
+    },
+    "required": ["content", "citations"],
+}
+
+OUTLINE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "thesis_statement": {"type": "string"},
+        "research_questions": {"type": "array", "items": {"type": "string"}},
+        "total_pages": {"type": "integer"},
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "pages": {"type": "number"},
+                    "page_range": {
+                        "type": "object",
+                        "properties": {
+                            "start": {"type": "integer"},
+                            "end": {"type": "integer"},
+                        },
+                        "required": ["start", "end"],
+                    },
+                    "subsections": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string"},
+                                "pages": {"type": "number"},
+                                "key_points": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                },
+                            },
+                            "required": ["title", "key_points"],
+                        },
+                    },
+                },
+                "required": ["title", "subsections"],
+            },
+        },
+    },
+    "required": ["title", "thesis_statement", "research_questions", "sections"],
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+class SchemaError(ValueError):
+    """A response that is not valid JSON or does not match its schema"""
+
+
+def validate(value, schema, path="$"):
+    """
+    Check a decoded JSON value against a schema
+
+    This is the local stand-in for Gemini's server-side constraint; it covers
+    the subset used above (type, properties, required, items).
+
+    Returns:
+        list: Error messages, empty when the value matches
+    """
+    expected = _TYPES[schema["type"]]
+    # bool is an int subclass but never a valid number here
+    if not isinstance(value, expected) or (
+        isinstance(value, bool) and schema["type"] != "boolean"
+    ):
+        return [f"{path}: expected {schema['type']}"]
+
+    errors = []
+    if schema["type"] == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key}: required")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value and value[key] is not None:
+                errors.extend(validate(value[key], subschema, f"{path}.{key}"))
+    elif schema["type"] == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def parse_structured(response_text, schema):
+    """
+    Decode a response produced under a schema constraint
+
+    Only an optional code fence is tolerated; anything else that is not valid
+    JSON matching the schema raises SchemaError, so callers can count it and
+    fall back to their repair path.
+    """
+    text = response_text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise SchemaError(f"Invalid JSON: {str(e)}")
+
+    errors = validate(value, schema)
+    if errors:
+        raise SchemaError("; ".join(errors[:5]))
+    return value
+
+
+def supports_response_schema():
+    """Whether the installed SDK can ask Gemini for schema-constrained JSON"""
+    parameters = inspect.signature(generation_types.GenerationConfig).parameters
+    return "response_mime_type" in parameters and "response_schema" in parameters
+
+
+def structured_generation_config(generation_config, schema):
+    """
+    Add JSON output constraints to a generation config when the SDK supports them
+
+    With older SDKs the config is returned unchanged; responses are then
+    checked locally with parse_structured instead.
+    """
+    config = dict(generation_config or {})
+    if supports_response_schema():
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = schema
+    return config
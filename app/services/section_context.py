@@ -0,0 +1,119 @@
+from collections import Counter, deque
+import re
+
+from app.services.rate_limiter import estimate_tokens
+
+# Sentence ends in English and Arabic text
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s+")
+WORD = re.compile(r"\w+", re.UNICODE)
+# Markdown noise that should not end up in a summary
+MARKDOWN = re.compile(r"[*_`>#]+")
+
+
+def extract_summary(text, max_sentences=2):
+    """
+    The highest scoring sentences of a text, kept in reading order
+
+    Sentences score by how frequent their longer words are in the whole text,
+    so the ones closest to what the text is about win. Headings and markdown
+    are left out.
+    """
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith("#")]
+    plain = MARKDOWN.sub("", " ".join(lines))
+    sentences = [s.strip() for s in SENTENCE_END.split(plain) if s.strip()]
+    if len(sentences) <= max_sentences:
+        return sentences
+
+    # Words shorter than four letters are mostly function words in both languages
+    frequencies = Counter(word.lower() for word in WORD.findall(plain) if len(word) > 3)
+
+    def score(sentence):
+        words = [w.lower() for w in WORD.findall(sentence) if len(w) > 3]
+        if not words:
+            return 0
+        return sum(frequencies[w] for w in words) / len(words)
+
+    ranked = sorted(
+        range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True
+    )
+    keep = sorted(ranked[:max_sentences])
+    return [sentences[i] for i in keep]
+
+
+class SectionContext:
+    """
+    Compact continuity context for the next page of a section
+
+    Keeps a rolling extractive summary (the most representative sentences of
+    each finished page) plus the last words written, and renders them within a
+    token budget. Prompt size stays flat however long the section grows, while
+    the model still sees where the text left off.
+    """
+
+    def __init__(self, token_budget=600, tail_words=150, summary_sentences=2):
+        self.token_budget = token_budget
+        self.summary_sentences = summary_sentences
+        self._summaries = []
+        self._tail = deque(maxlen=tail_words)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            token_budget=config.get("CONTENT_CONTEXT_TOKEN_BUDGET", 600),
+            tail_words=config.get("CONTENT_CONTEXT_TAIL_WORDS", 150),
+            summary_sentences=config.get("CONTENT_CONTEXT_SUMMARY_SENTENCES", 2),
+        )
+
+    def __bool__(self):
+        return bool(self._tail)
+
+    def add_page(self, text):
+        """Fold a finished page into the summary and the recent-text window"""
+        if not text or not text.strip():
+            return
+
+        summary = self._summarize(text)
+        if summary:
+            self._summaries.append(summary)
+        self._tail.extend(text.split())
+        self._fit_summaries()
+
+    def render(self):
+        """
+        The context to put in the next page prompt
+
+        Returns:
+            str: "" before the first page, otherwise the summary of earlier
+            pages followed by the most recent text
+        """
+        if not self._tail:
+            return ""
+
+        parts = []
+        if self._summaries:
+            parts.append(
+                "\n".join(f"- {' '.join(sentences)}" for sentences in self._summaries)
+            )
+        parts.append("... " + " ".join(self._tail))
+        return "\n\n".join(parts)
+
+    def _summarize(self, text):
+        """Pick the highest scoring sentences of a page, kept in reading order"""
+        return extract_summary(text, self.summary_sentences)
+
+    def _fit_summaries(self):
+        """Shrink the oldest page summaries until the context fits the budget"""
+        tail_tokens = estimate_tokens(" ".join(self._tail))
+        budget = max(0, self.token_budget - tail_tokens)
+
+        def size():
+            return sum(estimate_tokens(" ".join(s)) for s in self._summaries)
+
+        while self._summaries and size() > budget:
+            # First cut older pages down to their best sentence, then drop them
+            for sentences in self._summaries:
+                if len(sentences) > 1:
+                    sentences.pop()
+                    break
+            else:
+                self._summaries.pop(0)
@@ -0,0 +1,266 @@
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import time
+import uuid
+
+from app import db
+from app.models.job import GenerationLease
+from app.services.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+def section_key(project_id, outline_id, section_title, pages_to_generate=None):
+    """Key shared by every path that generates a section's content"""
+    key = f"content:{project_id}:{outline_id}:{section_title}"
+    if pages_to_generate is not None:
+        # A page regeneration must not be served a just-finished full run
+        key += ":pages:" + ",".join(str(page) for page in sorted(pages_to_generate))
+    return key
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical generations across processes
+
+    The first request for a key inserts a lease row and runs the work; requests
+    for the same key that arrive while it runs wait for the row to be marked
+    done and return the same result. Coordination goes through the database, so
+    it holds across gunicorn workers and nodes. If the owner dies, its lease
+    expires and the next waiter takes over; an owner left without a complete
+    result abandons the lease so that a waiter takes over at once.
+
+    run() covers the common case. Callers that stream their own progress use
+    the steps directly: claim(), then keep_alive() around the work and
+    publish() or abandon(); or wait() while another caller holds the key.
+    """
+
+    def __init__(self, lease_seconds=None, poll_interval=None, result_ttl=None):
+        config = current_app.config
+        self.lease_seconds = lease_seconds or config.get(
+            "SINGLE_FLIGHT_LEASE_SECONDS", 150
+        )
+        self.poll_interval = poll_interval or config.get(
+            "SINGLE_FLIGHT_POLL_INTERVAL", 1
+        )
+        # A result finished this recently is handed to late duplicates
+        # (e.g. browser retries) instead of starting a new generation
+        self.result_ttl = (
+            result_ttl
+            if result_ttl is not None
+            else config.get("SINGLE_FLIGHT_RESULT_TTL_SECONDS", 30)
+        )
+
+    def run(self, key, fn, deadline=None):
+        """
+        Run fn() once for all concurrent callers using the same key
+
+        Args:
+            key: Identifies identical work, e.g. project/outline/section
+            fn: Callable returning a JSON-serializable result
+            deadline: Deadline of the request; waiting on another caller's
+                run stops there
+
+        Returns:
+            The result of fn(), computed here or by a concurrent caller
+
+        Raises:
+            DeadlineExceeded: The deadline passed while waiting on another caller
+        """
+        deadline = deadline or Deadline()
+
+        while True:
+            owner = self.claim(key)
+            if owner is not None:
+                try:
+                    with self.keep_alive(key, owner):
+                        result = fn()
+                except Exception as e:
+                    db.session.rollback()
+                    self.publish(key, owner, {"error": str(e)})
+                    raise
+                except BaseException:
+                    # Cancelled, or the process is stopping; a waiter takes over
+                    db.session.rollback()
+                    self.abandon(key, owner)
+                    raise
+                self.publish(key, owner, result)
+                return result
+
+            logger.info(f"Waiting on in-flight generation for {key}")
+            result = self.wait(key, deadline)
+            if result is not None:
+                return result
+            # The owner gave up or its lease ran out without a result; try to take over
+
+    def claim(self, key):
+        """
+        Try to become the caller that runs the work for key
+
+        Returns:
+            str: Owner id to publish or abandon the result with, or None while
+            another caller runs it (see wait())
+        """
+        owner = uuid.uuid4().hex
+        return owner if self._acquire(key, owner) else None
+
+    @contextmanager
+    def keep_alive(self, key, owner):
+        """Renew the lease while the block runs, so long work is not taken over"""
+        app = current_app._get_current_object()
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(max(1, self.lease_seconds / 3)):
+                with app.app_context():
+                    if not self._renew(key, owner):
+                        logger.warning(f"Lost single-flight lease on {key}")
+                        return
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def publish(self, key, owner, result):
+        """
+        Hand the owner's result to the callers waiting on key
+
+        A complete result is also served to duplicates for result_ttl, and an
+        error is passed on as a failure the next caller retries. A cancelled or
+        partial result only answers the request that produced it, so the lease
+        is abandoned and a waiter generates (or resumes) the section itself.
+        """
+        if isinstance(result, dict) and (
+            result.get("cancelled") or result.get("partial")
+        ):
+            self.abandon(key, owner)
+            return
+        status = (
+            GenerationLease.STATUS_FAILED
+            if isinstance(result, dict) and "error" in result
+            else GenerationLease.STATUS_DONE
+        )
+        self._release(key, owner, status, result)
+
+    def abandon(self, key, owner):
+        """Give up the lease without a result; the next caller runs the work"""
+        db.session.execute(
+            delete(GenerationLease)
+            .where(GenerationLease.key == key, GenerationLease.owner == owner)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _acquire(self, key, owner):
+        now = datetime.utcnow()
+        values = {
+            "owner": owner,
+            "status": GenerationLease.STATUS_RUNNING,
+            "result": None,
+            "expires_at": now + timedelta(seconds=self.lease_seconds),
+            "updated_at": now,
+        }
+
+        try:
+            db.session.add(GenerationLease(key=key, created_at=now, **values))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+
+        # Take over a lease whose owner died, a failure, or a result too old to reuse
+        result = db.session.execute(
+            update(GenerationLease)
+            .where(
+                GenerationLease.key == key,
+                or_(
+                    (GenerationLease.status == GenerationLease.STATUS_RUNNING)
+                    & (GenerationLease.expires_at < now),
+                    GenerationLease.status == GenerationLease.STATUS_FAILED,
+                    (GenerationLease.status == GenerationLease.STATUS_DONE)
+                    & (
+                        GenerationLease.updated_at
+                        < now - timedelta(seconds=self.result_ttl)
+                    ),
+                ),
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _renew(self, key, owner):
+        """Push the lease expiry out; False once the lease is no longer ours"""
+        result = db.session.execute(
+            update(GenerationLease)
+            .where(
+                GenerationLease.key == key,
+                GenerationLease.owner == owner,
+                GenerationLease.status == GenerationLease.STATUS_RUNNING,
+            )
+            .values(
+                expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _release(self, key, owner, status, result):
+        db.session.execute(
+            update(GenerationLease)
+            .where(GenerationLease.key == key, GenerationLease.owner == owner)
+            .values(
+                status=status,
+                result=json.dumps(result),
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def wait(self, key, deadline=None):
+        """
+        Poll the lease until its owner publishes a result
+
+        Returns:
+            The published result, or None if the lease expired or was
+            abandoned; claim() the key to run the work instead
+
+        Raises:
+            DeadlineExceeded: The deadline passed first
+        """
+        deadline = deadline or Deadline()
+        while True:
+            deadline.raise_if_expired()
+            row = db.session.execute(
+                select(
+                    GenerationLease.status,
+                    GenerationLease.result,
+                    GenerationLease.expires_at,
+                ).where(GenerationLease.key == key)
+            ).first()
+            # End the read transaction so the next poll sees fresh data
+            db.session.rollback()
+
+            if row is None:
+                return None
+
+            status, result, expires_at = row
+            if status != GenerationLease.STATUS_RUNNING:
+                return json.loads(result) if result else None
+            if expires_at < datetime.utcnow():
+                return None
+
+            time.sleep(deadline.cap(self.poll_interval))
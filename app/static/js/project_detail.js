@@ -2,6 +2,7 @@ document.addEventListener("DOMContentLoaded", function () {
   // DOM Elements
   const loadingOverlay = document.getElementById("loadingOverlay");
   const loadingMessage = document.getElementById("loadingMessage");
+  const loadingPreview = document.getElementById("loadingPreview");
   const outlineFormContainer = document.getElementById("outlineFormContainer");
   const outlineDetailContainer = document.getElementById("outlineDetailContainer");
 
@@ -16,6 +17,7 @@ document.addEventListener("DOMContentLoaded", function () {
   const approveOutlineFromDetail = document.getElementById("approveOutlineFromDetail");
   const generateAllContentBtn = document.getElementById("generateAllContentBtn");
   const refreshProgressBtn = document.getElementById("refreshProgressBtn");
+  const cancelGenerationBtn = document.getElementById("cancelGenerationBtn");
 
   // Progress elements
   const wordProgressBar = document.getElementById("wordProgressBar");
@@ -39,6 +41,10 @@ document.addEventListener("DOMContentLoaded", function () {
   // Hide loading overlay
   function hideLoading() {
     loadingOverlay.classList.remove("active");
+    if (loadingPreview) {
+      loadingPreview.classList.add("d-none");
+      loadingPreview.textContent = "";
+    }
   }
 
   // Show outline form
@@ -145,8 +151,184 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
+  // Generate content, streaming the text as it is written when the browser supports it
+  function generateContentStream(projectId, sectionTitle) {
+    showLoading(`Generating content for "${sectionTitle}"...`);
+    loadingPreview.textContent = "";
+    loadingPreview.classList.remove("d-none");
+
+    const source = new EventSource(
+      `/projects/${projectId}/generate-content/${encodeURIComponent(sectionTitle)}/stream`
+    );
+    let finished = false;
+    // Announced by the server once this request owns the generation
+    let generationId = null;
+
+    function cancelUrl() {
+      return `/projects/${projectId}/generations/${encodeURIComponent(generationId)}/cancel`;
+    }
+
+    // Stop a generation that nobody will see, e.g. when the page is closed
+    function cancelOnUnload() {
+      if (generationId && !finished) {
+        navigator.sendBeacon(cancelUrl());
+      }
+    }
+
+    function finish() {
+      finished = true;
+      source.close();
+      window.removeEventListener("beforeunload", cancelOnUnload);
+      if (cancelGenerationBtn) {
+        cancelGenerationBtn.classList.add("d-none");
+        cancelGenerationBtn.onclick = null;
+      }
+    }
+
+    async function cancelGeneration() {
+      if (!generationId) {
+        // Only waiting for another request's generation, which keeps running
+        finish();
+        hideLoading();
+        return;
+      }
+
+      cancelGenerationBtn.disabled = true;
+      loadingMessage.textContent = `Cancelling "${sectionTitle}"...`;
+      try {
+        // The stream ends with a "cancelled" event once the generation stops
+        await fetch(cancelUrl(), {
+          method: "POST",
+          headers: {
+            "X-Requested-With": "XMLHttpRequest",
+          },
+        });
+      } catch (error) {
+        console.error("Error cancelling content generation:", error);
+        cancelGenerationBtn.disabled = false;
+      }
+    }
+
+    window.addEventListener("beforeunload", cancelOnUnload);
+    if (cancelGenerationBtn) {
+      cancelGenerationBtn.disabled = false;
+      cancelGenerationBtn.classList.remove("d-none");
+      cancelGenerationBtn.onclick = cancelGeneration;
+    }
+
+    source.addEventListener("generation", function (event) {
+      generationId = JSON.parse(event.data).generation_id;
+    });
+
+    source.addEventListener("waiting", function (event) {
+      const data = JSON.parse(event.data);
+      loadingMessage.textContent = `${data.message}. Waiting for "${sectionTitle}"...`;
+    });
+
+    source.addEventListener("page_start", function (event) {
+      const data = JSON.parse(event.data);
+      loadingMessage.textContent = `Writing page ${data.page} of ${data.total_pages} for "${sectionTitle}"...`;
+    });
+
+    source.addEventListener("delta", function (event) {
+      const data = JSON.parse(event.data);
+      loadingPreview.textContent += data.text;
+      loadingPreview.scrollTop = loadingPreview.scrollHeight;
+    });
+
+    source.addEventListener("page_complete", function () {
+      loadingPreview.textContent += "\n\n";
+    });
+
+    source.addEventListener("page_error", function (event) {
+      const data = JSON.parse(event.data);
+      console.error(`Error generating page ${data.page}:`, data.error);
+    });
+
+    source.addEventListener("done", function () {
+      finish();
+      window.location.reload();
+    });
+
+    source.addEventListener("partial", function (event) {
+      // The deadline ran out; the finished pages are stored, the section is not
+      finish();
+      hideLoading();
+      offerResume(JSON.parse(event.data), sectionTitle);
+    });
+
+    source.addEventListener("cancelled", function () {
+      // Pages finished before the cancel are kept for the next run
+      finish();
+      hideLoading();
+    });
+
+    source.addEventListener("error", function (event) {
+      if (finished) {
+        return;
+      }
+      // Close straight away so the browser does not reconnect and start a second generation
+      finish();
+      hideLoading();
+      const message = event.data ? JSON.parse(event.data).error : "Connection lost";
+      alert("Error generating content: " + message);
+    });
+  }
+
+  // Report a section cut short by the request deadline and offer to finish it
+  function offerResume(data, sectionTitle) {
+    const remaining = data.remaining_pages.length;
+    const range = data.page_range;
+    const saved = range ? range.end - range.start + 1 - remaining : null;
+    const savedText = saved === null ? "The finished pages" : `${saved} pages`;
+    if (
+      confirm(
+        `Time ran out while generating "${sectionTitle}". ${savedText} were saved and ` +
+          `${remaining} pages are still to be written. Generate the remaining pages now?`
+      )
+    ) {
+      resumeContent(data.resume_url, sectionTitle);
+    }
+  }
+
+  // Generate the pages a partial section is missing, then show the whole section
+  async function resumeContent(resumeUrl, sectionTitle) {
+    showLoading(`Generating the remaining pages of "${sectionTitle}"...`);
+
+    try {
+      const response = await fetch(resumeUrl, {
+        method: "POST",
+        headers: {
+          "X-Requested-With": "XMLHttpRequest",
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({}),
+      });
+      const result = await response.json();
+
+      if (result.success && result.partial) {
+        hideLoading();
+        offerResume(result, sectionTitle);
+      } else if (result.success) {
+        window.location.reload();
+      } else {
+        hideLoading();
+        alert("Error generating content: " + (result.error || "Unknown error"));
+      }
+    } catch (error) {
+      hideLoading();
+      console.error("Error resuming content generation:", error);
+      alert("An error occurred while generating content. Please try again.");
+    }
+  }
+
   // Generate content
   async function generateContent(projectId, sectionTitle) {
+    if (window.EventSource && loadingPreview) {
+      generateContentStream(projectId, sectionTitle);
+      return;
+    }
+
     showLoading(`Generating content for "${sectionTitle}". This may take a few minutes...`);
 
     try {
@@ -202,25 +384,17 @@ document.addEventListener("DOMContentLoaded", function () {
       const result = await response.json();
 
       if (result.success) {
-        // Don't hide loading yet - keep it visible during generation
-        
-        // Start generating content for each section sequentially
+        // Don't hide loading yet - keep it visible while the workers run
         const sections = result.sections;
-        
-        if (sections.length > 0) {
-          // Keep the loading overlay active but update the message
-          loadingMessage.textContent = `Generating content for "${sections[0]}"... (1/${sections.length})`;
-          
-          // Generate the first section
-          await generateNextSection(projectId, sections, 0);
+
+        if (result.job_id && sections.length > 0) {
+          loadingMessage.textContent = `Queued ${sections.length} sections for generation...`;
+          pollGenerationJob(projectId, result.job_id);
         } else {
           hideLoading();
           // Refresh the page if all sections are already generated
           window.location.reload();
         }
-        
-        // Set up polling for progress updates
-        startProgressPolling(projectId);
       } else {
         hideLoading();
         alert("Error starting content generation: " + (result.error || "Unknown error"));
@@ -232,29 +406,13 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
-  // Generate sections one by one
-  async function generateNextSection(projectId, sections, currentIndex) {
-    if (currentIndex >= sections.length) {
-      // All sections generated, reload the page
-      hideLoading();
-      window.location.reload();
-      return;
-    }
-
-    const sectionTitle = sections[currentIndex];
-    loadingMessage.textContent = `Generating content for "${sectionTitle}"... (${currentIndex + 1}/${sections.length})`;
-
+  // Follow a queued generation job until every section has finished
+  async function pollGenerationJob(projectId, jobId) {
     try {
-      const response = await fetch(`/projects/${projectId}/generate-content/${encodeURIComponent(sectionTitle)}`, {
-        method: "POST",
+      const response = await fetch(`/projects/${projectId}/jobs/${jobId}`, {
         headers: {
           "X-Requested-With": "XMLHttpRequest",
-          "Content-Type": "application/json",
         },
-        body: JSON.stringify({
-          section_title: sectionTitle,
-          page_by_page: true,
-        }),
       });
 
       if (!response.ok) {
@@ -264,27 +422,29 @@ document.addEventListener("DOMContentLoaded", function () {
       const result = await response.json();
 
       if (result.success) {
-        // Update progress
-        updateContentProgress(projectId);
-        
-        // Move to the next section
-        setTimeout(() => {
-          generateNextSection(projectId, sections, currentIndex + 1);
-        }, 1000); // Small delay between sections
-      } else {
-        console.error("Error generating content for section:", sectionTitle, result.error);
-        // Continue with next section even if this one failed
-        setTimeout(() => {
-          generateNextSection(projectId, sections, currentIndex + 1);
-        }, 1000);
+        // Body sections generate side by side; the introduction and conclusion follow
+        const running = result.sections
+          .filter((section) => section.status === "running")
+          .map((section) => `"${section.section_title}"`);
+        loadingMessage.textContent = running.length
+          ? `Generating content for ${running.join(", ")}... (${result.finished_sections}/${result.total_sections})`
+          : `Waiting for a worker... (${result.finished_sections}/${result.total_sections})`;
+
+        if (result.done) {
+          if (result.failed_sections > 0) {
+            console.error(`${result.failed_sections} sections failed to generate`);
+          }
+          hideLoading();
+          window.location.reload();
+          return;
+        }
       }
     } catch (error) {
-      console.error("Error generating content for section:", sectionTitle, error);
-      // Continue with next section even if this one failed
-      setTimeout(() => {
-        generateNextSection(projectId, sections, currentIndex + 1);
-      }, 1000);
+      console.error("Error checking generation job:", error);
+      // Keep polling; the job keeps running on the server
     }
+
+    setTimeout(() => pollGenerationJob(projectId, jobId), 3000);
   }
 
   // Update progress bars
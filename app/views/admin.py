@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, g
+from flask import Blueprint, render_template, redirect, url_for, request, flash, g, jsonify, current_app
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from app.models.user import User
+from app.models.outline_cache import outline_cache
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import metrics
+from app.services.rate_limiter import get_rate_limiter
 from app import db
 from functools import wraps
 import logging
@@ -150,4 +154,18 @@ def delete_user(user_id):
         logging.error(f"Error deleting user: {str(e)}", exc_info=True)
         flash(f"Error deleting user: {str(e)}", "error")
     
-    return redirect(url_for("admin.manage_users"))
\ No newline at end of file
+    return redirect(url_for("admin.manage_users"))
+
+@admin_bp.route("/metrics")
+@admin_required
+def generation_metrics():
+    """LLM call counters (retries, hedges, timeouts), latencies and caches for this worker"""
+    snapshot = metrics.snapshot()
+    snapshot["outline_cache"] = outline_cache.stats()
+    llm_cache = get_llm_cache(current_app.config)
+    if llm_cache:
+        snapshot["llm_cache"] = llm_cache.stats()
+    rate_limiter = get_rate_limiter(current_app.config)
+    if rate_limiter:
+        snapshot["rate_limiter"] = rate_limiter.stats()
+    return jsonify(snapshot)
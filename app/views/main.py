@@ -72,10 +72,8 @@ def dashboard():
 
             if latest_outline:
                 # Check if all sections have content
-                outline_structure = latest_outline.get_outline_structure()
                 total_sections = 2  # Introduction and Conclusion
-                if "sections" in outline_structure:
-                    total_sections += len(outline_structure["sections"])
+                total_sections += len(latest_outline.get_outline().sections)
 
                 content_count = ResearchContent.query.filter_by(
                     project_id=project.id, outline_id=latest_outline.id
@@ -1,8 +1,10 @@
 import datetime
 import json
+import logging
 from flask import (
     Blueprint,
     Response,
+    current_app,
     jsonify,
     render_template,
     redirect,
@@ -14,14 +16,33 @@ from flask import (
 )
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from app.models.research import ResearchProject, ResearchOutline
-from app.models.content import ResearchContent
+from app.models.citation import (
+    Citation,
+    CitationSource,
+    ContentCitation,
+    PageCitation,
+)
+from app.models.content import (
+    ResearchContent,
+    ResearchContentPage,
+    SectionCheckpoint,
+    SectionSummary,
+)
+from app.models.job import GenerationJob, GenerationRun
 from app.services.gemini_service import GeminiService
 from app.services.content_service import ContentService
 from app.services.export_service import ExportService
+from app.services.cancellation import CancellationToken
+from app.services.citation_formatter import format_reference
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.job_service import JobQueue, cancel_project_generations
+from app.services.single_flight import SingleFlight, section_key
 from app import db
 
 research_views_bp = Blueprint("research_views", __name__)
 
+logger = logging.getLogger(__name__)
+
 
 def jwt_cookie_required(f):
     """Custom decorator for JWT cookie verification"""
@@ -57,6 +78,110 @@ def public_route(f):
     return decorated_function
 
 
+def generate_section_once(
+    project,
+    outline,
+    section_title,
+    subsection_titles,
+    generation_id=None,
+    deadline=None,
+    **generation_options,
+):
+    """
+    Generate and store a section's content
+
+    Concurrent requests for the same section (double clicks, browser retries,
+    generate-all racing a manual click) share a single generation, even across
+    gunicorn workers. The generation can be cancelled through generation_id,
+    or through its section.
+
+    The deadline defaults to REQUEST_DEADLINE_SECONDS from now. A generation
+    that runs out of time stores its finished pages but not the section, and
+    returns them with "partial" set; see partial_content_response().
+
+    Returns:
+        dict: The generated content data, or {"error": ...}
+    """
+    project_id, outline_id = project.id, outline.id
+    deadline = deadline or Deadline.for_request(current_app.config)
+
+    def generate():
+        token = CancellationToken.start(
+            project_id, outline_id, section_title, run_id=generation_id
+        )
+        content_service = ContentService()
+        content_data = content_service.generate_section_content(
+            project,
+            outline,
+            section_title,
+            subsection_titles,
+            project.citation_style,
+            project.language,
+            persist_pages=True,
+            cancel_token=token,
+            deadline=deadline,
+            **generation_options,
+        )
+
+        if content_data.get("cancelled"):
+            token.finish(GenerationRun.STATUS_CANCELLED)
+        elif "error" in content_data:
+            token.finish(GenerationRun.STATUS_FAILED)
+        elif content_data.get("partial"):
+            token.finish(GenerationRun.STATUS_PARTIAL)
+        else:
+            ResearchContent.store_section(
+                project_id, outline_id, section_title, content_data
+            )
+            db.session.commit()
+            token.finish(GenerationRun.STATUS_DONE)
+
+        return content_data
+
+    key = section_key(
+        project_id,
+        outline_id,
+        section_title,
+        generation_options.get("pages_to_generate"),
+    )
+    try:
+        return SingleFlight().run(key, generate, deadline)
+    except DeadlineExceeded:
+        # Another request is still generating this section
+        return {
+            "error": "This section is still being generated, try again shortly",
+            "in_progress": True,
+        }
+
+
+def partial_content_response(project, section_title, content_data):
+    """
+    Answer with the pages written before the request deadline
+
+    The finished pages are stored, so posting to resume_url generates only
+    the remaining ones and then stores the whole section.
+    """
+    return (
+        jsonify(
+            {
+                "success": True,
+                "partial": True,
+                "message": f"{len(content_data['remaining_pages'])} pages are "
+                "still to be generated",
+                "content": content_data["content"],
+                "citations": content_data["citations"],
+                "remaining_pages": content_data["remaining_pages"],
+                "resume_url": url_for(
+                    "research_views.regenerate_pages",
+                    project_id=project.id,
+                    section_title=section_title,
+                ),
+            }
+        ),
+        202,
+    )
+
+
 @research_views_bp.route("/projects")
 @jwt_cookie_required
 def projects():
@@ -172,6 +297,7 @@ def generate_outline(project_id):
         if request.method == "POST":
             complexity = request.form.get("complexity", "medium")
             total_pages = int(request.form.get("total_pages", 10))
+            bypass_cache = request.form.get("bypass_cache", "false").lower() == "true"
 
             gemini_service = GeminiService()
             outline_structure = gemini_service.generate_research_outline(
@@ -179,6 +305,8 @@ def generate_outline(project_id):
                 complexity=complexity,
                 language=project.language,
                 total_pages=total_pages,
+                use_cache=not bypass_cache,
+                deadline=Deadline.for_request(current_app.config),
             )
 
             if "error" in outline_structure:
@@ -198,6 +326,9 @@ def generate_outline(project_id):
             db.session.add(outline)
             db.session.commit()
 
+            # Content still being generated for the old outlines is no longer wanted
+            cancel_project_generations(project.id, keep_outline_id=outline.id)
+
             flash("Outline generated successfully", "success")
             return redirect(
                 url_for("research_views.outline_detail", outline_id=outline.id)
@@ -231,8 +362,13 @@ def outline_detail(outline_id):
             try:
                 outline.is_approved = True
                 db.session.commit()
+                job_id = JobQueue().enqueue_speculative(outline.project, outline)
                 return jsonify(
-                    {"success": True, "message": "Outline approved successfully"}
+                    {
+                        "success": True,
+                        "message": "Outline approved successfully",
+                        "job_id": job_id,
+                    }
                 )
             except Exception as e:
                 db.session.rollback()
@@ -241,6 +377,7 @@ def outline_detail(outline_id):
             try:
                 outline.is_approved = True
                 db.session.commit()
+                JobQueue().enqueue_speculative(outline.project, outline)
                 flash("Outline approved successfully", "success")
             except Exception as e:
                 db.session.rollback()
@@ -312,6 +449,7 @@ def generate_content(project_id, section_title):
 
         # Get page_by_page parameter
         page_by_page = request.args.get("page_by_page", "true").lower() == "true"
+        bypass_cache = request.args.get("bypass_cache", "false").lower() == "true"
 
         # Handle AJAX POST request
         if (
@@ -322,26 +460,15 @@ def generate_content(project_id, section_title):
             if data:
                 section_title = data.get("section_title", section_title)
                 page_by_page = data.get("page_by_page", True)
+                generation_mode = data.get("generation_mode")
+                bypass_cache = data.get("bypass_cache", bypass_cache)
                 subsection_titles = data.get("subsection_titles", [])
                 json_content = data.get("json_content")
 
                 if json_content:
-                    content = ResearchContent.query.filter_by(
-                        project_id=project.id,
-                        outline_id=outline.id,
-                        section_title=section_title,
-                    ).first()
-
-                    if not content:
-                        content = ResearchContent(
-                            project_id=project.id,
-                            outline_id=outline.id,
-                            section_title=section_title,
-                        )
-
-                    content.from_json_response(json_content)
-
-                    db.session.add(content)
+                    ResearchContent.store_section(
+                        project.id, outline.id, section_title, json_content
+                    )
                     db.session.commit()
 
                     return jsonify(
@@ -349,29 +476,17 @@ def generate_content(project_id, section_title):
                     )
 
                 # Generate content for the section
-                outline_structure = outline.get_outline_structure()
-
-                # Find the section in the outline structure
-                section_data = None
-                if section_title == "Introduction" or section_title == "المقدمة":
-                    section_data = {
-                        "title": section_title,
-                        "thesis_statement": outline_structure.get(
-                            "thesis_statement", ""
-                        ),
-                        "research_questions": outline_structure.get(
-                            "research_questions", []
-                        ),
-                    }
-                elif section_title == "Conclusion" or section_title == "الخاتمة":
-                    section_data = {"title": section_title}
-                else:
-                    for section in outline_structure.get("sections", []):
-                        if section.get("title") == section_title:
-                            section_data = section
-                            break
-
-                if not section_data:
+                outline_doc = outline.get_outline()
+
+                # Introduction and conclusion may be implied rather than listed
+                section_known = section_title in (
+                    "Introduction",
+                    "المقدمة",
+                    "Conclusion",
+                    "الخاتمة",
+                ) or outline_doc.section(section_title)
+
+                if not section_known:
                     return jsonify(
                         {
                             "success": False,
@@ -379,40 +494,46 @@ def generate_content(project_id, section_title):
                         }
                     )
 
-                content_service = ContentService()
-                content_data = content_service.generate_section_content(
+                content_data = generate_section_once(
                     project,
                     outline,
                     section_title,
                     subsection_titles,
-                    project.citation_style,
-                    project.language,
+                    generation_id=data.get("generation_id"),
                     page_by_page=page_by_page,
+                    generation_mode=generation_mode,
+                    use_cache=not bypass_cache,
                 )
 
+                if content_data.get("cancelled"):
+                    return (
+                        jsonify(
+                            {
+                                "success": False,
+                                "cancelled": True,
+                                "error": content_data["error"],
+                            }
+                        ),
+                        409,
+                    )
+
                 if "error" in content_data:
                     return (
                         jsonify({"success": False, "error": content_data["error"]}),
                         400,
                     )
 
+                if content_data.get("partial"):
+                    return partial_content_response(
+                        project, section_title, content_data
+                    )
+
                 content = ResearchContent.query.filter_by(
                     project_id=project.id,
                     outline_id=outline.id,
                     section_title=section_title,
                 ).first()
 
-                if not content:
-                    content = ResearchContent(
-                        project_id=project.id,
-                        outline_id=outline.id,
-                        section_title=section_title,
-                    )
-
-                content.from_json_response(content_data)
-                db.session.add(content)
-                db.session.commit()
-
                 return jsonify(
                     {
                         "success": True,
@@ -425,15 +546,13 @@ def generate_content(project_id, section_title):
         # Handle regular GET request
         if request.method == "GET":
             # Generate content in the background
-            content_service = ContentService()
-            content_data = content_service.generate_section_content(
+            content_data = generate_section_once(
                 project,
                 outline,
                 section_title,
                 [],
-                project.citation_style,
-                project.language,
                 page_by_page=page_by_page,
+                use_cache=not bypass_cache,
             )
 
             if "error" in content_data:
@@ -442,23 +561,15 @@ def generate_content(project_id, section_title):
                     url_for("research_views.outline_detail", outline_id=outline.id)
                 )
 
-            content = ResearchContent.query.filter_by(
-                project_id=project.id,
-                outline_id=outline.id,
-                section_title=section_title,
-            ).first()
-
-            if not content:
-                content = ResearchContent(
-                    project_id=project.id,
-                    outline_id=outline.id,
-                    section_title=section_title,
+            if content_data.get("partial"):
+                flash(
+                    f"Only part of '{section_title}' could be generated in time; "
+                    f"{len(content_data['remaining_pages'])} pages are left",
+                    "warning",
+                )
+                return redirect(
+                    url_for("research_views.outline_detail", outline_id=outline.id)
                 )
-
-            content.from_json_response(content_data)
-
-            db.session.add(content)
-            db.session.commit()
 
             flash(f"Content for '{section_title}' generated successfully", "success")
             return redirect(
@@ -470,62 +581,38 @@ def generate_content(project_id, section_title):
         json_content = request.json.get("json_content")
 
         if json_content:
-            content = ResearchContent.query.filter_by(
-                project_id=project.id,
-                outline_id=outline.id,
-                section_title=section_title,
-            ).first()
-
-            if not content:
-                content = ResearchContent(
-                    project_id=project.id,
-                    outline_id=outline.id,
-                    section_title=section_title,
-                )
-
-            content.from_json_response(json_content)
-
-            db.session.add(content)
+            ResearchContent.store_section(
+                project.id, outline.id, section_title, json_content
+            )
             db.session.commit()
 
             return jsonify({"success": True, "message": "Content saved successfully"})
 
-        content_service = ContentService()
-        content_data = content_service.generate_section_content(
+        content_data = generate_section_once(
             project,
             outline,
             section_title,
             subsection_titles,
-            project.citation_style,
-            project.language,
             page_by_page=page_by_page,
+            use_cache=not bypass_cache,
         )
 
         if "error" in content_data:
             return jsonify(content_data), 400
 
+        if content_data.get("partial"):
+            return partial_content_response(project, section_title, content_data)
+
         content = ResearchContent.query.filter_by(
             project_id=project.id,
             outline_id=outline.id,
             section_title=section_title,
         ).first()
 
-        if not content:
-            content = ResearchContent(
-                project_id=project.id,
-                outline_id=outline.id,
-                section_title=section_title,
-            )
-
-        content.from_json_response(content_data)
-
-        print(f"Saving content for section: {section_title}")
+        print(f"Saved content for section: {section_title}")
         print(f"Content length: {len(content.content)}")
         print(f"Citations count: {len(content.get_citations())}")
 
-        db.session.add(content)
-        db.session.commit()
-
         return jsonify(
             {
                 "success": True,
@@ -543,6 +630,146 @@ def generate_content(project_id, section_title):
         return redirect(url_for("research_views.projects"))
 
 
+@research_views_bp.route(
+    "/projects/<int:project_id>/generate-content/<section_title>/stream",
+    methods=["GET"],
+)
+@jwt_cookie_required
+def stream_content(project_id, section_title):
+    """Generate content for a section, streaming it to the browser as Server-Sent Events"""
+    user_id = get_jwt_identity()
+    project = ResearchProject.query.filter_by(id=project_id, user_id=user_id).first()
+
+    if not project:
+        return jsonify({"error": "Project not found"}), 404
+
+    # Get the latest approved outline
+    outline = (
+        ResearchOutline.query.filter_by(project_id=project.id, is_approved=True)
+        .order_by(ResearchOutline.created_at.desc())
+        .first()
+    )
+
+    if not outline:
+        return jsonify({"error": "No approved outline found"}), 400
+
+    bypass_cache = request.args.get("bypass_cache", "false").lower() == "true"
+    generation_id = request.args.get("generation_id")
+    deadline = Deadline.for_request(current_app.config)
+    flight = SingleFlight()
+    key = section_key(project.id, outline.id, section_title)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def wait_for_other(owner):
+        """Wait while another request or job generates the section"""
+        waiting = False
+        while owner is None:
+            if not waiting:
+                yield sse(
+                    "waiting", {"message": "This section is already being generated"}
+                )
+                waiting = True
+            try:
+                result = flight.wait(key, deadline)
+            except DeadlineExceeded:
+                yield sse(
+                    "error",
+                    {
+                        "error": "This section is still being generated, try again shortly",
+                        "in_progress": True,
+                    },
+                )
+                return None
+            if result is not None:
+                if "error" in result:
+                    yield sse("error", result)
+                    return None
+                content = ResearchContent.query.filter_by(
+                    project_id=project.id,
+                    outline_id=outline.id,
+                    section_title=section_title,
+                ).first()
+                if content is None:
+                    # Deleted between being stored and read back
+                    yield sse("error", {"error": "Section content not found"})
+                    return None
+                yield sse("citations", {"citations": content.get_citations()})
+                yield sse("done", {"success": True, "content_id": content.id})
+                return None
+            # The other generation stopped without a result; take over
+            owner = flight.claim(key)
+        return owner
+
+    def generate():
+        owner = yield from wait_for_other(flight.claim(key))
+        if owner is None:
+            return
+
+        token = CancellationToken.start(
+            project.id, outline.id, section_title, run_id=generation_id
+        )
+        content_service = ContentService()
+        # Closing the stream (navigating away) counts as cancelling it
+        status = GenerationRun.STATUS_CANCELLED
+        result = None
+        try:
+            with flight.keep_alive(key, owner):
+                yield sse("generation", {"generation_id": token.run_id})
+                for event, data in content_service.stream_section_content(
+                    project,
+                    outline,
+                    section_title,
+                    [],
+                    project.citation_style,
+                    project.language,
+                    use_cache=not bypass_cache,
+                    persist_pages=True,
+                    cancel_token=token,
+                    deadline=deadline,
+                ):
+                    if event == "complete":
+                        content = ResearchContent.store_section(
+                            project.id, outline.id, section_title, data
+                        )
+                        db.session.commit()
+                        status, result = GenerationRun.STATUS_DONE, data
+                        yield sse("citations", {"citations": content.get_citations()})
+                        yield sse("done", {"success": True, "content_id": content.id})
+                    elif event == "partial":
+                        # Pages are stored as they finish; the section is not
+                        status = GenerationRun.STATUS_PARTIAL
+                        data["resume_url"] = url_for(
+                            "research_views.regenerate_pages",
+                            project_id=project.id,
+                            section_title=section_title,
+                        )
+                        yield sse(event, data)
+                    else:
+                        if event == "error":
+                            status, result = GenerationRun.STATUS_FAILED, data
+                        yield sse(event, data)
+        except Exception as e:
+            db.session.rollback()
+            status, result = GenerationRun.STATUS_FAILED, {"error": str(e)}
+            logger.exception(f"Error streaming content for '{section_title}'")
+            yield sse("error", {"error": str(e)})
+        finally:
+            token.finish(status)
+            # Only a stored section or a failure is shared with waiting requests
+            if result is not None:
+                flight.publish(key, owner, result)
+            else:
+                flight.abandon(key, owner)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @research_views_bp.route("/projects/<int:project_id>/export", methods=["GET", "POST"])
 @jwt_cookie_required
 def export_paper(project_id):
@@ -584,12 +811,20 @@ def export_paper(project_id):
     # Generate index
     index = outline.generate_index(language=project.language)
 
+    # Deduplicated reference list from the citation registry, rendered in the
+    # project's current style
+    references = [
+        format_reference(citation, project.citation_style, project.language)
+        for citation in Citation.reference_list(outline.id, content_sections)
+    ]
+
     return render_template(
         "research/preview_paper.html",
         project=project,
         outline=outline,
         outline_structure=outline_structure,
         sections_with_content=sections_with_content,
+        references=references,
         ordered_sections=ordered_sections,
         index=index,
         now=datetime.datetime.now(),
@@ -710,14 +945,32 @@ def delete_project(project_id):
             flash("Project not found", "error")
             return redirect(url_for("research_views.projects"))
 
+        # Stop generations first, so none of them writes pages for the deleted outlines
+        cancel_project_generations(project_id)
+        GenerationJob.query.filter_by(project_id=project_id).delete()
+        GenerationRun.query.filter_by(project_id=project_id).delete()
+
         # Delete associated outlines and content
         outlines = ResearchOutline.query.filter_by(project_id=project_id).all()
         for outline in outlines:
             # Delete content associated with this outline
             contents = ResearchContent.query.filter_by(outline_id=outline.id).all()
             for content in contents:
+                ContentCitation.query.filter_by(content_id=content.id).delete()
                 db.session.delete(content)
+            pages = ResearchContentPage.query.filter_by(outline_id=outline.id)
+            PageCitation.query.filter(
+                PageCitation.page_id.in_(pages.with_entities(ResearchContentPage.id))
+            ).delete(synchronize_session=False)
+            pages.delete(synchronize_session=False)
+            SectionCheckpoint.query.filter_by(outline_id=outline.id).delete()
+            SectionSummary.query.filter_by(outline_id=outline.id).delete()
             db.session.delete(outline)
+        citations = Citation.query.filter_by(project_id=project_id)
+        CitationSource.query.filter(
+            CitationSource.citation_id.in_(citations.with_entities(Citation.id))
+        ).delete(synchronize_session=False)
+        citations.delete(synchronize_session=False)
 
         # Delete the project
         db.session.delete(project)
@@ -763,90 +1016,304 @@ def generate_all_content(project_id):
                 url_for("research_views.project_detail", project_id=project_id)
             )
 
-        # Get the outline structure
-        outline_structure = outline.get_outline_structure()
+        # Sections without content or a job yet, introduction first
+        queue = JobQueue()
+        sections_to_generate = queue.pending_sections(project, outline)
 
-        # Prepare the list of sections to generate
-        sections_to_generate = []
+        # Sections already queued speculatively are wanted now
+        promoted = queue.promote(outline.id)
 
-        # Add introduction
-        intro_title = "المقدمة" if project.language == "ar" else "Introduction"
-        sections_to_generate.append(intro_title)
+        # Hand the sections to the background workers and return right away
+        job_id = None
+        if sections_to_generate:
+            job_id, _ = queue.enqueue_sections(project, outline, sections_to_generate)
+        elif promoted:
+            # Everything left is in the speculative batch; follow that one
+            job_id = promoted[0].batch_id
+            sections_to_generate = [job.section_title for job in promoted]
 
-        # Add main sections
-        for section in outline_structure.get("sections", []):
-            sections_to_generate.append(section.get("title"))
+        # Return the list of sections to be generated
+        return jsonify(
+            {
+                "success": True,
+                "message": "Content generation queued",
+                "job_id": job_id,
+                "sections": sections_to_generate,
+                "project_id": project_id,
+                "total_sections": len(sections_to_generate),
+                "completed_sections": 0,
+            }
+        )
 
-        # Add conclusion
-        conclusion_title = "الخاتمة" if project.language == "ar" else "Conclusion"
-        sections_to_generate.append(conclusion_title)
+    except Exception as e:
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            return jsonify({"success": False, "error": str(e)}), 500
+        print(f"Error starting content generation: {str(e)}")
+        flash(f"Error starting content generation: {str(e)}", "error")
+        return redirect(url_for("research_views.project_detail", project_id=project_id))
 
-        # Get existing content sections to skip already generated ones
-        existing_content = ResearchContent.query.filter_by(
-            project_id=project.id, outline_id=outline.id
-        ).all()
 
-        existing_section_titles = [
-            content.section_title for content in existing_content
-        ]
+@research_views_bp.route("/projects/<int:project_id>/jobs/<job_id>", methods=["GET"])
+@jwt_cookie_required
+def job_status(project_id, job_id):
+    """Get the status of a queued content generation job"""
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
 
-        # Filter out sections that already have content
-        sections_to_generate = [
-            section
-            for section in sections_to_generate
-            if section not in existing_section_titles
+        jobs = JobQueue().get_batch(job_id, project_id=project.id)
+        if not jobs:
+            return jsonify({"error": "Job not found"}), 404
+
+        finished = [job for job in jobs if job.is_finished]
+        failed = [job for job in jobs if job.status == GenerationJob.STATUS_FAILED]
+
+        return jsonify(
+            {
+                "success": True,
+                "job_id": job_id,
+                "total_sections": len(jobs),
+                "finished_sections": len(finished),
+                "failed_sections": len(failed),
+                "done": len(finished) == len(jobs),
+                "sections": [job.to_dict() for job in jobs],
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@research_views_bp.route(
+    "/projects/<int:project_id>/jobs/<job_id>/cancel", methods=["POST"]
+)
+@jwt_cookie_required
+def cancel_job(project_id, job_id):
+    """Cancel the queued sections of a generation job and stop the running ones"""
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+
+        cancelled = JobQueue().cancel(project.id, batch_id=job_id)
+        return jsonify({"success": True, "job_id": job_id, "cancelled": cancelled})
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@research_views_bp.route(
+    "/projects/<int:project_id>/generations/<generation_id>/cancel",
+    methods=["POST"],
+)
+@jwt_cookie_required
+def cancel_generation(project_id, generation_id):
+    """
+    Cancel one section generation
+
+    generation_id is the id the client sent with the generation request, or
+    the one announced in the first event of a stream.
+    """
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+
+        cancelled = CancellationToken.cancel_runs(project.id, run_id=generation_id)
+        if not cancelled:
+            return jsonify({"error": "No running generation with that id"}), 404
+
+        return jsonify({"success": True, "generation_id": generation_id})
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@research_views_bp.route(
+    "/projects/<int:project_id>/content/<section_title>/cancel", methods=["POST"]
+)
+@jwt_cookie_required
+def cancel_section_generation(project_id, section_title):
+    """Stop every running generation of a section, e.g. when the user leaves the page"""
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+
+        cancelled = CancellationToken.cancel_runs(
+            project.id, section_title=section_title
+        )
+        return jsonify({"success": True, "cancelled": len(cancelled)})
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@research_views_bp.route(
+    "/projects/<int:project_id>/content/<section_title>/pages", methods=["GET"]
+)
+@jwt_cookie_required
+def section_pages(project_id, section_title):
+    """Get the stored pages of a section"""
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+
+        outline = (
+            ResearchOutline.query.filter_by(project_id=project.id, is_approved=True)
+            .order_by(ResearchOutline.created_at.desc())
+            .first()
+        )
+
+        if not outline:
+            return jsonify({"error": "No approved outline found"}), 400
+
+        pages = ResearchContentPage.for_section(outline.id, section_title)
+        return jsonify(
+            {
+                "success": True,
+                "section_title": section_title,
+                "pages": [page.to_dict() for page in pages],
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@research_views_bp.route(
+    "/projects/<int:project_id>/content/<section_title>/pages/regenerate",
+    methods=["POST"],
+)
+@jwt_cookie_required
+def regenerate_pages(project_id, section_title):
+    """
+    Regenerate only the stale pages of a section
+
+    The pages listed in the JSON body ({"pages": [3, 4]}) are marked stale;
+    then every stale, failed or missing page is generated again and the
+    section is reassembled from its pages.
+    """
+    try:
+        user_id = get_jwt_identity()
+        project = ResearchProject.query.filter_by(
+            id=project_id, user_id=user_id
+        ).first()
+
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+
+        outline = (
+            ResearchOutline.query.filter_by(project_id=project.id, is_approved=True)
+            .order_by(ResearchOutline.created_at.desc())
+            .first()
+        )
+
+        if not outline:
+            return jsonify({"error": "No approved outline found"}), 400
+
+        section = outline.get_outline().section(section_title)
+        if not section:
+            return jsonify({"error": f"Section '{section_title}' not found"}), 404
+
+        page_range = section.page_range
+
+        data = request.get_json(silent=True) or {}
+        requested = data.get("pages", [])
+        if not isinstance(requested, list) or any(
+            not isinstance(page, int) or page not in page_range for page in requested
+        ):
+            return (
+                jsonify(
+                    {
+                        "error": f"Pages must be between {page_range.start} "
+                        f"and {page_range.end}"
+                    }
+                ),
+                400,
+            )
+
+        if requested:
+            ResearchContentPage.mark_stale(outline.id, section_title, requested)
+            db.session.commit()
+
+        stored = {
+            page.page_number: page
+            for page in ResearchContentPage.for_section(outline.id, section_title)
+        }
+        stale_pages = [
+            page
+            for page in page_range
+            if page not in stored
+            or stored[page].status != ResearchContentPage.STATUS_DONE
         ]
 
-        # Start generating the first section
-        if sections_to_generate:
-            section_title = sections_to_generate[0]
-            content_service = ContentService()
-            content_data = content_service.generate_section_content(
+        if stale_pages:
+            # Fresh text is the point of regenerating, so skip the response cache
+            content_data = generate_section_once(
                 project,
                 outline,
                 section_title,
                 [],
-                project.citation_style,
-                project.language,
-                page_by_page=True,
+                generation_id=data.get("generation_id"),
+                pages_to_generate=stale_pages,
+                use_cache=False,
             )
+            if content_data.get("cancelled"):
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "cancelled": True,
+                            "error": content_data["error"],
+                        }
+                    ),
+                    409,
+                )
+            if "error" in content_data:
+                return jsonify({"success": False, "error": content_data["error"]}), 500
+            if content_data.get("partial"):
+                return partial_content_response(project, section_title, content_data)
 
-            if "error" not in content_data:
-                content = ResearchContent.query.filter_by(
-                    project_id=project.id,
-                    outline_id=outline.id,
-                    section_title=section_title,
-                ).first()
-
-                if not content:
-                    content = ResearchContent(
-                        project_id=project.id,
-                        outline_id=outline.id,
-                        section_title=section_title,
-                    )
-
-                content.from_json_response(content_data)
-                db.session.add(content)
-                db.session.commit()
+        content = ResearchContent.query.filter_by(
+            project_id=project.id, outline_id=outline.id, section_title=section_title
+        ).first()
 
-        # Return the list of sections to be generated
         return jsonify(
             {
                 "success": True,
-                "message": "Content generation started",
-                "sections": sections_to_generate,
-                "project_id": project_id,
-                "total_sections": len(sections_to_generate),
-                "completed_sections": 1 if sections_to_generate else 0,
+                "regenerated_pages": stale_pages,
+                "content_id": content.id if content else None,
+                "content": content.content if content else "",
+                "citations": content.get_citations() if content else [],
             }
         )
 
     except Exception as e:
-        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-            return jsonify({"success": False, "error": str(e)}), 500
-        print(f"Error starting content generation: {str(e)}")
-        flash(f"Error starting content generation: {str(e)}", "error")
-        return redirect(url_for("research_views.project_detail", project_id=project_id))
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
 
 
 @research_views_bp.route("/projects/<int:project_id>/content-status", methods=["GET"])
@@ -872,12 +1339,9 @@ def content_status(project_id):
         if not outline:
             return jsonify({"error": "No approved outline found"}), 400
 
-        # Get the outline structure
-        outline_structure = outline.get_outline_structure()
-
         # Count total sections
         total_sections = (
-            len(outline_structure.get("sections", [])) + 2
+            len(outline.get_outline().sections) + 2
         )  # +2 for intro and conclusion
 
         # Get existing content sections
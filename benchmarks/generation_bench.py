@@ -0,0 +1,438 @@
+"""
+End-to-end generation benchmark against the local LLM backend
+
+Usage:
+    python benchmarks/generation_bench.py [--sizes 5,20,50] [--languages en,ar]
+        [--concurrency 1,4] [--mode sequential] [--json OUT] [--compare BASELINE]
+
+For every paper size and language the benchmark generates an outline with
+GeminiService.generate_research_outline, then every section twice: once by
+calling ContentService.generate_section_content directly, and once through
+the generate_content view (AJAX POST) with the given number of concurrent
+requests. Each stage reports pages/sec, p50/p95/p99 latency, peak RSS and the
+database writes it caused, per table.
+
+Everything runs in a temporary directory (database, response cache) with the
+local backend, so no network access or API key is needed and the numbers
+are comparable between commits. Pass --json to save the results and
+--compare to print the change against a saved run.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOPICS = {
+    "en": "The economic effects of climate adaptation policy",
+    "ar": "الآثار الاقتصادية لسياسات التكيف مع تغير المناخ",
+}
+WRITE_STATEMENT = re.compile(
+    r"^\s*(INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+\"?(\w+)", re.IGNORECASE
+)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(samples)
+
+    def at(percent):
+        return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+    return {"p50": at(50), "p95": at(95), "p99": at(99)}
+
+
+class RSSSampler:
+    """Peak resident memory of this process while the block runs"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._process = psutil.Process(os.getpid())
+        self._stop = threading.Event()
+
+    def _sample(self):
+        rss = self._process.memory_info().rss / 1024 / 1024
+        self.peak_mb = max(self.peak_mb, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class WriteCounter:
+    """Counts INSERT/UPDATE/DELETE statements and commits on an engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = WRITE_STATEMENT.match(statement)
+        if match:
+            # executemany runs one statement for several rows
+            rows = len(parameters) if executemany else 1
+            with self.lock:
+                self.tables[match.group(2)] = self.tables.get(match.group(2), 0) + rows
+
+    def _on_commit(self, conn):
+        with self.lock:
+            self.commits += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.tables), self.commits
+
+    def since(self, snapshot):
+        tables, commits = snapshot
+        now_tables, now_commits = self.snapshot()
+        diff = {
+            table: count - tables.get(table, 0)
+            for table, count in now_tables.items()
+            if count - tables.get(table, 0)
+        }
+        return {"total": sum(diff.values()), "commits": now_commits - commits, "by_table": diff}
+
+
+def configure_environment(args, workdir):
+    """Settings must be in place before config is imported"""
+    os.environ.update(
+        {
+            "LLM_BACKEND": "local",
+            "LOCAL_LLM_LATENCY_MEDIAN_SECONDS": str(args.latency),
+            "LOCAL_LLM_LATENCY_SIGMA": str(args.sigma),
+            "LOCAL_LLM_ERROR_RATE": str(args.error_rate),
+            "LOCAL_LLM_MALFORMED_RATE": str(args.malformed_rate),
+            "LOCAL_LLM_SEED": str(args.seed),
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+            "LLM_RETRY_BASE_DELAY": "0.05",
+            "GEMINI_REQUESTS_PER_MINUTE": str(args.rpm),
+            "GEMINI_TOKENS_PER_MINUTE": str(args.rpm * 10000),
+            "CONTENT_GENERATION_MODE": args.mode,
+        }
+    )
+
+
+def create_outline(app, language, total_pages):
+    from app.services.gemini_service import GeminiService
+
+    with app.app_context():
+        start = time.perf_counter()
+        # generate_research_outline prints the raw response
+        with contextlib.redirect_stdout(io.StringIO()):
+            structure = GeminiService().generate_research_outline(
+                TOPICS[language], language=language, total_pages=total_pages, use_cache=False
+            )
+        elapsed = time.perf_counter() - start
+        if "error" in structure:
+            raise RuntimeError(f"Outline generation failed: {structure['error']}")
+
+    project_id, outline_id = store_outline(app, language, structure)
+    return project_id, outline_id, structure, elapsed
+
+
+def store_outline(app, language, structure):
+    """A project with an approved outline, as the outline view leaves it"""
+    from app import db
+    from app.models.research import ResearchOutline, ResearchProject
+    from app.models.user import User
+
+    with app.app_context():
+        user = User.query.filter_by(is_admin=True).first()
+        project = ResearchProject(
+            title=structure.get("title", TOPICS[language]),
+            user_id=user.id,
+            language=language,
+            citation_style="APA",
+        )
+        db.session.add(project)
+        db.session.commit()
+        outline = ResearchOutline(
+            project_id=project.id,
+            total_pages=structure.get("total_pages"),
+            is_approved=True,
+        )
+        outline.set_outline_structure(structure)
+        db.session.add(outline)
+        db.session.commit()
+        return project.id, outline.id
+
+
+def section_pages(section):
+    page_range = section.get("page_range") or {}
+    if "start" in page_range and "end" in page_range:
+        return page_range["end"] - page_range["start"] + 1
+    return int(section.get("pages", 1))
+
+
+def stage_result(name, pages, wall, latencies, page_latencies, peak_mb, writes, errors):
+    return {
+        "stage": name,
+        "pages": pages,
+        "seconds": wall,
+        "pages_per_sec": pages / wall if pages and wall else None,
+        "latency": percentiles(latencies),
+        "page_latency": percentiles(page_latencies),
+        "peak_rss_mb": peak_mb,
+        "db_writes": writes,
+        "errors": errors,
+    }
+
+
+def bench_service(app, counter, project_id, outline_id, structure, language, mode):
+    from app import db
+    from app.models.research import ResearchOutline, ResearchProject
+    from app.services.content_service import ContentService
+
+    latencies, page_latencies, pages, errors = [], [], 0, 0
+    before = counter.snapshot()
+    with RSSSampler() as sampler:
+        wall_start = time.perf_counter()
+        with app.app_context():
+            project = db.session.get(ResearchProject, project_id)
+            outline = db.session.get(ResearchOutline, outline_id)
+            for section in structure["sections"]:
+                count = section_pages(section)
+                start = time.perf_counter()
+                result = ContentService().generate_section_content(
+                    project,
+                    outline,
+                    section["title"],
+                    [],
+                    project.citation_style,
+                    language,
+                    generation_mode=mode,
+                    use_cache=False,
+                    persist_pages=True,
+                )
+                elapsed = time.perf_counter() - start
+                errors += "error" in result
+                latencies.append(elapsed)
+                page_latencies.extend([elapsed / count] * count)
+                pages += count
+        wall = time.perf_counter() - wall_start
+    return stage_result(
+        "service", pages, wall, latencies, page_latencies, sampler.peak_mb,
+        counter.since(before), errors,
+    )
+
+
+def bench_view(app, counter, structure, language, mode, concurrency):
+    from flask_jwt_extended import create_access_token
+
+    # A fresh project, so no section is answered from the single-flight result
+    project_id, _ = store_outline(app, language, structure)
+    with app.app_context():
+        from app.models.user import User
+
+        token = create_access_token(identity=str(User.query.filter_by(is_admin=True).first().id))
+
+    def generate(section):
+        client = app.test_client()
+        client.set_cookie("access_token_cookie", token)
+        start = time.perf_counter()
+        response = client.post(
+            f"/projects/{project_id}/generate-content/{quote(section['title'])}",
+            json={"bypass_cache": True, "generation_mode": mode},
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        return section, time.perf_counter() - start, response.status_code
+
+    latencies, page_latencies, pages, errors = [], [], 0, 0
+    before = counter.snapshot()
+    with RSSSampler() as sampler:
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for section, elapsed, status in executor.map(generate, structure["sections"]):
+                count = section_pages(section)
+                errors += status != 200
+                latencies.append(elapsed)
+                page_latencies.extend([elapsed / count] * count)
+                pages += count
+        wall = time.perf_counter() - wall_start
+    result = stage_result(
+        "view", pages, wall, latencies, page_latencies, sampler.peak_mb,
+        counter.since(before), errors,
+    )
+    result["concurrency"] = concurrency
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_results(results):
+    header = (
+        f"{'case':<22} {'stage':<10} {'pages':>5} {'pages/s':>8} {'p50 s':>7} "
+        f"{'p95 s':>7} {'p99 s':>7} {'peak MB':>8} {'writes':>7} {'commits':>7} {'err':>4}"
+    )
+    print(header)
+    for case in results:
+        for stage in case["stages"]:
+            label = stage["stage"]
+            if "concurrency" in stage:
+                label += f" x{stage['concurrency']}"
+            latency = stage["latency"]
+            fmt = lambda value: f"{value:.3f}" if value is not None else "-"
+            print(
+                f"{case['case']:<22} {label:<10} {stage['pages']:>5} "
+                f"{fmt(stage['pages_per_sec']):>8} {fmt(latency['p50']):>7} "
+                f"{fmt(latency['p95']):>7} {fmt(latency['p99']):>7} "
+                f"{stage['peak_rss_mb']:>8.1f} {stage['db_writes']['total']:>7} "
+                f"{stage['db_writes']['commits']:>7} {stage['errors']:>4}"
+            )
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def key(case, stage):
+        return (case["case"], stage["stage"], stage.get("concurrency"))
+
+    previous = {
+        key(case, stage): stage for case in baseline["results"] for stage in case["stages"]
+    }
+    print(f"\nChange against {baseline_path} ({baseline['meta'].get('commit')}):")
+    for case in results:
+        for stage in case["stages"]:
+            old = previous.get(key(case, stage))
+            if not old:
+                continue
+
+            def change(new_value, old_value):
+                if not new_value or not old_value:
+                    return "-"
+                return f"{(new_value - old_value) / old_value * 100:+.1f}%"
+
+            label = stage["stage"] + (f" x{stage['concurrency']}" if "concurrency" in stage else "")
+            print(
+                f"  {case['case']:<22} {label:<10} pages/s {change(stage['pages_per_sec'], old['pages_per_sec']):>8}"
+                f"  p95 {change(stage['latency']['p95'], old['latency']['p95']):>8}"
+                f"  peak RSS {change(stage['peak_rss_mb'], old['peak_rss_mb']):>8}"
+                f"  writes {stage['db_writes']['total'] - old['db_writes']['total']:+d}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="5,20,50", help="Paper sizes in pages")
+    parser.add_argument("--languages", default="en,ar")
+    parser.add_argument("--concurrency", default="1,4", help="Concurrent view requests")
+    parser.add_argument("--mode", default="sequential", help="Content generation mode")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median LLM latency (s)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=100000, help="Requests per minute quota")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory")
+    args = parser.parse_args()
+
+    # Output paths are relative to where the benchmark was started
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="generation-bench-")
+    configure_environment(args, workdir)
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    from app import create_app, db
+    from app.services.metrics import metrics
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app("testing")
+    with app.app_context():
+        counter = WriteCounter(db.engine)
+
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            for language in args.languages.split(","):
+                metrics.reset()
+                case = {"case": f"{size}p-{language}", "pages": size, "language": language}
+                before = counter.snapshot()
+                with RSSSampler() as sampler:
+                    project_id, outline_id, structure, elapsed = create_outline(app, language, size)
+                case["stages"] = [
+                    stage_result(
+                        "outline", 0, elapsed, [elapsed], [], sampler.peak_mb,
+                        counter.since(before), 0,
+                    )
+                ]
+                case["stages"].append(
+                    bench_service(app, counter, project_id, outline_id, structure, language, args.mode)
+                )
+                for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                    case["stages"].append(
+                        bench_view(app, counter, structure, language, args.mode, concurrency)
+                    )
+                case["metrics"] = metrics.snapshot()
+                results.append(case)
+                print(f"finished {case['case']}", file=sys.stderr)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if compare_path:
+        compare(results, compare_path)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+        print(f"\nResults written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
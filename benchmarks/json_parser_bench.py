@@ -0,0 +1,234 @@
+"""
+Benchmark the lenient JSON parser against a corpus of malformed model responses
+
+Usage:
+    python benchmarks/json_parser_bench.py [--corpus DIR] [--repeat N] [--json OUT]
+
+The built-in corpus covers the failure modes seen in Gemini page responses
+(code fences, prose around the object, trailing commas, raw newlines, stray
+quotes, Python literals, truncation) in English and Arabic at several sizes.
+Every generated response has a known "content" value, so the report includes
+how many were recovered exactly. --corpus adds real responses saved as *.txt
+files; for those only "parsed to an object with content" is checked.
+
+The size sweep reports time per KB, which should stay flat if parsing is
+linear in the response length.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lenient_json import LenientJSONParser, parse_lenient  # noqa: E402
+
+EN_WORDS = (
+    "research analysis climate policy evidence framework results impact method "
+    "data model significant study approach findings literature theory"
+).split()
+AR_WORDS = (
+    "البحث التحليل المناخ السياسة الأدلة الإطار النتائج التأثير المنهج "
+    "البيانات النموذج الدراسة النظرية الأدبيات"
+).split()
+
+
+def make_text(words, target_chars, rng, arabic=False):
+    """Paragraphs of pseudo-academic text with markdown and punctuation"""
+    comma = "، " if arabic else ", "
+    stop = "؟ " if arabic and rng.random() < 0.1 else ". "
+    parts = []
+    size = 0
+    while size < target_chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+        if rng.random() < 0.3:
+            sentence += comma + " ".join(rng.choice(words) for _ in range(4))
+        if rng.random() < 0.1:
+            sentence = "**" + sentence + "**"
+        parts.append(sentence + stop)
+        if rng.random() < 0.15:
+            parts.append("\n\n")
+        size += len(sentence) + 2
+    return "".join(parts).strip()
+
+
+def make_response(content, rng, defects):
+    """Serialize a page response with the given defects"""
+    citations = [
+        {"id": f"c{i}", "text": f"Author {i} (2020). Title {i}.", "source_type": "journal"}
+        for i in range(rng.randint(1, 3))
+    ]
+    body = json.dumps(
+        {"section_title": "Section", "content": content, "citations": citations},
+        ensure_ascii=False,
+        indent=2,
+    )
+
+    if "raw_newlines" in defects:
+        body = body.replace("\\n", "\n")
+    if "stray_quotes" in defects:
+        # Unescape the quotes that were inside the content
+        body = body.replace('\\"', '"')
+    if "trailing_commas" in defects:
+        body = body.replace("\n  ]", ",\n  ]").replace("\n}", ",\n}")
+    if "python_literals" in defects:
+        body = body.replace('"Section"', '"Section", "draft": True, "notes": None')
+    if "fence" in defects:
+        body = "```json\n" + body + "\n```"
+    if "prose" in defects:
+        body = "Here is the page you asked for:\n" + body + "\nLet me know if you need changes."
+    if "truncated" in defects:
+        # Cut inside the content string
+        cut = body.find('"content"') + 20 + len(content) // 2
+        body = body[:cut]
+    return body
+
+
+def expected_content(content, defects):
+    if "truncated" in defects:
+        return None
+    return content
+
+
+DEFECT_SETS = [
+    (),
+    ("fence",),
+    ("prose",),
+    ("trailing_commas",),
+    ("raw_newlines",),
+    ("python_literals", "fence"),
+    ("raw_newlines", "trailing_commas", "fence"),
+    ("truncated",),
+]
+
+
+def build_corpus(sizes, rng):
+    corpus = []
+    for size in sizes:
+        for arabic in (False, True):
+            words = AR_WORDS if arabic else EN_WORDS
+            for defects in DEFECT_SETS:
+                content = make_text(words, size, rng, arabic)
+                corpus.append(
+                    {
+                        "name": f"{'ar' if arabic else 'en'}-{size}-{'+'.join(defects) or 'valid'}",
+                        "size": size,
+                        "text": make_response(content, rng, defects),
+                        "content": expected_content(content, defects),
+                    }
+                )
+            # Stray quotes: quoted phrases inside the content, left unescaped
+            content = make_text(words, size, rng, arabic)
+            words_in = content.split(" ")
+            for i in range(3, len(words_in), 40):
+                words_in[i] = f'"{words_in[i]}"'
+            content = " ".join(words_in)
+            corpus.append(
+                {
+                    "name": f"{'ar' if arabic else 'en'}-{size}-stray_quotes",
+                    "size": size,
+                    "text": make_response(content, rng, ("stray_quotes",)),
+                    "content": content,
+                }
+            )
+    return corpus
+
+
+def load_corpus_dir(path):
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".txt"):
+            with open(os.path.join(path, name), encoding="utf-8") as f:
+                text = f.read()
+            corpus.append({"name": name, "size": len(text), "text": text, "content": None})
+    return corpus
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def streamed_parse(text, chunk_size=64):
+    parser = LenientJSONParser("{")
+    streamed = 0
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i : i + chunk_size])
+        streamed += len(parser.field_text("content", streamed))
+    return parser.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--corpus", help="Directory of saved responses (*.txt)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--json", help="Write results to this file")
+    arg_parser.add_argument("--seed", type=int, default=7)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [1000, 4000, 16000, 64000]
+    corpus = build_corpus(sizes, rng)
+    if args.corpus:
+        corpus += load_corpus_dir(args.corpus)
+
+    results = []
+    for entry in corpus:
+        text = entry["text"]
+        value = parse_lenient(text, "{")
+        streamed = streamed_parse(text)
+        parsed = isinstance(value, dict) and isinstance(value.get("content"), str)
+        exact = entry["content"] is not None and parsed and value["content"] == entry["content"]
+
+        result = {
+            "name": entry["name"],
+            "chars": len(text),
+            "parsed": parsed,
+            "exact": exact if entry["content"] is not None else None,
+            "stream_matches": streamed == value,
+            "lenient_ms": time_call(lambda: parse_lenient(text, "{"), args.repeat) * 1000,
+            "stream_ms": time_call(lambda: streamed_parse(text), args.repeat) * 1000,
+        }
+        try:
+            json.loads(text)
+            result["json_loads_ms"] = time_call(lambda: json.loads(text), args.repeat) * 1000
+        except json.JSONDecodeError:
+            result["json_loads_ms"] = None
+        results.append(result)
+
+    checked = [r for r in results if r["exact"] is not None]
+    print(f"{'response':<48} {'chars':>7} {'ok':>4} {'lenient ms':>11} {'stream ms':>10} {'json ms':>8}")
+    for r in results:
+        ok = "yes" if (r["exact"] if r["exact"] is not None else r["parsed"]) else "NO"
+        json_ms = f"{r['json_loads_ms']:.3f}" if r["json_loads_ms"] is not None else "-"
+        print(
+            f"{r['name']:<48} {r['chars']:>7} {ok:>4} {r['lenient_ms']:>11.3f} "
+            f"{r['stream_ms']:>10.3f} {json_ms:>8}"
+        )
+
+    print()
+    print(f"Parsed to an object:      {sum(r['parsed'] for r in results)}/{len(results)}")
+    print(f"Content recovered exactly: {sum(r['exact'] for r in checked)}/{len(checked)}")
+    print(f"Streamed == one-shot:      {sum(r['stream_matches'] for r in results)}/{len(results)}")
+
+    print("\nTime per KB by response size (flat means linear):")
+    for size in sizes:
+        rows = [r for r in results if r["name"].split("-")[1] == str(size)]
+        per_kb = [r["lenient_ms"] / (r["chars"] / 1024) for r in rows]
+        print(f"  ~{size:>6} chars: {statistics.median(per_kb):.3f} ms/KB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,138 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+    # "gemini" or "local", an offline stand-in for load tests and profiling
+    # whose latency, error, quota-error and malformed-JSON rates are set below
+    LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+    LOCAL_LLM_LATENCY_MEDIAN_SECONDS = float(
+        os.environ.get("LOCAL_LLM_LATENCY_MEDIAN_SECONDS", 0.8)
+    )
+    LOCAL_LLM_LATENCY_SIGMA = float(os.environ.get("LOCAL_LLM_LATENCY_SIGMA", 0.5))
+    LOCAL_LLM_ERROR_RATE = float(os.environ.get("LOCAL_LLM_ERROR_RATE", 0))
+    LOCAL_LLM_THROTTLE_RATE = float(os.environ.get("LOCAL_LLM_THROTTLE_RATE", 0))
+    LOCAL_LLM_MALFORMED_RATE = float(os.environ.get("LOCAL_LLM_MALFORMED_RATE", 0))
+    LOCAL_LLM_SEED = os.environ.get("LOCAL_LLM_SEED")
+
+    # Gemini model per use case; clients are shared per worker process
+    GEMINI_DEFAULT_MODEL = os.environ.get("GEMINI_DEFAULT_MODEL", "gemini-2.0-flash-lite")
+    GEMINI_OUTLINE_MODEL = os.environ.get("GEMINI_OUTLINE_MODEL")
+    GEMINI_CONTENT_MODEL = os.environ.get("GEMINI_CONTENT_MODEL")
+
+    # Section generation: "sequential" (page after page), "fan_out" (plan all
+    # pages up front and generate them concurrently) or "batched" (sequential,
+    # several pages per request)
+    CONTENT_GENERATION_MODE = os.environ.get("CONTENT_GENERATION_MODE", "sequential")
+    CONTENT_FAN_OUT_WORKERS = int(os.environ.get("CONTENT_FAN_OUT_WORKERS", 4))
+    # Upper bound on pages per batched request; max_output_tokens may allow fewer
+    CONTENT_BATCH_MAX_PAGES = int(os.environ.get("CONTENT_BATCH_MAX_PAGES", 4))
+    # Sequential pages see a rolling summary of earlier pages plus the last
+    # words written, kept within a token budget
+    CONTENT_CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTENT_CONTEXT_TOKEN_BUDGET", 600))
+    CONTENT_CONTEXT_TAIL_WORDS = int(os.environ.get("CONTENT_CONTEXT_TAIL_WORDS", 150))
+    CONTENT_CONTEXT_SUMMARY_SENTENCES = int(
+        os.environ.get("CONTENT_CONTEXT_SUMMARY_SENTENCES", 2)
+    )
+    # Sentences kept from each body section to write the introduction and
+    # conclusion from, which are generated once the body is done
+    CONTENT_SECTION_SUMMARY_SENTENCES = int(
+        os.environ.get("CONTENT_SECTION_SUMMARY_SENTENCES", 3)
+    )
+    # Resident memory budget per worker process for section generation; page
+    # batches and fan-out workers are sized from the headroom left under it,
+    # and generation only pauses once RSS passes the pressure ratio
+    CONTENT_RSS_BUDGET_MB = int(os.environ.get("CONTENT_RSS_BUDGET_MB", 512))
+    CONTENT_RSS_PRESSURE_RATIO = float(os.environ.get("CONTENT_RSS_PRESSURE_RATIO", 0.85))
+    CONTENT_BACKPRESSURE_MAX_WAIT_SECONDS = float(
+        os.environ.get("CONTENT_BACKPRESSURE_MAX_WAIT_SECONDS", 30)
+    )
+
+    # Parsed outlines kept per worker process, keyed by outline version
+    OUTLINE_CACHE_SIZE = int(os.environ.get("OUTLINE_CACHE_SIZE", 256))
+
+    # On-disk cache of Gemini responses keyed by (model, prompt, generation_config)
+    LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.environ.get(
+        "LLM_CACHE_PATH",
+        os.path.join(os.path.dirname(basedir), "instance", "llm_cache.sqlite3"),
+    )
+    LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000))
+
+    # Identical concurrent section generations share one run through a lease row
+    SINGLE_FLIGHT_LEASE_SECONDS = int(os.environ.get("SINGLE_FLIGHT_LEASE_SECONDS", 150))
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS = int(
+        os.environ.get("SINGLE_FLIGHT_RESULT_TTL_SECONDS", 30)
+    )
+
+    # Background generation jobs processed by `flask worker`
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 300))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 2))
+    # Jobs each worker process runs at once, and how many sections of a single
+    # outline may generate at the same time
+    JOB_WORKER_THREADS = int(os.environ.get("JOB_WORKER_THREADS", 3))
+    JOB_MAX_PARALLEL_SECTIONS = int(os.environ.get("JOB_MAX_PARALLEL_SECTIONS", 3))
+    # Run the worker threads inside the web process, for deployments that share
+    # no database with a separate `flask worker` process
+    JOB_WORKER_IN_PROCESS = (
+        os.environ.get("JOB_WORKER_IN_PROCESS", "false").lower() == "true"
+    )
+    # How often a running generation looks for a cancel request from another process
+    GENERATION_CANCEL_CHECK_SECONDS = float(
+        os.environ.get("GENERATION_CANCEL_CHECK_SECONDS", 1.0)
+    )
+    # Seconds without a heartbeat before an unfinished section's checkpoint is
+    # taken over from the run that owns it (its process is presumed dead)
+    SECTION_CHECKPOINT_STALE_SECONDS = float(
+        os.environ.get("SECTION_CHECKPOINT_STALE_SECONDS", 120)
+    )
+    # Queue every section at low priority as soon as an outline is approved
+    SPECULATIVE_GENERATION = (
+        os.environ.get("SPECULATIVE_GENERATION", "false").lower() == "true"
+    )
+
+    # Gemini quota shared by every worker through the database; callers wait
+    # for capacity instead of failing with 429s
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 30))
+    GEMINI_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", 1000000))
+    RATE_LIMIT_MAX_CONCURRENCY = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENCY", 8))
+    RATE_LIMIT_COOLDOWN_SECONDS = float(
+        os.environ.get("RATE_LIMIT_COOLDOWN_SECONDS", 10)
+    )
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(
+        os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", 300)
+    )
+    RATE_LIMIT_MAX_THROTTLE_RETRIES = int(
+        os.environ.get("RATE_LIMIT_MAX_THROTTLE_RETRIES", 5)
+    )
+
+    # Retries with jittered exponential backoff, per-call timeouts and optional
+    # hedging (a duplicate request once a call runs past the recent p95 latency)
+    LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", 3))
+    LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", 1.0))
+    LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", 20.0))
+    LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", 60))
+    LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20))
+
+    # Time a web request may spend on LLM calls, below the gunicorn timeout.
+    # Pages share what is left; they are shortened when it runs low, and a
+    # section that does not fit returns the pages written so far
+    REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 100))
+    # Seconds a full page usually takes, until latency metrics are available,
+    # and the least time left worth starting another page with
+    CONTENT_PAGE_SECONDS = float(os.environ.get("CONTENT_PAGE_SECONDS", 20))
+    CONTENT_MIN_PAGE_SECONDS = float(os.environ.get("CONTENT_MIN_PAGE_SECONDS", 8))
+
+    # Request schema-constrained JSON and validate pages and outlines strictly;
+    # the legacy repair parser becomes a fallback. Off by default: the pinned
+    # google-generativeai 0.3.1 has no response_schema, so with it enabled the
+    # prompts are unconstrained and only the strict validation applies
+    LLM_STRUCTURED_OUTPUT = (
+        os.environ.get("LLM_STRUCTURED_OUTPUT", "false").lower() == "true"
+    )
+
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -39,3 +171,5 @@ class TestingConfig(Config):
 
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///test.db"
+    # Tests must not replay responses cached by earlier runs
+    LLM_CACHE_ENABLED = False
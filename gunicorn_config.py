@@ -3,4 +3,5 @@
 bind = "0.0.0.0:10000"
 workers = 2  # Reduced for PythonAnywhere's resource limits
 threads = 2
+# Keep REQUEST_DEADLINE_SECONDS below this so requests stop before being killed
 timeout = 120
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The app on a throwaway SQLite database
+
+    create_app puts app.db in the working directory and schedules its cleanup
+    job under a fixed id, so one app is shared by the whole session.
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        app = create_app("testing")
+    finally:
+        os.chdir(cwd)
+    return app
+
+
+@pytest.fixture
+def database(app):
+    """Empty tables, inside an app context"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def project(database):
+    """An English project with an approved outline of four sections"""
+    from app.models.research import ResearchOutline, ResearchProject
+    from app.models.user import User
+
+    user = User(username="author", email="author@example.com")
+    user.set_password("password")
+    database.session.add(user)
+    database.session.commit()
+
+    project = ResearchProject(
+        title="Caching", user_id=user.id, language="en", citation_style="APA"
+    )
+    database.session.add(project)
+    database.session.commit()
+
+    outline = ResearchOutline(project_id=project.id, total_pages=8, is_approved=True)
+    outline.set_outline_structure(
+        {
+            "title": "Caching",
+            "thesis_statement": "Caches matter",
+            "research_questions": ["Why?"],
+            "sections": [
+                {
+                    "title": title,
+                    "pages": 2,
+                    "page_range": {"start": start, "end": start + 1},
+                    "subsections": [{"title": "Part", "key_points": ["point"]}],
+                }
+                for title, start in (
+                    ("Introduction", 1),
+                    ("Background", 3),
+                    ("Results", 5),
+                    ("Conclusion", 7),
+                )
+            ],
+        }
+    )
+    database.session.add(outline)
+    database.session.commit()
+    return project, outline
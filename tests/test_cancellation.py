@@ -0,0 +1,89 @@
+import pytest
+
+from app.models.job import GenerationRun
+from app.services.cancellation import CancellationToken, GenerationCancelled
+
+
+@pytest.fixture
+def token(app, project, monkeypatch):
+    project, outline = project
+    monkeypatch.setitem(app.config, "GENERATION_CANCEL_CHECK_SECONDS", 0)
+    return CancellationToken.start(project.id, outline.id, "Results", run_id="run-1")
+
+
+def run(database, run_id):
+    database.session.expire_all()
+    return database.session.get(GenerationRun, run_id)
+
+
+def test_local_token_cancels_in_process():
+    token = CancellationToken()
+    token.raise_if_cancelled()
+
+    token.cancel()
+
+    assert token.cancelled
+    with pytest.raises(GenerationCancelled):
+        token.raise_if_cancelled()
+
+
+def test_generation_cancelled_escapes_exception_handlers():
+    assert not issubclass(GenerationCancelled, Exception)
+
+
+def test_start_registers_a_running_generation(database, token):
+    assert token.run_id == "run-1"
+    assert run(database, "run-1").status == GenerationRun.STATUS_RUNNING
+    assert not token.cancelled
+
+
+def test_cancel_runs_reaches_the_token(database, project, token):
+    project, outline = project
+
+    assert CancellationToken.cancel_runs(project.id, section_title="Results") == [
+        "run-1"
+    ]
+    assert token.cancelled
+    assert run(database, "run-1").cancel_requested
+
+
+def test_cancel_flag_from_another_process_is_polled(database, token):
+    # A token in another process only sees the shared flag
+    other = CancellationToken(token.run_id, check_interval=0, engine=database.engine)
+    assert not other.cancelled
+
+    run(database, "run-1").cancel_requested = True
+    database.session.commit()
+
+    assert other.cancelled
+
+
+def test_deleted_run_counts_as_cancelled(database, token):
+    database.session.delete(run(database, "run-1"))
+    database.session.commit()
+
+    assert token.cancelled
+
+
+def test_cancel_runs_filters(database, project, token):
+    project, outline = project
+
+    assert CancellationToken.cancel_runs(project.id, section_title="Background") == []
+    assert CancellationToken.cancel_runs(project.id, keep_outline_id=outline.id) == []
+    assert not token.cancelled
+
+
+def test_finished_run_is_not_cancelled(database, project, token):
+    project, outline = project
+    token.finish(GenerationRun.STATUS_DONE)
+
+    assert run(database, "run-1").status == GenerationRun.STATUS_DONE
+    assert CancellationToken.cancel_runs(project.id) == []
+
+
+def test_run_id_of_a_running_generation_is_not_reused(project, token):
+    project, outline = project
+
+    other = CancellationToken.start(project.id, outline.id, "Results", run_id="run-1")
+
+    assert other.run_id != "run-1"
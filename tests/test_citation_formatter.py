@@ -0,0 +1,164 @@
+import pytest
+
+from app.services.citation_formatter import (
+    format_citation,
+    format_reference,
+    normalize_style,
+    render_citations,
+)
+
+ENGLISH = ("John Smith", "Mary Jones")
+ARABIC = ("محمد عبد الله", "فاطمة الزهراء")
+
+
+@pytest.mark.parametrize(
+    "style, expected",
+    [
+        (
+            "APA",
+            "Smith, J., & Jones, M. (2020). Adaptive caching at scale. "
+            "*Journal of Systems*.",
+        ),
+        (
+            "MLA",
+            "Smith, John, and Mary Jones. “Adaptive caching at scale.” "
+            "*Journal of Systems*, 2020.",
+        ),
+        (
+            "Chicago",
+            "Smith, John, and Mary Jones. 2020. “Adaptive caching at scale.” "
+            "*Journal of Systems*.",
+        ),
+        (
+            "Harvard",
+            "Smith, J. and Jones, M. (2020) 'Adaptive caching at scale', "
+            "*Journal of Systems*.",
+        ),
+    ],
+)
+def test_english_article(style, expected):
+    assert (
+        format_citation(
+            ENGLISH,
+            "2020",
+            "Adaptive caching at scale",
+            "Journal of Systems",
+            "journal",
+            style,
+            "en",
+        )
+        == expected
+    )
+
+
+@pytest.mark.parametrize(
+    "style, expected",
+    [
+        ("APA", "عبد الله، محمد والزهراء، فاطمة. (د.ت.). عنوان. *مجلة*."),
+        ("MLA", "عبد الله، محمد وفاطمة الزهراء. «عنوان.» *مجلة*."),
+        ("Chicago", "عبد الله، محمد وفاطمة الزهراء. د.ت. «عنوان.» *مجلة*."),
+        ("Harvard", "عبد الله، محمد والزهراء، فاطمة (د.ت.) «عنوان»، *مجلة*."),
+    ],
+)
+def test_arabic_article_without_a_date(style, expected):
+    assert (
+        format_citation(ARABIC, "", "عنوان", "مجلة", "journal", style, "ar") == expected
+    )
+
+
+@pytest.mark.parametrize(
+    "style, language, authors, expected",
+    [
+        ("MLA", "en", 3, "Smith, John, et al."),
+        ("Harvard", "en", 4, "Smith, J. et al."),
+        ("MLA", "ar", 3, "عبد الله، محمد، وآخرون."),
+        ("Harvard", "ar", 4, "عبد الله، محمد وآخرون"),
+    ],
+)
+def test_long_author_lists_are_shortened(style, language, authors, expected):
+    names = (ENGLISH if language == "en" else ARABIC) * 2
+    reference = format_citation(
+        names[:authors], "2020", "T", "V", "journal", style, language
+    )
+
+    assert reference.startswith(expected)
+
+
+def test_chicago_lists_seven_of_more_than_ten_authors():
+    names = tuple(f"Given{i} Family{i}" for i in range(11))
+
+    reference = format_citation(names, "2020", "T", "V", "journal", "Chicago", "en")
+
+    assert reference.startswith("Family0, Given0, Given1 Family1,")
+    assert "Given6 Family6 et al. 2020." in reference
+    assert "Family7" not in reference
+
+
+def test_book_italicizes_the_title_and_not_the_publisher():
+    assert (
+        format_citation(("Jane Doe",), "", "Caching", "MIT Press", "book", "APA", "en")
+        == "Doe, J. (n.d.). *Caching*. MIT Press."
+    )
+
+
+def test_plain_text_has_no_markdown():
+    assert (
+        format_citation(
+            ("Jane Doe",), "", "Caching", "MIT Press", "book", "APA", "en", False
+        )
+        == "Doe, J. (n.d.). Caching. MIT Press."
+    )
+
+
+def test_names_keep_particles_and_accept_surname_first():
+    assert format_citation(
+        ("Ludwig van Beethoven",), "2020", "T", "", "book", "Chicago", "en"
+    ).startswith("van Beethoven, Ludwig.")
+    assert format_citation(
+        ("Smith, John",), "2020", "T?", "", "journal", "APA", "en"
+    ) == ("Smith, J. (2020). T?")
+
+
+def test_title_takes_the_place_of_missing_authors():
+    assert (
+        format_citation((), "2020", "Title", "Venue", "journal", "APA", "en")
+        == "Title. (2020). *Venue*."
+    )
+
+
+def test_normalize_style():
+    assert normalize_style(" chicago ") == "Chicago"
+    assert normalize_style("IEEE") == "APA"
+    assert normalize_style(None) == "APA"
+
+
+def test_format_reference_from_dict():
+    citation = {"authors": ["Jane Doe"], "year": 2019, "title": "X", "venue": "Y"}
+
+    assert format_reference(citation, "mla") == "Doe, Jane. “X.” *Y*, 2019."
+
+
+def test_format_reference_keeps_text_without_fields():
+    assert format_reference({"text": "Legacy text"}, "APA") == "Legacy text"
+
+
+def test_render_citations_only_rewrites_structured_ones():
+    citations = [
+        {
+            "id": "c1",
+            "text": "old",
+            "authors": "Jane Doe; Bob Ray",
+            "year": "2019",
+            "title": "X",
+            "venue": "Y",
+        },
+        {"id": "c2", "text": "keep"},
+    ]
+
+    rendered = render_citations(citations, "Harvard")
+
+    assert [citation["text"] for citation in rendered] == [
+        "Doe, J. and Ray, B. (2019) 'X', *Y*.",
+        "keep",
+    ]
+    assert citations[0]["text"] == "old"
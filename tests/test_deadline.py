@@ -0,0 +1,47 @@
+import math
+import time
+
+import pytest
+
+from app.services.deadline import Deadline, DeadlineExceeded
+
+
+def test_unbounded_deadline_never_expires():
+    deadline = Deadline()
+
+    assert not deadline.bounded
+    assert deadline.remaining() == math.inf
+    assert deadline.cap(20) == 20
+    assert not deadline.expired
+    deadline.raise_if_expired()
+
+
+def test_bounded_deadline_counts_down():
+    deadline = Deadline(10)
+
+    assert deadline.bounded
+    assert 9 < deadline.remaining() <= 10
+    assert deadline.cap(60) <= 10
+    assert deadline.cap(1) == 1
+    assert deadline.share(4) == pytest.approx(2.5, abs=0.1)
+    assert deadline.share(0) == pytest.approx(10, abs=0.1)
+
+
+def test_expired_deadline_raises():
+    deadline = Deadline(0.05)
+    time.sleep(0.1)
+
+    assert deadline.expired
+    assert deadline.remaining() == 0
+    assert deadline.cap(5) == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.raise_if_expired()
+
+
+def test_deadline_exceeded_is_a_timeout():
+    assert issubclass(DeadlineExceeded, TimeoutError)
+
+
+def test_for_request_uses_config():
+    assert Deadline.for_request({"REQUEST_DEADLINE_SECONDS": 5}).seconds == 5
+    assert Deadline.for_request({}).seconds == 100
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+from app.models.job import GenerationJob
+from app.services.job_service import JobQueue
+
+
+def statuses(jobs):
+    for job in jobs:
+        GenerationJob.query.session.refresh(job)
+    return {job.section_title: job.status for job in jobs}
+
+
+def expire_lease(job):
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    GenerationJob.query.session.commit()
+
+
+def test_claim_takes_jobs_in_priority_then_queue_order(project):
+    project, outline = project
+    queue = JobQueue()
+    queue.enqueue_sections(project, outline, ["Background"], priority=-10)
+    queue.enqueue_sections(project, outline, ["Results"])
+
+    job = queue.claim("w1")
+
+    assert job.section_title == "Results"
+    assert job.status == GenerationJob.STATUS_RUNNING
+    assert job.worker_id == "w1"
+    assert job.attempts == 1
+    assert job.lease_expires_at > datetime.utcnow()
+    assert queue.claim("w2").section_title == "Background"
+    assert queue.claim("w3") is None
+
+
+def test_expired_lease_is_claimed_again(project):
+    project, outline = project
+    queue = JobQueue()
+    queue.enqueue_sections(project, outline, ["Background"])
+    job = queue.claim("w1")
+    assert queue.claim("w2") is None
+
+    expire_lease(job)
+    again = queue.claim("w2")
+
+    assert again.id == job.id
+    assert again.worker_id == "w2"
+    assert again.attempts == 2
+    # The first worker lost the job and cannot finish it any more
+    assert not queue.renew_lease(job.id, "w1")
+    assert not queue.complete(job, "w1")
+    assert queue.complete(again, "w2")
+
+
+def test_expired_lease_on_final_attempt_fails_the_job(project):
+    project, outline = project
+    queue = JobQueue(max_attempts=1)
+    _, jobs = queue.enqueue_sections(project, outline, ["Background"])
+    expire_lease(queue.claim("w1"))
+
+    assert queue.claim("w2") is None
+    assert statuses(jobs) == {"Background": GenerationJob.STATUS_FAILED}
+
+
+def test_failed_attempt_is_requeued_until_attempts_run_out(project):
+    project, outline = project
+    queue = JobQueue(max_attempts=2)
+    _, jobs = queue.enqueue_sections(project, outline, ["Background"])
+
+    queue.fail(queue.claim("w1"), "w1", "boom")
+    assert statuses(jobs) == {"Background": GenerationJob.STATUS_QUEUED}
+
+    queue.fail(queue.claim("w1"), "w1", "boom")
+    assert statuses(jobs) == {"Background": GenerationJob.STATUS_FAILED}
+
+
+def test_framing_sections_wait_for_body_sections(project):
+    project, outline = project
+    _, jobs = JobQueue().enqueue_sections(
+        project, outline, ["Introduction", "Background", "Conclusion"]
+    )
+
+    assert statuses(jobs) == {
+        "Introduction": GenerationJob.STATUS_WAITING,
+        "Background": GenerationJob.STATUS_QUEUED,
+        "Conclusion": GenerationJob.STATUS_WAITING,
+    }
+
+
+def test_claim_respects_max_parallel_sections(project):
+    project, outline = project
+    queue = JobQueue(max_parallel=1)
+    queue.enqueue_sections(project, outline, ["Background", "Results"])
+
+    first = queue.claim("w1")
+
+    assert queue.claim("w2") is None
+    queue.complete(first, "w1")
+    assert queue.claim("w2").section_title == "Results"
+
+
+def test_release_waiting_once_body_sections_finish(project):
+    project, outline = project
+    queue = JobQueue(max_attempts=1)
+    _, jobs = queue.enqueue_sections(
+        project, outline, ["Introduction", "Background", "Results", "Conclusion"]
+    )
+    background = queue.claim("w1")
+    results = queue.claim("w2")
+
+    queue.complete(background, "w1")
+    queue._release_waiting()
+    assert statuses(jobs)["Introduction"] == GenerationJob.STATUS_WAITING
+
+    # A failed body section no longer holds up the framing sections
+    queue.fail(results, "w2", "boom")
+    queue._release_waiting()
+    assert statuses(jobs) == {
+        "Introduction": GenerationJob.STATUS_QUEUED,
+        "Background": GenerationJob.STATUS_DONE,
+        "Results": GenerationJob.STATUS_FAILED,
+        "Conclusion": GenerationJob.STATUS_QUEUED,
+    }
+    assert queue.claim("w3").section_title == "Introduction"
+
+
+def test_framing_sections_keep_waiting_while_body_is_queued(project):
+    project, outline = project
+    queue = JobQueue()
+    _, jobs = queue.enqueue_sections(project, outline, ["Introduction", "Background"])
+
+    queue._release_waiting()
+
+    assert statuses(jobs)["Introduction"] == GenerationJob.STATUS_WAITING
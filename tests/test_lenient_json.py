@@ -0,0 +1,65 @@
+from app.services.lenient_json import LenientJSONParser, parse_lenient
+
+
+def test_parses_valid_json():
+    assert parse_lenient('{"a": 1, "b": [true, null]}') == {"a": 1, "b": [True, None]}
+
+
+def test_skips_code_fences_and_prose():
+    text = 'Here is the page:\n```json\n{"content": "text"}\n```\nAnything else?'
+    assert parse_lenient(text) == {"content": "text"}
+
+
+def test_drops_trailing_commas():
+    assert parse_lenient('{"a": [1, 2,], "b": "x",}') == {"a": [1, 2], "b": "x"}
+
+
+def test_closes_truncated_response():
+    text = '{"section_title": "T", "content": "half a sent'
+    assert parse_lenient(text) == {"section_title": "T", "content": "half a sent"}
+
+
+def test_closes_truncated_nesting():
+    assert parse_lenient('{"citations": [{"id": "c1", "text": "Ref') == {
+        "citations": [{"id": "c1", "text": "Ref"}]
+    }
+
+
+def test_keeps_unescaped_quotes_inside_text():
+    text = '{"content": "He said "hi" to me", "n": 1}'
+    assert parse_lenient(text) == {"content": 'He said "hi" to me', "n": 1}
+
+
+def test_accepts_raw_newlines_and_python_literals():
+    assert parse_lenient('{"content": "line\nbreak", "a": True, "b": None}') == {
+        "content": "line\nbreak",
+        "a": True,
+        "b": None,
+    }
+
+
+def test_leaves_arabic_punctuation_untouched():
+    assert parse_lenient('{"content": "المقدمة: «نص»، نعم"}') == {
+        "content": "المقدمة: «نص»، نعم"
+    }
+
+
+def test_returns_none_without_json():
+    assert parse_lenient("no json here") is None
+
+
+def test_start_chars_skip_bracketed_prose():
+    assert parse_lenient('[see 1] {"a": 1}', "{") == {"a": 1}
+
+
+def test_field_text_while_streaming():
+    parser = LenientJSONParser("{")
+    seen = []
+    for chunk in ('{"content": "Hel', "lo wor", 'ld", "x": 1}'):
+        parser.feed(chunk)
+        seen.append(parser.field_text("content"))
+
+    assert seen == ["Hel", "Hello wor", "Hello world"]
+    assert parser.field_text("content", start=6) == "world"
+    assert parser.close() == {"content": "Hello world", "x": 1}
+    assert parser.done
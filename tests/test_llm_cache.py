@@ -0,0 +1,107 @@
+import pytest
+
+from app.services.content_service import ContentService
+from app.services.llm_cache import LLMCache
+
+PAGE = '{"section_title": "Results", "content": "Caches help.", "citations": []}'
+TRUNCATED = '{"section_title": "Results", "content": "Caches'
+
+
+class ScriptedBackend:
+    """Returns the given responses in order, counting the calls"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def generate(self, prompt, generation_config=None, safety_settings=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+    def stream(self, prompt, generation_config=None, safety_settings=None):
+        yield self.generate(prompt, generation_config, safety_settings)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / "llm_cache.sqlite3"), max_entries=2)
+
+
+@pytest.fixture
+def service(app, database, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setitem(
+        app.config, "LLM_CACHE_PATH", str(tmp_path / "service_cache.sqlite3")
+    )
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    return ContentService()
+
+
+def test_key_depends_on_every_input():
+    key = LLMCache.make_key("model", "prompt", {"temperature": 0.7})
+
+    assert key == LLMCache.make_key("model", "prompt", {"temperature": 0.7})
+    assert key != LLMCache.make_key("other", "prompt", {"temperature": 0.7})
+    assert key != LLMCache.make_key("model", "prompt", {"temperature": 0.2})
+
+
+def test_hits_and_misses_are_counted(cache):
+    assert cache.get("a") is None
+    cache.set("a", "model", "response")
+
+    assert cache.get("a") == "response"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.set("a", "model", "first")
+    cache.set("b", "model", "second")
+    cache.get("a")
+    cache.set("c", "model", "third")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "first"
+
+
+def test_expired_entry_is_a_miss(cache):
+    cache.ttl_seconds = -1
+    cache.set("a", "model", "response")
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_complete_page_is_cached(service):
+    service.backend = ScriptedBackend(PAGE)
+
+    assert service._request_content("prompt") == PAGE
+    assert service._request_content("prompt") == PAGE
+    assert service.backend.calls == 1
+
+
+def test_truncated_page_is_not_cached(service):
+    service.backend = ScriptedBackend(TRUNCATED, PAGE)
+
+    assert service._request_content("prompt") == TRUNCATED
+    assert service._request_content("prompt") == PAGE
+    assert service.backend.calls == 2
+    assert service.cache.stats()["entries"] == 1
+
+
+def test_truncated_stream_is_not_cached(service):
+    service.backend = ScriptedBackend(TRUNCATED, PAGE)
+
+    assert "".join(service._stream_content("prompt")) == TRUNCATED
+    assert "".join(service._stream_content("prompt")) == PAGE
+    assert service.backend.calls == 2
+
+
+def test_cached_response_that_does_not_parse_is_dropped(service):
+    key = LLMCache.make_key(
+        service.model_name, "prompt", service.page_generation_config
+    )
+    service.cache.set(key, service.model_name, TRUNCATED)
+    service.backend = ScriptedBackend(PAGE)
+
+    assert service._request_content("prompt") == PAGE
+    assert service.cache.get(key) == PAGE
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.models.rate_limit import RateLimitBucket
+from app.services.rate_limiter import (
+    REQUESTS_BUCKET,
+    TOKENS_BUCKET,
+    AdaptiveConcurrency,
+    RateLimiter,
+    RateLimitTimeout,
+    is_throttle_error,
+)
+
+
+@pytest.fixture
+def limiter(database):
+    return RateLimiter(
+        database.engine,
+        requests_per_minute=2,
+        tokens_per_minute=600,
+        max_concurrency=4,
+        cooldown_seconds=30,
+    )
+
+
+def bucket(database, name):
+    database.session.expire_all()
+    return database.session.get(RateLimitBucket, name)
+
+
+def rewind(database, seconds):
+    """Pretend the buckets were last updated some seconds ago"""
+    for row in RateLimitBucket.query.all():
+        row.updated_at -= seconds
+    database.session.commit()
+
+
+def test_empty_bucket_waits_for_refill(database, limiter):
+    costs = {REQUESTS_BUCKET: 1.0, TOKENS_BUCKET: 10.0}
+    assert limiter._try_take(costs) == 0
+    assert limiter._try_take(costs) == 0
+
+    # Two requests a minute refill one every 30 seconds
+    assert limiter._try_take(costs) == pytest.approx(30, abs=1)
+
+    rewind(database, 30)
+    assert limiter._try_take(costs) == 0
+
+
+def test_refill_stops_at_capacity(database, limiter):
+    rewind(database, 3600)
+    costs = {REQUESTS_BUCKET: 1.0, TOKENS_BUCKET: 1.0}
+
+    assert limiter._try_take(costs) == 0
+    assert bucket(database, REQUESTS_BUCKET).tokens == pytest.approx(1)
+
+
+def test_slot_times_out_when_quota_does_not_come(limiter):
+    with limiter.slot(10):
+        pass
+    with limiter.slot(10):
+        pass
+
+    with pytest.raises(RateLimitTimeout):
+        with limiter.slot(10, max_wait_seconds=0.1):
+            pass
+
+
+def test_unused_reservation_is_refunded(database, limiter):
+    with limiter.slot(500) as permit:
+        assert bucket(database, TOKENS_BUCKET).tokens == pytest.approx(100, abs=1)
+        permit.record(50)
+
+    assert bucket(database, TOKENS_BUCKET).tokens == pytest.approx(550, abs=1)
+
+
+def test_throttle_error_pauses_calls_and_halves_concurrency(database, limiter):
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        with limiter.slot(10):
+            raise google_exceptions.ResourceExhausted("quota")
+
+    assert bucket(database, REQUESTS_BUCKET).blocked_until > time.time() + 25
+    assert limiter._try_take({REQUESTS_BUCKET: 1.0}) > 25
+    assert limiter.concurrency.limit == 2
+
+
+def test_is_throttle_error():
+    assert is_throttle_error(google_exceptions.TooManyRequests("slow down"))
+    assert is_throttle_error(RuntimeError("429 Resource exhausted"))
+    assert not is_throttle_error(google_exceptions.InvalidArgument("bad"))
+
+
+def test_concurrency_halves_on_throttle_and_grows_back():
+    concurrency = AdaptiveConcurrency(4)
+
+    concurrency.acquire(0)
+    concurrency.release(throttled=True)
+    assert concurrency.limit == 2
+
+    concurrency.acquire(0)
+    concurrency.release()
+    assert concurrency.limit == pytest.approx(2.5)
+    concurrency.acquire(0)
+    concurrency.release()
+    assert concurrency.limit == pytest.approx(2.9)
+
+
+def test_concurrency_never_drops_below_one_or_exceeds_max():
+    concurrency = AdaptiveConcurrency(2)
+    for _ in range(5):
+        concurrency.acquire(0)
+        concurrency.release(throttled=True)
+    assert concurrency.limit == 1
+
+    for _ in range(20):
+        concurrency.acquire(0)
+        concurrency.release()
+    assert concurrency.limit == 2
+
+
+def test_callers_over_the_limit_wait():
+    concurrency = AdaptiveConcurrency(1)
+    concurrency.acquire(0)
+
+    with pytest.raises(RateLimitTimeout):
+        concurrency.acquire(0.05)
+
+    concurrency.release()
+    concurrency.acquire(0)
@@ -0,0 +1,134 @@
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.models.rate_limit import RateLimitBucket
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.metrics import metrics
+from app.services.rate_limiter import TOKENS_BUCKET, RateLimiter
+from app.services.retry_policy import CallTimeout, RetryPolicy
+
+
+@pytest.fixture
+def limiter(database):
+    return RateLimiter(
+        database.engine,
+        requests_per_minute=600,
+        tokens_per_minute=600,
+        cooldown_seconds=0.1,
+        max_throttle_retries=2,
+    )
+
+
+def failing(error, calls):
+    def fn():
+        calls.append(1)
+        raise error
+
+    return fn
+
+
+def test_transient_errors_are_retried(limiter):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise google_exceptions.ServiceUnavailable("down")
+        return "ok"
+
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.01)
+    assert policy.call(flaky, Deadline(10), limiter.quota("prompt")) == "ok"
+    assert len(calls) == 3
+
+
+def test_other_errors_fail_at_once():
+    calls = []
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.01)
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        policy.call(failing(google_exceptions.InvalidArgument("bad"), calls))
+    assert len(calls) == 1
+
+
+def test_quota_errors_are_requeued_by_the_limiter_only(limiter):
+    calls = []
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.01)
+
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        policy.call(
+            failing(google_exceptions.ResourceExhausted("429"), calls),
+            Deadline(10),
+            limiter.quota("prompt"),
+        )
+    # The first send and max_throttle_retries requeues, not multiplied by
+    # max_attempts
+    assert len(calls) == 3
+
+
+def test_quota_errors_are_backed_off_without_a_limiter():
+    calls = []
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.01)
+
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        policy.call(failing(google_exceptions.ResourceExhausted("429"), calls))
+    assert len(calls) == 3
+
+
+def test_waiting_for_quota_is_not_timed_or_sampled(database, limiter):
+    limiter._block(0.5)
+    policy = RetryPolicy("quota-wait", max_attempts=1, timeout=0.3)
+
+    def send():
+        time.sleep(0.1)
+        return "ok"
+
+    started = time.monotonic()
+    assert policy.call(send, Deadline(10), limiter.quota("prompt")) == "ok"
+
+    assert time.monotonic() - started >= 0.5
+    assert metrics.percentile("llm.quota-wait.latency", 50) < 0.3
+
+
+def test_slow_call_times_out():
+    policy = RetryPolicy("test", max_attempts=1, timeout=0.1)
+
+    with pytest.raises(CallTimeout):
+        policy.call(lambda: time.sleep(0.5))
+
+
+def test_deadline_cuts_retries_short():
+    policy = RetryPolicy("test", max_attempts=5, base_delay=0.01, timeout=5)
+
+    with pytest.raises(DeadlineExceeded):
+        policy.call(lambda: time.sleep(0.5), Deadline(0.2))
+
+
+def test_quota_records_response_size(database, limiter):
+    quota = limiter.quota("x" * 400, max_output_tokens=200)
+
+    with quota.reserve() as permit:
+        quota.record(permit, "y" * 40)
+
+    # 100 prompt tokens and 10 response tokens used out of 600
+    database.session.expire_all()
+    tokens = database.session.get(RateLimitBucket, TOKENS_BUCKET).tokens
+    assert tokens == pytest.approx(490, abs=1)
+
+
+def test_hedge_without_spare_quota_is_skipped(limiter):
+    policy = RetryPolicy(
+        "hedged", max_attempts=1, timeout=3, hedge=True, hedge_min_samples=1
+    )
+    metrics.observe("llm.hedged.latency", 0.01)
+    limiter.concurrency.limit = 1.0
+    calls = []
+
+    def send():
+        calls.append(1)
+        time.sleep(0.2)
+        return "ok"
+
+    assert policy.call(send, Deadline(10), limiter.quota("prompt")) == "ok"
+    assert len(calls) == 1
@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.content import ResearchContentPage, SectionBusy, SectionCheckpoint
+from app.models.job import GenerationRun
+from app.services.cancellation import CancellationToken
+from app.services.content_service import ContentService
+from app.services.llm_backend import LocalBackend
+
+
+def start_run(project, outline, run_id):
+    return CancellationToken.start(project.id, outline.id, "Results", run_id=run_id)
+
+
+def save_page(database, project, outline, checkpoint, page_number):
+    ResearchContentPage.save(
+        project.id,
+        outline.id,
+        "Results",
+        page_number,
+        prompt="prompt",
+        page_content={"content": f"page {page_number}", "citations": []},
+    )
+    checkpoint.advance(page_number)
+    database.session.commit()
+
+
+def test_fresh_run_starts_a_checkpoint(project):
+    project, outline = project
+
+    checkpoint, resumed = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id="a"
+    )
+
+    assert not resumed
+    assert checkpoint.run_id == "a"
+    assert checkpoint.finished_pages() == []
+
+
+def test_finished_run_is_resumed_after_its_last_good_page(database, project):
+    project, outline = project
+    first = start_run(project, outline, "a")
+    checkpoint, _ = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id=first.run_id
+    )
+    save_page(database, project, outline, checkpoint, 5)
+    first.finish(GenerationRun.STATUS_PARTIAL)
+
+    second = start_run(project, outline, "b")
+    checkpoint, resumed = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id=second.run_id
+    )
+
+    assert resumed
+    assert checkpoint.run_id == "b"
+    assert checkpoint.next_page == 6
+    assert [page.page_number for page in checkpoint.finished_pages()] == [5]
+
+
+def test_pages_from_before_the_run_are_not_resumed(database, project):
+    project, outline = project
+    ResearchContentPage.save(
+        project.id,
+        outline.id,
+        "Results",
+        5,
+        prompt="prompt",
+        page_content={"content": "old", "citations": []},
+    )
+    old_page = ResearchContentPage.query.one()
+    old_page.updated_at = datetime.utcnow() - timedelta(days=1)
+    database.session.commit()
+
+    checkpoint, _ = SectionCheckpoint.begin(project.id, outline.id, "Results")
+
+    assert checkpoint.finished_pages() == []
+
+
+def test_live_run_is_not_taken_over(project):
+    project, outline = project
+    owner = start_run(project, outline, "a")
+    SectionCheckpoint.begin(project.id, outline.id, "Results", run_id=owner.run_id)
+
+    with pytest.raises(SectionBusy):
+        SectionCheckpoint.begin(project.id, outline.id, "Results", run_id="b")
+
+
+def test_stale_run_is_taken_over(database, project):
+    project, outline = project
+    owner = start_run(project, outline, "a")
+    checkpoint, _ = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id=owner.run_id
+    )
+    checkpoint.heartbeat_at = datetime.utcnow() - timedelta(seconds=300)
+    database.session.commit()
+
+    checkpoint, resumed = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id="b", stale_after=120
+    )
+
+    assert resumed
+    assert checkpoint.run_id == "b"
+    # The old owner's heartbeat no longer holds the checkpoint
+    assert not SectionCheckpoint.heartbeat(checkpoint.id, "a")
+    assert SectionCheckpoint.heartbeat(checkpoint.id, "b")
+
+
+def test_heartbeat_keeps_the_run_alive(database, project):
+    project, outline = project
+    owner = start_run(project, outline, "a")
+    checkpoint, _ = SectionCheckpoint.begin(
+        project.id, outline.id, "Results", run_id=owner.run_id
+    )
+    checkpoint.heartbeat_at = datetime.utcnow() - timedelta(seconds=300)
+    database.session.commit()
+
+    assert SectionCheckpoint.heartbeat(checkpoint.id, "a")
+
+    with pytest.raises(SectionBusy):
+        SectionCheckpoint.begin(
+            project.id, outline.id, "Results", run_id="b", stale_after=120
+        )
+
+
+def test_cleared_checkpoint_starts_over(database, project):
+    project, outline = project
+    checkpoint, _ = SectionCheckpoint.begin(project.id, outline.id, "Results")
+    save_page(database, project, outline, checkpoint, 5)
+
+    SectionCheckpoint.clear(outline.id, "Results")
+    database.session.commit()
+
+    assert not SectionCheckpoint.heartbeat(checkpoint.id, None)
+    _, resumed = SectionCheckpoint.begin(project.id, outline.id, "Results")
+    assert not resumed
+
+
+class CountingBackend(LocalBackend):
+    """Instant local backend that can act after each call"""
+
+    def __init__(self, after_call=None):
+        super().__init__(latency_median=0)
+        self.calls = 0
+        self.after_call = after_call
+
+    def generate(self, prompt, generation_config=None, safety_settings=None):
+        text = super().generate(prompt, generation_config, safety_settings)
+        self.calls += 1
+        if self.after_call:
+            self.after_call(self.calls)
+        return text
+
+
+def generate(project, outline, token, backend):
+    service = ContentService()
+    service.backend = backend
+    return service.generate_section_content(
+        project,
+        outline,
+        "Results",
+        [],
+        "APA",
+        generation_mode="sequential",
+        persist_pages=True,
+        cancel_token=token,
+    )
+
+
+def test_generation_resumes_an_interrupted_run(app, project, monkeypatch):
+    project, outline = project
+    monkeypatch.setitem(app.config, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setitem(app.config, "GENERATION_CANCEL_CHECK_SECONDS", 0)
+
+    first = start_run(project, outline, "a")
+    interrupted = generate(
+        project, outline, first, CountingBackend(lambda calls: first.cancel())
+    )
+    first.finish(GenerationRun.STATUS_CANCELLED)
+    assert interrupted.get("cancelled")
+    [kept] = ResearchContentPage.for_section(outline.id, "Results")
+
+    backend = CountingBackend()
+    result = generate(project, outline, start_run(project, outline, "b"), backend)
+
+    # Only the page the first run did not finish is generated again
+    assert backend.calls == 1
+    assert "error" not in result
+    assert result["content"].startswith(kept.content)
+    assert [
+        page.page_number
+        for page in ResearchContentPage.for_section(outline.id, "Results")
+    ] == [5, 6]
+
+
+def test_generation_refuses_a_section_another_run_is_writing(app, project):
+    project, outline = project
+    owner = start_run(project, outline, "a")
+    SectionCheckpoint.begin(project.id, outline.id, "Results", run_id=owner.run_id)
+
+    backend = CountingBackend()
+    result = generate(project, outline, start_run(project, outline, "b"), backend)
+
+    assert result["in_progress"]
+    assert backend.calls == 0
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from app.models.job import GenerationLease
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.single_flight import SingleFlight, section_key
+
+
+def in_thread(app, fn):
+    """Run fn in an app context on another thread; returns a join() for its result"""
+    out = {}
+
+    def run():
+        with app.app_context():
+            out["result"] = fn()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+
+    def join():
+        thread.join()
+        return out.get("result")
+
+    return join
+
+
+def slow(result, calls, seconds=0.3):
+    def fn():
+        calls.append(1)
+        time.sleep(seconds)
+        return result
+
+    return fn
+
+
+def test_section_key():
+    assert section_key(1, 2, "Results") == "content:1:2:Results"
+    assert section_key(1, 2, "Results", [3, 1]) == "content:1:2:Results:pages:1,3"
+
+
+def test_concurrent_callers_share_one_run(app, database):
+    flight = SingleFlight(poll_interval=0.05)
+    calls = []
+
+    owner = in_thread(app, lambda: flight.run("k", slow({"content": "x"}, calls)))
+    time.sleep(0.1)
+    waiter = flight.run("k", slow({"content": "y"}, calls))
+
+    assert owner() == {"content": "x"}
+    assert waiter == {"content": "x"}
+    assert len(calls) == 1
+
+
+def test_result_is_reused_within_ttl_only(database):
+    flight = SingleFlight(result_ttl=0.2)
+    calls = []
+
+    flight.run("k", slow({"content": "x"}, calls, 0))
+    assert flight.run("k", slow({"content": "y"}, calls, 0)) == {"content": "x"}
+
+    time.sleep(0.3)
+    assert flight.run("k", slow({"content": "y"}, calls, 0)) == {"content": "y"}
+    assert len(calls) == 2
+
+
+def test_failure_is_not_reused(database):
+    flight = SingleFlight(result_ttl=30)
+
+    assert flight.run("k", lambda: {"error": "boom"}) == {"error": "boom"}
+    assert flight.run("k", lambda: {"content": "x"}) == {"content": "x"}
+
+
+@pytest.mark.parametrize("result", [{"partial": True}, {"cancelled": True}])
+def test_partial_or_cancelled_result_is_not_published(database, result):
+    flight = SingleFlight(result_ttl=30)
+
+    assert flight.run("k", lambda: {"error": "stopped", **result})["error"]
+
+    assert database.session.get(GenerationLease, "k") is None
+    assert flight.run("k", lambda: {"content": "x"}) == {"content": "x"}
+
+
+def test_waiter_takes_over_an_abandoned_run(app, database):
+    flight = SingleFlight(poll_interval=0.05)
+    owner = flight.claim("k")
+    assert flight.claim("k") is None
+
+    waiter = in_thread(app, lambda: flight.run("k", lambda: {"content": "mine"}))
+    time.sleep(0.1)
+    flight.abandon("k", owner)
+
+    assert waiter() == {"content": "mine"}
+
+
+def test_waiter_takes_over_an_expired_lease(database):
+    flight = SingleFlight(lease_seconds=0.2, poll_interval=0.05)
+    assert flight.claim("k") is not None
+
+    assert flight.run("k", lambda: {"content": "mine"}) == {"content": "mine"}
+
+
+def test_keep_alive_renews_the_lease(database):
+    flight = SingleFlight(lease_seconds=3)
+    owner = flight.claim("k")
+    expires_at = database.session.get(GenerationLease, "k").expires_at
+
+    with flight.keep_alive("k", owner):
+        time.sleep(1.2)
+
+    database.session.expire_all()
+    assert database.session.get(GenerationLease, "k").expires_at > expires_at
+
+
+def test_wait_stops_at_the_deadline(database):
+    flight = SingleFlight(poll_interval=0.05)
+    flight.claim("k")
+
+    with pytest.raises(DeadlineExceeded):
+        flight.wait("k", Deadline(0.2))